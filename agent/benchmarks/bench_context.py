@@ -0,0 +1,90 @@
+"""Micro-benchmark: per-iteration LLM message building, rebuilt vs incremental.
+
+Simulates one turn with N tool-call iterations on a long session and
+compares the old approach (rebuild a dict per message every iteration,
+then copy through the provider formatter) with `ContextView.sync()`.
+
+Usage (from agent/): python -m benchmarks.bench_context [history_messages] [iterations]
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from robert.modules.context import ContextWindow
+from robert.modules.providers import OpenRouterAdapter
+from robert.modules.session import Session
+
+
+def _rebuild_each_iteration(session, provider, iterations, measure):
+    for i in range(iterations):
+        with measure:
+            msgs = [{"role": "system", "content": "sys"}]
+            for m in session.messages:
+                d = {"role": m.role, "content": m.content}
+                if m.tool_calls:
+                    d["tool_calls"] = m.tool_calls
+                if m.tool_call_id:
+                    d["tool_call_id"] = m.tool_call_id
+                msgs.append(d)
+            [provider._format_message(m) for m in msgs]  # the old per-message copy
+        _tool_step(session, i)
+
+def _incremental_view(session, provider, iterations, measure):
+    view = ContextWindow(max_tokens=10**9).open(session, "sys")
+    for i in range(iterations):
+        with measure:
+            messages, _ = view.sync()
+            provider._format_messages(messages)
+        _tool_step(session, i)
+
+class _Allocations:
+    """Sums, per measured block, the bytes allocated on top of what was live before it."""
+    def __init__(self):
+        self.bytes = 0
+
+    def __enter__(self):
+        self._before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+    def __exit__(self, *exc):
+        _, peak = tracemalloc.get_traced_memory()
+        self.bytes += peak - self._before
+
+def _tool_step(session, i):
+    session.add_tool_call_message("", [{"id": f"b{i}", "function": {"name": "echo", "arguments": "{}"}}])
+    session.add_tool_result_message(f"b{i}", "ok")
+
+def _measure(fn, history, iterations):
+    with tempfile.TemporaryDirectory() as d:
+        session = Session("bench", f"{d}/bench.jsonl", durability="none")
+        for i in range(history // 2):
+            session.add_user_message(f"question {i}")
+            session.add_assistant_message(f"answer {i}")
+        # Warm the wire caches the way a previous turn would have
+        session.history_for_llm(0)
+        provider = OpenRouterAdapter(api_key="", model="bench")
+
+        measure = _Allocations()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn(session, provider, iterations, measure)
+        elapsed = time.perf_counter() - t0
+        tracemalloc.stop()
+        session.close()
+        return elapsed, measure.bytes
+
+def main():
+    history = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"history={history} messages, iterations={iterations}")
+    results = {}
+    for name, fn in (("rebuild", _rebuild_each_iteration), ("incremental", _incremental_view)):
+        elapsed, allocated = _measure(fn, history, iterations)
+        results[name] = allocated
+        print(f"{name:>12}: {elapsed * 1000:8.2f} ms (traced)  {allocated / 1024:10.1f} KiB allocated")
+    print(f"allocation ratio: {results['rebuild'] / max(results['incremental'], 1):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Micro-benchmark: EntityIndex lookups on a large (2,000 entity) home.
+
+Usage (from agent/): python -m benchmarks.bench_entity_index [entities] [queries]
+"""
+
+import random
+import sys
+import time
+
+from robert.modules.tools_ha import EntityIndex
+
+ROOMS = ["kitchen", "living room", "bedroom", "office", "garage", "hallway", "bathroom", "attic"]
+KINDS = [("light", "Light"), ("switch", "Plug"), ("sensor", "Temperature"), ("cover", "Blind")]
+
+def _home(n: int) -> tuple[list[dict], dict[str, str]]:
+    states, areas = [], {}
+    for i in range(n):
+        room = ROOMS[i % len(ROOMS)]
+        domain, kind = KINDS[(i // len(ROOMS)) % len(KINDS)]
+        entity_id = f"{domain}.{room.replace(' ', '_')}_{kind.lower()}_{i}"
+        states.append({"entity_id": entity_id, "state": "off", "attributes": {"friendly_name": f"{room.title()} {kind} {i}"}})
+        areas[entity_id] = "Downstairs" if i % 2 else "Upstairs"
+    return states, areas
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    states, areas = _home(n)
+    index = EntityIndex()
+
+    t0 = time.perf_counter()
+    index.reset(states)
+    index.set_areas(areas)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    rng = random.Random(1)
+    exact = [f"{rng.choice(ROOMS)} {rng.choice(KINDS)[1].lower()}s" for _ in range(queries)]
+    # one dropped letter per query: misses the token index, goes through trigrams
+    fuzzy = [q[:i] + q[i + 1:] for q in exact for i in [rng.randrange(len(q) - 1)]]
+    per_query_ms = {}
+    for label, batch in (("search", exact), ("fuzzy search", fuzzy)):
+        t0 = time.perf_counter()
+        for q in batch:
+            index.search(q, limit=5)
+        per_query_ms[label] = (time.perf_counter() - t0) * 1000 / queries
+
+    t0 = time.perf_counter()
+    for i in range(queries):
+        s = states[i % n]
+        index.update(s["entity_id"], {**s, "state": "on" if i % 2 else "off"})
+    per_update_us = (time.perf_counter() - t0) * 1e6 / queries
+
+    searches = "  ".join(f"{label}={ms:.3f} ms/query" for label, ms in per_query_ms.items())
+    print(f"entities={n}  build={build_ms:.1f} ms  {searches}  state update={per_update_us:.2f} us/event")
+
+if __name__ == "__main__":
+    main()
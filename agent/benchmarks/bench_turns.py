@@ -0,0 +1,198 @@
+"""End-to-end benchmark: AgentService turns against a fake provider and a fake HA server.
+
+For every (session size, concurrency) pair it runs `--turns` turns spread
+over `concurrency` sessions (each session's turns in sequence, sessions in
+parallel) and reports turns/sec, p50/p95/p99 turn latency, time spent
+loading and committing sessions, and peak traced memory (measured in a
+separate, shorter pass so tracing does not skew the timings).
+
+Usage (from agent/):
+    python -m benchmarks.bench_turns --pattern lookup --sizes 0,2000 --concurrency 1,16 \\
+        --out results.json --baseline previous.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import PATTERNS, FakeProvider, ha_states
+from robert.modules.agent import AgentService, ContextBuilder
+from robert.modules.config import AgentConfig, ToolConfig
+from robert.modules.session import SessionManager
+from robert.modules.session_store import JsonlSessionStore, SqliteSessionStore
+from robert.modules.tools import ToolRegistry
+from tests.fake_ha import FakeHARest
+
+
+class _TimedSessions(SessionManager):
+    """SessionManager that adds up the time spent loading and committing sessions."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.io_ms = 0.0
+
+    def get_session(self, key: str):
+        t0 = time.perf_counter()
+        session = super().get_session(key)
+        self.io_ms += (time.perf_counter() - t0) * 1000
+        if not hasattr(session, "_bench_commit"):
+            session._bench_commit = session.commit
+
+            async def commit():
+                t0 = time.perf_counter()
+                await session._bench_commit()
+                self.io_ms += (time.perf_counter() - t0) * 1000
+            session.commit = commit
+        return session
+
+def _store(args, directory: str):
+    if args.store == "sqlite":
+        return SqliteSessionStore(os.path.join(directory, "sessions.db"), fsync=args.durability == "fsync")
+    return JsonlSessionStore(directory, fsync=args.durability == "fsync", segment_bytes=args.segment_bytes)
+
+def _seed(args, directory: str, sessions: int, size: int):
+    """Give each session `size` messages of prior history on disk."""
+    manager = SessionManager(directory, store=_store(args, directory))
+    for s in range(sessions):
+        session = manager.get_session(f"bench{s}")
+        for i in range(size // 2):
+            session.add_user_message(f"earlier question {i} " + "x" * 60)
+            session.add_assistant_message(f"earlier answer {i} " + "y" * 120)
+    manager.close()
+
+async def _scenario(args, ha: FakeHARest, size: int, concurrency: int, turns: int) -> dict:
+    with tempfile.TemporaryDirectory() as d:
+        _seed(args, d, concurrency, size)
+        config = AgentConfig()
+        config.tools["homeassistant"] = ToolConfig(enabled=True)
+        tools = ToolRegistry(workspace_root=d, tool_configs=config.tools)
+        sessions = _TimedSessions(
+            d, durability=args.durability, store=_store(args, d), load_last=args.load_last,
+        )
+        provider = FakeProvider(args.pattern, args.latency_ms, entities=args.entities)
+        agent = AgentService(provider, sessions, ContextBuilder(), tools, tool_concurrency=4)
+
+        latencies: list[float] = []
+
+        async def drive(session_key: str, count: int):
+            for i in range(count):
+                t0 = time.perf_counter()
+                await agent.process(f"how is room {i % args.entities}?", session_key)
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        per_session = [turns // concurrency + (1 if s < turns % concurrency else 0) for s in range(concurrency)]
+        t0 = time.perf_counter()
+        await asyncio.gather(*(drive(f"bench{s}", n) for s, n in enumerate(per_session) if n))
+        elapsed = time.perf_counter() - t0
+        await agent.aclose()
+
+    latencies.sort()
+    return {
+        "pattern": args.pattern,
+        "store": args.store,
+        "session_size": size,
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "turns_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.50), 2),
+        "p95_ms": round(_percentile(latencies, 0.95), 2),
+        "p99_ms": round(_percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "session_io_ms": round(sessions.io_ms, 2),
+        "llm_requests": provider.requests,
+    }
+
+async def _peak_memory(args, ha, size, concurrency) -> float:
+    tracemalloc.start()
+    try:
+        await _scenario(args, ha, size, concurrency, min(args.turns, max(concurrency, args.memory_turns)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024 / 1024, 2)
+
+def _percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _compare(results: list[dict], baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["pattern"], r["session_size"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["pattern"], r["session_size"], r["concurrency"]))
+        if old is None:
+            continue
+        tps = (r["turns_per_sec"] / old["turns_per_sec"] - 1) * 100 if old["turns_per_sec"] else 0.0
+        p95 = (r["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+        print(f"  size={r['session_size']:>6} conc={r['concurrency']:>4}  turns/s {tps:+6.1f}%  p95 {p95:+6.1f}%")
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def _ints(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+async def _run(args) -> list[dict]:
+    results = []
+    async with FakeHARest(ha_states(args.entities)) as ha:
+        os.environ["HOMEASSISTANT_URL"] = ha.url
+        os.environ["HOMEASSISTANT_TOKEN"] = "bench"
+        for size in args.sizes:
+            for concurrency in args.concurrency:
+                result = await _scenario(args, ha, size, concurrency, args.turns)
+                if args.memory_turns:
+                    result["peak_mem_mb"] = await _peak_memory(args, ha, size, concurrency)
+                results.append(result)
+                print(
+                    f"size={size:>6} conc={concurrency:>4}  {result['turns_per_sec']:8.1f} turns/s  "
+                    f"p50={result['p50_ms']:7.1f}  p95={result['p95_ms']:7.1f}  p99={result['p99_ms']:7.1f} ms  "
+                    f"session io={result['session_io_ms']:8.1f} ms  peak={result.get('peak_mem_mb', '-')} MiB"
+                )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pattern", choices=PATTERNS, default="lookup")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--sizes", type=_ints, default=[0, 500, 5000], help="prior messages per session")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32], help="sessions driven in parallel")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake LLM latency per request")
+    parser.add_argument("--entities", type=int, default=200)
+    parser.add_argument("--durability", choices=("none", "flush", "fsync"), default="flush")
+    parser.add_argument("--store", choices=("jsonl", "sqlite"), default="jsonl")
+    parser.add_argument("--load-last", type=int, default=0, help="messages loaded per session; 0 = all")
+    parser.add_argument("--segment-bytes", type=int, default=0, help="JSONL rotation size; 0 = never")
+    parser.add_argument("--memory-turns", type=int, default=50, help="turns in the traced pass; 0 = skip")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "settings": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+                "results": results,
+            }, f, indent=2)
+    if args.baseline:
+        _compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Offline stand-ins for the benchmarks: a scripted LLM provider and the home it controls.
+
+The HA REST server itself is tests/fake_ha.py's FakeHARest. Nothing here
+needs the network or any package beyond the agent's own dependencies.
+"""
+
+import asyncio
+import json
+import random
+
+from robert.modules.providers import LLMResponse
+
+PATTERNS = ("answer", "lookup", "control")
+
+def ha_states(entities: int = 200) -> list[dict]:
+    """The lights FakeProvider asks about, as HA state objects."""
+    return [
+        {"entity_id": f"light.room_{i}", "state": "off", "attributes": {"friendly_name": f"Room {i} Light"}}
+        for i in range(entities)
+    ]
+
+class FakeProvider:
+    """A `ProviderPort` that answers after a configurable delay.
+
+    pattern "answer" replies straight away; "lookup" first asks for
+    `ha_get_state` and "control" for `ha_call_service`, then answers once
+    the tool result is in. Latency is `latency_ms` +/- `jitter` (fraction).
+    """
+    def __init__(self, pattern: str = "answer", latency_ms: float = 20.0, jitter: float = 0.2,
+                 entities: int = 200, seed: int = 1):
+        if pattern not in PATTERNS:
+            raise ValueError(f"pattern must be one of {PATTERNS}")
+        self._pattern = pattern
+        self._latency = latency_ms / 1000
+        self._jitter = jitter
+        self._entities = entities
+        self._rng = random.Random(seed)
+        self._calls = 0
+        self.requests = 0
+
+    async def chat(self, messages: list[dict], tools: list[dict] = None) -> LLMResponse:
+        self.requests += 1
+        await asyncio.sleep(self._latency * (1 + self._rng.uniform(-self._jitter, self._jitter)))
+        last = messages[-1]
+        if last.get("role") == "tool" or self._pattern == "answer":
+            return LLMResponse(content="Sure, done. " + "lorem ipsum " * 20, prompt_tokens=len(messages) * 40)
+
+        self._calls += 1
+        entity_id = f"light.room_{self._rng.randrange(self._entities)}"
+        if self._pattern == "lookup":
+            name, args = "ha_get_state", {"entity_id": entity_id}
+        else:
+            name, args = "ha_call_service", {"domain": "light", "service": "turn_on", "entity_id": entity_id}
+        return LLMResponse(content="", tool_calls=[{
+            "id": f"call_{self._calls}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args)},
+        }])
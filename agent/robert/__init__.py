@@ -2,6 +2,6 @@
 
 __version__ = "0.1.0"
 
-from robert.agent import process
+from robert.agent import aclose, process, process_stream
 
-__all__ = ["process"]
+__all__ = ["process", "process_stream", "aclose"]
@@ -4,18 +4,22 @@ This file exposes the clean API for external consumers (like api-router).
 No web dependencies, pure Python.
 """
 
-from robert.modules.agent import AgentResponse
+from contextlib import aclosing
+from typing import AsyncIterator
 
-__all__ = ["process"]
+from robert.modules.agent import AgentEvent, AgentResponse
+
+__all__ = ["process", "process_stream", "aclose"]
 
 # Lazy-initialized singleton (avoids import-time side effects)
 _agent = None
 
-def _get_agent():
+async def _get_agent():
     global _agent
     if _agent is None:
         from robert.composition.startup import create_agent_service
         _agent = create_agent_service()
+        await _agent.start()
     return _agent
 
 async def process(message: str, session_key: str = "default") -> AgentResponse:
@@ -26,4 +30,27 @@ async def process(message: str, session_key: str = "default") -> AgentResponse:
         resp = await robert.process("hello", "user1")
         print(resp.content)
     """
-    return await _get_agent().process(message, session_key)
+    agent = await _get_agent()
+    return await agent.process(message, session_key)
+
+async def process_stream(message: str, session_key: str = "default") -> AsyncIterator[AgentEvent]:
+    """Streaming variant of `process`.
+
+    Usage:
+        async for event in robert.process_stream("hello", "user1"):
+            if event.type == "text":
+                print(event.text, end="")
+            elif event.type == "done":
+                print(event.response.first_token_ms)
+    """
+    agent = await _get_agent()
+    async with aclosing(agent.process_stream(message, session_key)) as events:
+        async for event in events:
+            yield event
+
+async def aclose() -> None:
+    """Shut down the agent: close pooled connections and flush sessions."""
+    global _agent
+    if _agent is not None:
+        await _agent.aclose()
+        _agent = None
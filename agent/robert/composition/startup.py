@@ -4,31 +4,140 @@ import os
 from dotenv import load_dotenv
 
 from robert.modules.config import load_config
+from robert.modules.blobs import BlobStore
 from robert.modules.session import SessionManager
-from robert.modules.providers import OpenRouterAdapter
+from robert.modules.session_store import JsonlSessionStore, SqliteSessionStore
+from robert.modules.providers import CachingProvider, OpenRouterAdapter, RoutingProvider
 from robert.modules.agent import AgentService, ContextBuilder
+from robert.modules.context import ContextWindow
+from robert.modules.intents import IntentRouter
+from robert.modules.server import AgentServer
+from robert.modules.telemetry import Metrics
 from robert.modules.tools import ToolRegistry
 
 def create_agent_service(config_path: str = "config.json") -> AgentService:
-    """Wires up and returns a ready-to-use AgentService."""
+    """Wires up and returns a ready-to-use AgentService.
+
+    Call `await service.aclose()` on shutdown to release pooled connections
+    and write out buffered sessions.
+    """
     load_dotenv()
     
     # 1. Load config
     cfg = load_config(config_path)
     
     # 2. Initialize modules
-    sessions = SessionManager()
+    fsync = cfg.sessions.durability == "fsync"
+    if cfg.sessions.backend == "sqlite":
+        migrate = not os.path.exists(cfg.sessions.sqlite_path)
+        store = SqliteSessionStore(cfg.sessions.sqlite_path, fsync=fsync)
+        if migrate and os.path.isdir(cfg.sessions.directory):
+            store.import_jsonl(JsonlSessionStore(cfg.sessions.directory))
+    elif cfg.sessions.backend == "jsonl":
+        store = JsonlSessionStore(
+            cfg.sessions.directory,
+            fsync=fsync,
+            segment_bytes=cfg.sessions.segment_bytes,
+            rotate_keep=cfg.sessions.rotate_keep,
+        )
+    else:
+        raise ValueError(f"Unknown sessions.backend {cfg.sessions.backend!r} (use 'jsonl' or 'sqlite')")
+    sessions = SessionManager(
+        store=store,
+        load_last=cfg.sessions.load_last,
+        max_sessions=cfg.sessions.cache_max_sessions,
+        max_bytes=cfg.sessions.cache_max_bytes,
+        idle_seconds=cfg.sessions.cache_idle_seconds,
+        durability=cfg.sessions.durability,
+        flush_interval_ms=cfg.sessions.flush_interval_ms,
+        blobs=BlobStore(os.path.join(cfg.sessions.directory, "blobs")),
+        keep_answered_audio=cfg.sessions.keep_answered_audio,
+    )
     context = ContextBuilder()
+    window = ContextWindow(
+        max_tokens=cfg.context.max_tokens,
+        keep_recent_turns=cfg.context.keep_recent_turns,
+        summarize=cfg.context.summarize,
+    )
     tools = ToolRegistry(workspace_root=".", tool_configs=cfg.tools)
+    intents = None
+    if cfg.tools["homeassistant"].options.get("fastIntents") and tools.get("ha_find_entity") is not None:
+        intents = IntentRouter(tools)
     
-    # 3. Setup provider
-    api_key = os.environ.get("OPENROUTER_API_KEY")
-    provider = OpenRouterAdapter(api_key=api_key, model=cfg.model)
+    # 3. Setup provider (plus any fallback backends)
+    def adapter(model: str, api_key: str | None, url: str = "") -> OpenRouterAdapter:
+        return OpenRouterAdapter(
+            api_key=api_key,
+            model=model,
+            timeout=cfg.http.timeout,
+            connect_timeout=cfg.http.connect_timeout,
+            max_connections=cfg.http.max_connections,
+            max_keepalive=cfg.http.max_keepalive,
+            http2=cfg.http.http2,
+            prompt_cache=cfg.context.prompt_cache,
+            url=url,
+            max_retries=cfg.http.max_retries,
+            breaker_threshold=cfg.http.breaker_threshold,
+            breaker_reset=cfg.http.breaker_reset_seconds,
+        )
+
+    provider = adapter(cfg.model, os.environ.get("OPENROUTER_API_KEY"))
+    if cfg.routing.backends:
+        backends = {"openrouter": provider}
+        for b in cfg.routing.backends:
+            backends[b.name] = adapter(b.model, os.environ.get(b.api_key_env) if b.api_key_env else "", b.url)
+        provider = RoutingProvider(backends, hedge=cfg.routing.hedge)
+    if cfg.response_cache.enabled:
+        provider = CachingProvider(
+            provider,
+            model=cfg.model,
+            ttl=cfg.response_cache.ttl_seconds,
+            max_entries=cfg.response_cache.max_entries,
+            directory=cfg.response_cache.directory or None,
+        )
     
+    metrics = None
+    if cfg.telemetry.enabled:
+        metrics = Metrics(
+            file_path=cfg.telemetry.metrics_file,
+            host=cfg.telemetry.metrics_host,
+            port=cfg.telemetry.metrics_port or None,
+        )
+
     # 4. Compose Agent Service
     return AgentService(
         provider=provider,
         session_manager=sessions,
         context_builder=context,
-        tools=tools
+        tools=tools,
+        window=window,
+        max_concurrency=cfg.max_concurrency,
+        tool_concurrency=cfg.tool_concurrency,
+        tool_timeout=cfg.tool_timeout,
+        intents=intents,
+        metrics=metrics,
+        trace_responses=cfg.telemetry.trace_responses,
+    )
+
+def create_server(config_path: str = "config.json", agent: AgentService | None = None,
+                  host: str | None = None, port: int | None = None) -> AgentServer:
+    """Wires an AgentServer (for `robert serve`) around `agent` or a new AgentService.
+
+    `await server.run()` serves until SIGINT/SIGTERM, then drains and
+    closes the agent.
+    """
+    load_dotenv()
+    cfg = load_config(config_path).server
+    agent = agent or create_agent_service(config_path)
+    keys = os.environ.get(cfg.api_keys_env, "") if cfg.api_keys_env else ""
+    return AgentServer(
+        agent,
+        api_keys=[k.strip() for k in keys.split(",") if k.strip()],
+        host=host or cfg.host,
+        port=cfg.port if port is None else port,
+        max_pending=cfg.max_pending,
+        max_body=cfg.max_body_bytes,
+        drain_timeout=cfg.drain_seconds,
+        cors_origin=cfg.cors_origin,
+        metrics=agent.metrics,
     )
@@ -1,8 +1,9 @@
 """R.O.B.E.R.T. CLI Entry Point"""
 
 import asyncio
+import logging
 import typer
-from robert.composition.startup import create_agent_service
+from robert.composition.startup import create_agent_service, create_server
 
 app = typer.Typer(help="Agent R.O.B.E.R.T. CLI")
 
@@ -14,6 +15,7 @@ async def _chat_loop():
     typer.echo("-" * 40)
     
     session_key = "cli-default"
+    await _agent.start()
     
     while True:
         try:
@@ -29,11 +31,30 @@ async def _chat_loop():
         except Exception as e:
             typer.secho(f"Error: {e}", fg=typer.colors.RED)
 
+    await _agent.aclose()
+
 @app.command()
 def chat():
     """Start an interactive chat session."""
     asyncio.run(_chat_loop())
 
+@app.command()
+def serve(
+    host: str = typer.Option(None, help="Bind address (default: server.host in config.json)."),
+    port: int = typer.Option(None, help="Port (default: server.port in config.json)."),
+):
+    """Serve the /agent HTTP API until interrupted."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    server = create_server(agent=_agent, host=host, port=port)
+
+    async def run():
+        await _agent.start()
+        await server.run()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
 @app.command()
 def version():
     """Show version info."""
@@ -1,83 +1,363 @@
 """Agent module — handles prompt construction and the LLM interaction loop."""
 
-__all__ = ["AgentPort", "AgentResponse", "ContextBuilder", "AgentService"]
+__all__ = ["AgentPort", "AgentResponse", "AgentEvent", "ContextBuilder", "AgentService"]
 
 # ─── API (public contract) ───────────────────────────
 
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing, asynccontextmanager
 from dataclasses import dataclass
-from typing import Protocol
+from typing import AsyncIterator, Protocol
+
+from robert.modules.context import ContextWindow
+from robert.modules.intents import IntentRouter
+from robert.modules.providers import LLMStreamEvent
+from robert.modules.telemetry import Metrics, Trace
+from robert.modules.tools import ToolRegistry, ToolResult
+
 
 @dataclass
 class AgentResponse:
     content: str
     iterations: int
+    context_tokens: int = 0  # estimated prompt size of the last LLM request
+    first_token_ms: float | None = None  # streaming only: turn start -> first text chunk
+    prompt_tokens: int = 0  # provider-reported, summed over the turn's LLM calls
+    cached_tokens: int = 0  # of which served from the provider's prompt cache
+    error: str | None = None  # ProviderError code when the LLM call failed; content holds the message
+    trace: list | None = None  # timing spans (telemetry.Span) when the service runs with trace_responses
+
+@dataclass
+class AgentEvent:
+    """One step of a streamed turn.
+
+    type is "text" (a chunk of assistant text), "tool_start", "tool_end"
+    (text holds the tool result) or "done" (response holds the final
+    AgentResponse; always the last event).
+    """
+    type: str
+    text: str = ""
+    tool: str = ""
+    call_id: str = ""
+    response: AgentResponse | None = None
 
 class AgentPort(Protocol):
     async def process(self, message: str, session_key: str) -> AgentResponse: ...
+    def process_stream(self, message: str, session_key: str) -> AsyncIterator[AgentEvent]: ...
 
 
-import json
-from robert.modules.tools import ToolRegistry
-
 class AgentService:
     """The core agent logic.
     
     Wires together context building, provider calling, and tool execution.
+
+    Turns for the same session run strictly one after another (in arrival
+    order); turns for different sessions run concurrently, optionally capped
+    at `max_concurrency` turns in flight.
+
+    With an `intents` router, simple smart-home commands are executed
+    directly and recorded in the session as if the LLM had made the tool
+    call; everything else goes to the LLM.
+
+    Once a reply is delivered, history that has outgrown the context window
+    is summarized in the background; the session's next turn waits for it.
+
+    Every turn is traced (session load, prompt build, each provider and
+    tool call, each append, the commit). With `metrics`, traces feed its
+    counters and histograms; with `trace_responses`, the spans are also
+    attached to the AgentResponse.
     """
-    def __init__(self, provider, session_manager, context_builder, tools: ToolRegistry):
+    def __init__(
+        self,
+        provider,
+        session_manager,
+        context_builder,
+        tools: ToolRegistry,
+        window: ContextWindow | None = None,
+        max_concurrency: int = 0,
+        tool_concurrency: int = 4,
+        tool_timeout: float = 30.0,
+        intents: IntentRouter | None = None,
+        metrics: Metrics | None = None,
+        trace_responses: bool = False,
+    ):
         self._provider = provider
         self._sessions = session_manager
         self._context = context_builder
         self._tools = tools
+        self._window = window or ContextWindow()
         self._max_iterations = 20
+        self._admission = _Admission(max_concurrency)
+        self._tool_concurrency = max(1, tool_concurrency)
+        self._tool_timeout = tool_timeout
+        self._intents = intents
+        self._metrics = metrics
+        self._trace_responses = trace_responses
+        self._prefix: tuple[int, str, list[dict]] | None = None  # (tools.version, prompt, schemas)
+        self._summaries: dict[str, asyncio.Task] = {}  # storage key -> summary still being written
 
     async def process(self, message: str, session_key: str) -> AgentResponse:
-        # 1. Load session
-        session = self._sessions.get_session(session_key)
-        
+        async with aclosing(self._turn(message, session_key, stream=False)) as events:
+            async for event in events:
+                if event.type == "done":
+                    return event.response
+
+    async def process_stream(self, message: str, session_key: str) -> AsyncIterator[AgentEvent]:
+        """Like `process`, but yields text chunks and tool progress as they happen.
+
+        Persists exactly the same session records as `process`. Consume the
+        iterator to the end (or close it) so the session lock is released.
+        """
+        async with aclosing(self._turn(message, session_key, stream=True)) as events:
+            async for event in events:
+                yield event
+
+    async def _turn(self, message: str, session_key: str, stream: bool) -> AsyncIterator[AgentEvent]:
+        trace = Trace()
+        outcome = "failed"
+        key = self._sessions.storage_key(session_key)
+        async with self._admission.turn(key):
+            summary = self._summaries.pop(key, None)
+            if summary is not None:
+                with trace.span("context.consolidate"):
+                    await summary
+            # 1. Load session
+            with trace.span("session.load"):
+                session = self._sessions.acquire(session_key)
+            try:
+                async for event in self._run_turn(session, message, stream, trace):
+                    if event.type == "done":
+                        outcome = _outcome(event.response)
+                        if self._trace_responses:
+                            event.response.trace = trace.spans  # the commit span below lands here too
+                    yield event
+            finally:
+                # Group-commit everything this turn appended
+                try:
+                    with trace.span("session.commit"):
+                        await session.commit()
+                finally:
+                    if outcome == "ok" and self._window.needs_consolidation(session):
+                        # Summarize after the reply is out; the session's next turn waits for it
+                        self._summaries[key] = asyncio.create_task(self._consolidate(key, session))
+                    else:
+                        self._sessions.release(session)
+                if self._metrics is not None:
+                    self._metrics.record_turn(trace, outcome)
+
+    async def _consolidate(self, key: str, session):
+        """Fold old history into the summary; releases the turn's hold on `session`."""
+        try:
+            await self._window.consolidate(session, self._provider)
+            await session.commit()
+        except Exception:
+            _log.exception("Could not summarize session %s", session.key)
+        finally:
+            self._sessions.release(session)
+            if self._summaries.get(key) is asyncio.current_task():
+                del self._summaries[key]
+
+    async def start(self):
+        """Start background services (the metrics endpoint, if configured); call once at startup."""
+        if self._metrics is not None:
+            await self._metrics.start()
+
+    @property
+    def metrics(self) -> Metrics | None:
+        return self._metrics
+
+    async def aclose(self):
+        """Finish pending summaries, release provider connections and tool
+        resources; write out cached sessions."""
+        summaries, self._summaries = list(self._summaries.values()), {}
+        await asyncio.gather(*summaries)
+        for component in (self._provider, self._tools, self._metrics):
+            close = getattr(component, "aclose", None)
+            if close is not None:
+                await close()
+        self._sessions.close()
+
+    def stats(self) -> dict:
+        """Concurrency counters: turns running, turns queued, and the queue's high-water mark.
+
+        With an intent router, "intents" holds its hit rate and estimated time saved.
+        """
+        stats = self._admission.stats()
+        if self._intents is not None:
+            stats["intents"] = self._intents.stats()
+        return stats
+
+    def _system_prefix(self) -> tuple[str, list[dict]]:
+        """System prompt and tool schemas, rebuilt only when the tool registry changes.
+
+        Both lead every request, so keeping them byte-identical between turns
+        lets the provider's prompt cache reuse the prefix.
+        """
+        version = self._tools.version
+        if self._prefix is None or self._prefix[0] != version:
+            schemas = self._tools.get_all_schemas()
+            self._prefix = (version, self._context.build_system_prompt(tools=schemas), schemas)
+        return self._prefix[1], self._prefix[2]
+
+    async def _run_turn(self, session, message: str, stream: bool, trace: Trace) -> AsyncIterator[AgentEvent]:
+        started = time.perf_counter()
+        first_token_ms = None
+
         if message.startswith("data:audio"):
             # It's an audio payload
-            session.add_user_audio_message(message)
+            with trace.span("session.append", role="user"):
+                session.add_user_audio_message(message)
         else:
-            session.add_user_message(message)
-        
-        # 2. Build system prompt
-        tool_schemas = self._tools.get_all_schemas()
-        system_prompt = self._context.build_system_prompt(tools=tool_schemas)
-        
+            with trace.span("session.append", role="user"):
+                session.add_user_message(message)
+            if self._intents is not None:
+                with trace.span("intent.route") as span:
+                    hit = await self._intents.route(message)
+                    span["hit"] = hit is not None
+                if hit is not None:
+                    async for event in self._answer_locally(session, hit, stream, started, trace):
+                        yield event
+                    return
+
+        # 2. System prompt (memoized)
+        with trace.span("prompt.build"):
+            system_prompt, tool_schemas = self._system_prefix()
+            view = self._window.open(session, system_prompt)
+
         iterations = 0
+        context_tokens = 0
+        prompt_tokens = cached_tokens = 0
+        limit = asyncio.Semaphore(self._tool_concurrency)
         while iterations < self._max_iterations:
             iterations += 1
             
-            # 3. Call LLM
-            messages = session.get_messages_for_llm(system_prompt)
-            response = await self._provider.chat(messages, tools=tool_schemas)
-            
+            # 3. Call LLM (the view only appends what changed since the last iteration)
+            with trace.span("prompt.build", iteration=iterations):
+                messages, context_tokens = view.sync()
+            with trace.span("provider.chat", iteration=iterations) as span:
+                if stream:
+                    response = None
+                    async for chunk in self._stream_llm(messages, tool_schemas):
+                        if chunk.text:
+                            if first_token_ms is None:
+                                first_token_ms = (time.perf_counter() - started) * 1000
+                            yield AgentEvent("text", text=chunk.text)
+                        if chunk.response is not None:
+                            response = chunk.response
+                else:
+                    response = await self._provider.chat(messages, tools=tool_schemas)
+                if response.is_error:
+                    span["error"] = response.error.code if response.error else "provider_error"
+            prompt_tokens += response.prompt_tokens
+            cached_tokens += response.cached_tokens
+
+            if response.is_error:
+                # Report provider failures to the caller, but never persist them as the answer
+                yield AgentEvent("done", response=AgentResponse(
+                    content=response.content,
+                    iterations=iterations,
+                    context_tokens=context_tokens,
+                    first_token_ms=first_token_ms,
+                    prompt_tokens=prompt_tokens,
+                    cached_tokens=cached_tokens,
+                    error=response.error.code if response.error else "provider_error",
+                ))
+                return
+
             # 4. Handle tool calls
             if response.tool_calls:
                 # Add the 'assistant' message with tool_calls to history
-                session.add_tool_call_message(response.content, response.tool_calls)
+                with trace.span("session.append", role="assistant"):
+                    session.add_tool_call_message(response.content, response.tool_calls)
                 
-                for tc in response.tool_calls:
-                    f = tc.get("function", {})
-                    name = f.get("name")
-                    args = json.loads(f.get("arguments", "{}"))
-                    call_id = tc.get("id")
-                    
-                    # Execute tool
-                    result = await self._tools.call(name, **args)
-                    
-                    # Add 'tool' result message to history
-                    session.add_tool_result_message(call_id, result.content)
+                # Independent calls run concurrently; results are stored in call order
+                calls = [_parse_tool_call(tc) for tc in response.tool_calls]
+                for batch in _batches(calls, self._tools.is_parallel_safe):
+                    for call in batch:
+                        yield AgentEvent("tool_start", tool=call.name, call_id=call.call_id)
+                    results = await asyncio.gather(*(self._execute_tool(call, limit, trace) for call in batch))
+                    for call, result in zip(batch, results):
+                        # Add 'tool' result message to history
+                        with trace.span("session.append", role="tool"):
+                            session.add_tool_result_message(call.call_id, result.content)
+                        yield AgentEvent("tool_end", text=result.content, tool=call.name, call_id=call.call_id)
                 
                 # Continue loop to let LLM see the tool outputs
                 continue
             
             # 5. Final response (no tool calls)
-            session.add_assistant_message(response.content)
-            return AgentResponse(content=response.content, iterations=iterations)
+            with trace.span("session.append", role="assistant"):
+                session.add_assistant_message(response.content)
+            if self._intents is not None:
+                self._intents.observe_llm_turn((time.perf_counter() - started) * 1000)
+            yield AgentEvent("done", response=AgentResponse(
+                content=response.content,
+                iterations=iterations,
+                context_tokens=context_tokens,
+                first_token_ms=first_token_ms,
+                prompt_tokens=prompt_tokens,
+                cached_tokens=cached_tokens,
+            ))
+            return
 
-        return AgentResponse(content="Error: Max iterations reached", iterations=iterations)
+        yield AgentEvent("done", response=AgentResponse(
+            content="Error: Max iterations reached",
+            iterations=iterations,
+            context_tokens=context_tokens,
+            first_token_ms=first_token_ms,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+        ))
+
+    async def _answer_locally(self, session, hit, stream: bool, started: float, trace: Trace) -> AsyncIterator[AgentEvent]:
+        """Record an intent fast-path hit exactly like an LLM tool round-trip."""
+        call_id = hit.tool_call["id"]
+        name = hit.tool_call["function"]["name"]
+        with trace.span("session.append", role="assistant"):
+            session.add_tool_call_message("", [hit.tool_call])
+        yield AgentEvent("tool_start", tool=name, call_id=call_id)
+        with trace.span("session.append", role="tool"):
+            session.add_tool_result_message(call_id, hit.result.content)
+        yield AgentEvent("tool_end", text=hit.result.content, tool=name, call_id=call_id)
+        with trace.span("session.append", role="assistant"):
+            session.add_assistant_message(hit.reply)
+        first_token_ms = None
+        if stream:
+            first_token_ms = (time.perf_counter() - started) * 1000
+            yield AgentEvent("text", text=hit.reply)
+        yield AgentEvent("done", response=AgentResponse(content=hit.reply, iterations=0, first_token_ms=first_token_ms))
+
+    async def _execute_tool(self, call: "_ToolCall", limit: asyncio.Semaphore, trace: Trace) -> ToolResult:
+        if call.error:
+            return ToolResult(call.error, is_error=True)
+        async with limit:
+            with trace.span("tool", tool=call.name) as span:
+                timeout = self._tool_timeout
+                own = self._tools.time_limit(call.name)
+                if own is not None:
+                    # The tool's own timeout governs; it needs a moment to clean up after it fires
+                    timeout = max(timeout, own + _TOOL_CLEANUP_SECONDS)
+                try:
+                    result = await asyncio.wait_for(self._tools.call(call.name, **call.args), timeout)
+                except asyncio.TimeoutError:
+                    result = ToolResult(f"Error: Tool '{call.name}' timed out after {timeout:g}s.", is_error=True)
+                except Exception as e:
+                    result = ToolResult(f"Error: Tool '{call.name}' failed: {e}", is_error=True)
+                span["error"] = result.is_error
+        return result
+
+    async def _stream_llm(self, messages: list[dict], tools: list[dict]) -> AsyncIterator[LLMStreamEvent]:
+        stream = getattr(self._provider, "chat_stream", None)
+        if stream is None:
+            # Provider cannot stream: deliver its whole answer as one chunk
+            response = await self._provider.chat(messages, tools=tools)
+            yield LLMStreamEvent(text=response.content, response=response)
+            return
+        async for chunk in stream(messages, tools=tools):
+            yield chunk
 
 
 class ContextBuilder:
@@ -103,3 +383,111 @@ class ContextBuilder:
 
 
 # ─── INTERNAL (private — do not import from outside) ──
+
+_log = logging.getLogger(__name__)
+
+_TOOL_CLEANUP_SECONDS = 2.0
+
+@dataclass
+class _ToolCall:
+    call_id: str
+    name: str
+    args: dict
+    error: str = ""
+
+def _outcome(response: AgentResponse) -> str:
+    """Label for the robert_turns_total metric."""
+    if response.error:
+        return "error"
+    if response.iterations == 0:
+        return "intent"
+    return "ok"
+
+def _parse_tool_call(tc: dict) -> _ToolCall:
+    f = tc.get("function", {})
+    name = f.get("name")
+    try:
+        args = json.loads(f.get("arguments") or "{}")
+    except json.JSONDecodeError as e:
+        return _ToolCall(tc.get("id"), name, {}, f"Error: Invalid JSON arguments for '{name}': {e}")
+    if not isinstance(args, dict):
+        return _ToolCall(tc.get("id"), name, {}, f"Error: Arguments for '{name}' must be a JSON object.")
+    return _ToolCall(tc.get("id"), name, args)
+
+def _batches(calls: list[_ToolCall], is_parallel_safe) -> list[list[_ToolCall]]:
+    """Group consecutive parallel-safe calls; an unsafe call always runs on its own."""
+    batches: list[list[_ToolCall]] = []
+    previous_safe = False
+    for call in calls:
+        safe = is_parallel_safe(call.name)
+        if safe and previous_safe:
+            batches[-1].append(call)
+        else:
+            batches.append([call])
+        previous_safe = safe
+    return batches
+
+class _Admission:
+    """Per-session FIFO locks plus an optional global cap on turns in flight.
+
+    A session's lock lives only while some turn holds or waits for it, so the
+    registry never grows beyond the number of sessions currently busy.
+    """
+    def __init__(self, max_concurrency: int = 0):
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+
+    @asynccontextmanager
+    async def turn(self, key: str):
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await lock.acquire()
+            if self._slots is not None:
+                try:
+                    await self._slots.acquire()
+                except BaseException:
+                    lock.release()
+                    raise
+        except BaseException:
+            # Cancelled while queued
+            self.waiting -= 1
+            self._release_key(key)
+            raise
+
+        self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            if self._slots is not None:
+                self._slots.release()
+            lock.release()
+            self._release_key(key)
+
+    def _release_key(self, key: str):
+        lock, users = self._locks[key]
+        if users <= 1:
+            del self._locks[key]
+        else:
+            self._locks[key] = (lock, users - 1)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "locked_sessions": len(self._locks),
+        }
@@ -0,0 +1,59 @@
+"""Blobs module — content-addressed storage for binary attachments (audio)."""
+
+__all__ = ["BlobStore", "parse_data_uri", "to_data_uri"]
+
+# ─── API (public contract) ───────────────────────────
+
+import base64
+import hashlib
+import os
+
+from robert.modules.files import atomic_write
+
+
+def parse_data_uri(uri: str) -> tuple[str, bytes] | None:
+    """Split a `data:<mime>;base64,<payload>` URI into (mime, raw bytes)."""
+    if not uri.startswith("data:"):
+        return None
+    header, sep, payload = uri.partition(",")
+    if not sep or not header.endswith(";base64"):
+        return None
+    mime = header[len("data:"):-len(";base64")]
+    try:
+        return mime, base64.b64decode(payload, validate=True)
+    except ValueError:
+        return None
+
+def to_data_uri(mime: str, data: bytes) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+class BlobStore:
+    """Stores each distinct payload once, under its SHA-256 digest.
+
+    Layout: `<directory>/<first 2 hex chars>/<full hex digest>`. Writing the
+    same bytes twice is a no-op, so a re-sent recording costs no extra disk.
+    """
+    def __init__(self, directory: str = os.path.join("sessions", "blobs")):
+        self._dir = directory
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def _path(self, digest: str) -> str:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self._dir, digest[:2], digest)
+
+# ─── INTERNAL (private) ──
@@ -12,12 +12,86 @@ import os
 class ToolConfig:
     enabled: bool = False
     allowlist: list[str] = field(default_factory=list)
+    options: dict = field(default_factory=dict)  # tool-specific settings (any other keys)
+
+@dataclass
+class SessionConfig:
+    cache_max_sessions: int = 64
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_idle_seconds: float = 1800.0
+    durability: str = "flush"  # "none" | "flush" | "fsync"
+    flush_interval_ms: int = 0
+    keep_answered_audio: int = 0
+    backend: str = "jsonl"  # "jsonl" | "sqlite"
+    directory: str = "sessions"  # JSONL files and audio blobs (for a new SQLite database, the files to import)
+    sqlite_path: str = "sessions/sessions.db"
+    load_last: int = 0  # messages loaded per session; 0 = whole history
+    segment_bytes: int = 4 * 1024 * 1024  # JSONL: rotate a session file past this size; 0 = never
+    rotate_keep: int = 200  # JSONL: messages left after a rotation (at most half a segment)
+
+@dataclass
+class ContextConfig:
+    max_tokens: int = 32000
+    keep_recent_turns: int = 4
+    summarize: bool = True
+    prompt_cache: bool = False  # mark the system prompt with cache_control
+
+@dataclass
+class HttpConfig:
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive: int = 10
+    http2: bool = False
+    max_retries: int = 2  # for 429/5xx/timeouts, with jittered exponential backoff
+    breaker_threshold: int = 5  # consecutive failed requests before fast-failing
+    breaker_reset_seconds: float = 30.0
+
+@dataclass
+class ResponseCacheConfig:
+    enabled: bool = False
+    ttl_seconds: float = 300.0
+    max_entries: int = 256
+    directory: str = ""  # empty = memory only
+
+@dataclass
+class BackendConfig:
+    name: str
+    url: str  # any OpenAI-compatible chat/completions endpoint
+    model: str
+    api_key_env: str = ""  # env var holding the key; empty = no auth
+
+@dataclass
+class RoutingConfig:
+    backends: list[BackendConfig] = field(default_factory=list)  # tried after the main OpenRouter model
+    hedge: bool = False
+
+@dataclass
+class TelemetryConfig:
+    enabled: bool = False
+    metrics_file: str = ""  # Prometheus textfile; empty = none
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0  # GET /metrics endpoint; 0 = none
+    trace_responses: bool = False  # attach timing spans to every AgentResponse
+
+@dataclass
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8787
+    api_keys_env: str = "ROBERT_API_KEYS"  # comma-separated bearer keys; unset = no auth
+    max_pending: int = 64  # agent requests accepted at once; more get 503
+    max_body_bytes: int = 16 * 1024 * 1024
+    drain_seconds: float = 30.0
+    cors_origin: str = ""  # e.g. "*" for the browser chat client; empty = no CORS headers
 
 @dataclass
 class AgentConfig:
     provider: str = "openrouter"
     model: str = "google/gemini-2.0-flash-001"
     restrict_to_workspace: bool = True
+    max_concurrency: int = 0  # turns in flight across all sessions; 0 = unlimited
+    tool_concurrency: int = 4  # parallel tool calls within one LLM response
+    tool_timeout: float = 30.0  # the shell's own (command) timeouts win when longer
     tools: dict[str, ToolConfig] = field(default_factory=lambda: {
         "shell": ToolConfig(),
         "fileWrite": ToolConfig(),
@@ -26,6 +100,13 @@ class AgentConfig:
         "mcp": ToolConfig(),
         "homeassistant": ToolConfig(),
     })
+    sessions: SessionConfig = field(default_factory=SessionConfig)
+    context: ContextConfig = field(default_factory=ContextConfig)
+    http: HttpConfig = field(default_factory=HttpConfig)
+    response_cache: ResponseCacheConfig = field(default_factory=ResponseCacheConfig)
+    routing: RoutingConfig = field(default_factory=RoutingConfig)
+    telemetry: TelemetryConfig = field(default_factory=TelemetryConfig)
+    server: ServerConfig = field(default_factory=ServerConfig)
 
 def load_config(path: str = "config.json") -> AgentConfig:
     """Load config from JSON or return defaults."""
@@ -43,13 +124,102 @@ def load_config(path: str = "config.json") -> AgentConfig:
             tools[name] = ToolConfig(
                 enabled=raw.get("enabled", False),
                 allowlist=raw.get("allowlist", []),
+                options={k: v for k, v in raw.items() if k not in ("enabled", "allowlist")},
+            )
+
+    raw_sessions = data.get("sessions", {})
+    sessions = SessionConfig(
+        cache_max_sessions=raw_sessions.get("cacheMaxSessions", 64),
+        cache_max_bytes=raw_sessions.get("cacheMaxBytes", 64 * 1024 * 1024),
+        cache_idle_seconds=raw_sessions.get("cacheIdleSeconds", 1800.0),
+        durability=raw_sessions.get("durability", "flush"),
+        flush_interval_ms=raw_sessions.get("flushIntervalMs", 0),
+        keep_answered_audio=raw_sessions.get("keepAnsweredAudio", 0),
+        backend=raw_sessions.get("backend", "jsonl"),
+        directory=raw_sessions.get("directory", "sessions"),
+        sqlite_path=raw_sessions.get("sqlitePath", "sessions/sessions.db"),
+        load_last=raw_sessions.get("loadLast", 0),
+        segment_bytes=raw_sessions.get("segmentBytes", 4 * 1024 * 1024),
+        rotate_keep=raw_sessions.get("rotateKeep", 200),
+    )
+
+    raw_context = data.get("context", {})
+    context = ContextConfig(
+        max_tokens=raw_context.get("maxTokens", 32000),
+        keep_recent_turns=raw_context.get("keepRecentTurns", 4),
+        summarize=raw_context.get("summarize", True),
+        prompt_cache=raw_context.get("promptCache", False),
+    )
+
+    raw_http = data.get("http", {})
+    http = HttpConfig(
+        timeout=raw_http.get("timeout", 60.0),
+        connect_timeout=raw_http.get("connectTimeout", 10.0),
+        max_connections=raw_http.get("maxConnections", 20),
+        max_keepalive=raw_http.get("maxKeepalive", 10),
+        http2=raw_http.get("http2", False),
+        max_retries=raw_http.get("maxRetries", 2),
+        breaker_threshold=raw_http.get("breakerThreshold", 5),
+        breaker_reset_seconds=raw_http.get("breakerResetSeconds", 30.0),
+    )
+
+    raw_cache = data.get("responseCache", {})
+    response_cache = ResponseCacheConfig(
+        enabled=raw_cache.get("enabled", False),
+        ttl_seconds=raw_cache.get("ttlSeconds", 300.0),
+        max_entries=raw_cache.get("maxEntries", 256),
+        directory=raw_cache.get("directory", ""),
+    )
+
+    raw_routing = data.get("routing", {})
+    routing = RoutingConfig(
+        backends=[
+            BackendConfig(
+                name=b.get("name") or b["url"],
+                url=b["url"],
+                model=b.get("model", ""),
+                api_key_env=b.get("apiKeyEnv", ""),
             )
+            for b in raw_routing.get("backends", [])
+        ],
+        hedge=raw_routing.get("hedge", False),
+    )
+
+    raw_telemetry = data.get("telemetry", {})
+    telemetry = TelemetryConfig(
+        enabled=raw_telemetry.get("enabled", False),
+        metrics_file=raw_telemetry.get("metricsFile", ""),
+        metrics_host=raw_telemetry.get("metricsHost", "127.0.0.1"),
+        metrics_port=raw_telemetry.get("metricsPort", 0),
+        trace_responses=raw_telemetry.get("traceResponses", False),
+    )
+
+    raw_server = data.get("server", {})
+    server = ServerConfig(
+        host=raw_server.get("host", "127.0.0.1"),
+        port=raw_server.get("port", 8787),
+        api_keys_env=raw_server.get("apiKeysEnv", "ROBERT_API_KEYS"),
+        max_pending=raw_server.get("maxPending", 64),
+        max_body_bytes=raw_server.get("maxBodyBytes", 16 * 1024 * 1024),
+        drain_seconds=raw_server.get("drainSeconds", 30.0),
+        cors_origin=raw_server.get("corsOrigin", ""),
+    )
 
     return AgentConfig(
         provider=data.get("provider", "openrouter"),
         model=data.get("model", "google/gemini-2.0-flash-001"),
         restrict_to_workspace=data.get("restrictToWorkspace", True),
+        max_concurrency=data.get("maxConcurrency", 0),
+        tool_concurrency=data.get("toolConcurrency", 4),
+        tool_timeout=data.get("toolTimeout", 30.0),
         tools=tools,
+        sessions=sessions,
+        context=context,
+        http=http,
+        response_cache=response_cache,
+        routing=routing,
+        telemetry=telemetry,
+        server=server,
     )
 
 # ─── INTERNAL (private) ──
@@ -0,0 +1,174 @@
+"""Context module — fits session history into the model's token budget."""
+
+__all__ = ["ContextWindow", "ContextView", "estimate_tokens"]
+
+# ─── API (public contract) ───────────────────────────
+
+import json
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    """Cheap token estimate (~4 characters per token) for a list of LLM messages."""
+    return sum(_message_tokens(m) for m in messages)
+
+class ContextWindow:
+    """Selects which history goes into an LLM request and folds the rest into a summary.
+
+    `build` always keeps the system prompt and the newest turn, and only cuts
+    history at user messages, so an assistant `tool_calls` message is never
+    separated from its `tool` results. `consolidate` asks the provider to fold
+    everything but the last `keep_recent_turns` turns into the session's
+    persisted summary once the uncovered history grows past
+    `summarize_ratio` of the budget.
+    """
+    def __init__(
+        self,
+        max_tokens: int = 32000,
+        keep_recent_turns: int = 4,
+        summarize: bool = True,
+        summarize_ratio: float = 0.75,
+    ):
+        self._max_tokens = max_tokens
+        self._keep_recent_turns = keep_recent_turns
+        self._summarize = summarize
+        self._summarize_ratio = summarize_ratio
+
+    @property
+    def max_tokens(self) -> int:
+        return self._max_tokens
+
+    def build(self, session, system_prompt: str) -> tuple[list[dict], int]:
+        """Return (messages, estimated tokens) for the next LLM request."""
+        head = [{"role": "system", "content": system_prompt}]
+        if session.summary:
+            head.append({"role": "system", "content": _SUMMARY_PREFIX + session.summary})
+
+        history = session.history_for_llm(session.summary_start)
+        tokens = estimate_tokens(head)
+        costs = [_message_tokens(m) for m in history]
+        total = tokens + sum(costs)
+
+        # Drop the oldest turns until we fit, but never the newest one.
+        cut = 0
+        boundaries = _turn_starts(history)
+        for b in boundaries[1:]:
+            if total <= self._max_tokens:
+                break
+            total -= sum(costs[cut:b])
+            cut = b
+        return head + history[cut:], total
+
+    def open(self, session, system_prompt: str) -> "ContextView":
+        """Start an incremental view for one turn (see `ContextView`)."""
+        return ContextView(self, session, system_prompt)
+
+    def needs_consolidation(self, session) -> bool:
+        """Whether `consolidate` would summarize anything (no LLM call)."""
+        return self._fold_point(session) is not None
+
+    async def consolidate(self, session, provider) -> bool:
+        """Fold old history into the session summary if it has grown too large."""
+        upto = self._fold_point(session)
+        if upto is None:
+            return False
+        messages = session.messages
+        start = session.summary_start
+
+        transcript = "\n".join(_transcript_line(m) for m in messages[start:upto])
+        prompt = [
+            {"role": "system", "content": _SUMMARIZE_PROMPT},
+            {"role": "user", "content": (
+                f"Previous summary:\n{session.summary or '(none)'}\n\n"
+                f"New conversation to fold in:\n{transcript}"
+            )},
+        ]
+        response = await provider.chat(prompt)
+        if response.is_error or not response.content.strip():
+            return False
+        session.add_summary(response.content.strip(), upto)
+        return True
+
+    def _fold_point(self, session) -> int | None:
+        """Index up to which history should be summarized, or None if it fits."""
+        if not self._summarize:
+            return None
+        start = session.summary_start
+        uncovered = session.history_for_llm(start)
+        if estimate_tokens(uncovered) < self._max_tokens * self._summarize_ratio:
+            return None
+
+        boundaries = [start + b for b in _turn_starts(uncovered)]
+        if len(boundaries) <= self._keep_recent_turns:
+            return None
+        return boundaries[-self._keep_recent_turns] if self._keep_recent_turns else len(session.messages)
+
+class ContextView:
+    """The message list of one turn, extended in place between loop iterations.
+
+    The first `sync` selects history through `ContextWindow.build`; later
+    calls only append the messages the session gained since (tool calls and
+    their results), reusing their cached wire dicts. The list is rebuilt only
+    if the turn itself outgrows the budget.
+    """
+    def __init__(self, window: ContextWindow, session, system_prompt: str):
+        self._window = window
+        self._session = session
+        self._system_prompt = system_prompt
+        self.messages: list[dict] = []
+        self.tokens = 0
+        self._synced = -1
+
+    def sync(self) -> tuple[list[dict], int]:
+        count = len(self._session.messages)
+        if self._synced < 0:
+            self.messages, self.tokens = self._window.build(self._session, self._system_prompt)
+        elif count > self._synced:
+            new = self._session.history_for_llm(self._synced)
+            self.messages.extend(new)
+            self.tokens += estimate_tokens(new)
+            if self.tokens > self._window.max_tokens:
+                self.messages, self.tokens = self._window.build(self._session, self._system_prompt)
+        self._synced = count
+        return self.messages, self.tokens
+
+# ─── INTERNAL (private) ──
+
+_SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_SUMMARIZE_PROMPT = (
+    "You maintain the long-term memory of an assistant. Merge the previous summary and "
+    "the new conversation into one concise summary. Keep facts about the user, decisions, "
+    "open tasks and device names. Write plain text, no more than 200 words."
+)
+
+# Per-message overhead for role/formatting tokens.
+_MESSAGE_OVERHEAD = 4
+
+def _message_tokens(m: dict) -> int:
+    content = m.get("content") or ""
+    if isinstance(content, str) and content.startswith("data:audio"):
+        # Audio is billed by duration, not by base64 length: roughly 1 token per KB of WAV.
+        tokens = len(content) * 3 // 4 // 1000
+    elif isinstance(content, str):
+        tokens = len(content) // 4
+    else:
+        tokens = len(json.dumps(content)) // 4
+    if m.get("tool_calls"):
+        tokens += len(json.dumps(m["tool_calls"])) // 4
+    return tokens + _MESSAGE_OVERHEAD
+
+def _turn_starts(history: list[dict]) -> list[int]:
+    """Indexes where a turn begins (a user message), the only safe places to cut."""
+    starts = [i for i, m in enumerate(history) if m.get("role") == "user"]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return starts
+
+def _transcript_line(m) -> str:
+    if m.role == "tool":
+        return f"tool result: {m.content[:500]}"
+    if m.tool_calls:
+        names = ", ".join(tc.get("function", {}).get("name", "?") for tc in m.tool_calls)
+        return f"assistant called tools: {names}"
+    content = "[audio message]" if m.content.startswith("data:audio") else m.content
+    return f"{m.role}: {content}"
@@ -0,0 +1,49 @@
+"""Files module — crash-safe file replacement shared by the other modules."""
+
+__all__ = ["atomic_write"]
+
+# ─── API (public contract) ───────────────────────────
+
+import os
+import tempfile
+
+
+def atomic_write(path: str, data: str | bytes, fsync: bool = False):
+    """Replace `path` with `data` through a temp file in the same directory.
+
+    Readers (and a process restarted after a crash) see either the old file
+    or the complete new one, never a half-written file. The file keeps the
+    mode of the one it replaces; a new file gets the mode open() would give
+    it. With `fsync`, the data is on disk before the rename.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp creates 0600
+            try:
+                os.fchmod(f.fileno(), os.stat(path).st_mode & 0o7777)
+            except FileNotFoundError:
+                os.fchmod(f.fileno(), 0o666 & ~_UMASK)
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+# ─── INTERNAL (private) ──
+
+def _current_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# Read once at import: os.umask can only be read by setting it, which would race with I/O threads
+_UMASK = _current_umask()
@@ -0,0 +1,134 @@
+"""Intents module — answers simple smart-home commands without an LLM round-trip."""
+
+__all__ = ["IntentRouter", "IntentHit"]
+
+# ─── API (public contract) ───────────────────────────
+
+import json
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+from robert.modules.tools import ToolRegistry, ToolResult
+
+
+@dataclass
+class IntentHit:
+    tool_call: dict  # OpenAI-format tool call, exactly as the LLM would have sent it
+    result: ToolResult
+    reply: str
+
+class IntentRouter:
+    """Deterministic fast path for "turn on/off the X" commands.
+
+    A command is handled only when it matches a known phrasing and the
+    `ha_find_entity` index resolves the target to exactly one switchable
+    entity with high confidence. Anything else (no match, several similar
+    entities, "all the lights", a failed service call) returns None and the
+    turn goes to the LLM as usual.
+    """
+    def __init__(self, tools: ToolRegistry, min_score: float = 0.8, margin: float = 0.1):
+        self._tools = tools
+        self._min_score = min_score
+        self._margin = margin
+        self.hits = 0
+        self.misses = 0  # no known phrasing
+        self.ambiguous = 0  # phrasing matched, target did not resolve to one entity
+        self.errors = 0
+        self._fast_ms = 0.0
+        self._llm_turns = 0
+        self._llm_ms = 0.0
+
+    async def route(self, message: str) -> IntentHit | None:
+        started = time.perf_counter()
+        parsed = _parse(message)
+        finder = self._tools.get("ha_find_entity")
+        if parsed is None or finder is None:
+            self.misses += 1
+            return None
+        service, target = parsed
+
+        try:
+            await finder.refresh()
+        except Exception as e:
+            _log.warning("Intent fast path skipped, entity index unavailable: %s", e)
+            self.errors += 1
+            return None
+        matches = finder.index.search(target, limit=2)
+        if not self._confident(matches):
+            self.ambiguous += 1
+            return None
+
+        entity = matches[0]
+        args = {"domain": entity.domain, "service": service, "entity_id": entity.entity_id}
+        result = await self._tools.call("ha_call_service", **args)
+        if result.is_error:
+            self.errors += 1
+            return None
+
+        self.hits += 1
+        self._fast_ms += (time.perf_counter() - started) * 1000
+        return IntentHit(
+            tool_call={
+                "id": f"intent_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": "ha_call_service", "arguments": json.dumps(args)},
+            },
+            result=result,
+            reply=f"Turned {service[len('turn_'):]} {entity.name or entity.entity_id}.",
+        )
+
+    def observe_llm_turn(self, ms: float):
+        """Record how long a turn answered by the LLM took (baseline for `saved_ms`)."""
+        self._llm_turns += 1
+        self._llm_ms += ms
+
+    def stats(self) -> dict:
+        routed = self.hits + self.misses + self.ambiguous + self.errors
+        fast_avg = self._fast_ms / self.hits if self.hits else 0.0
+        llm_avg = self._llm_ms / self._llm_turns if self._llm_turns else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "ambiguous": self.ambiguous,
+            "errors": self.errors,
+            "hit_rate": self.hits / routed if routed else 0.0,
+            "avg_fast_ms": round(fast_avg, 2),
+            "avg_llm_turn_ms": round(llm_avg, 2),
+            "saved_ms": round(self.hits * max(0.0, llm_avg - fast_avg), 1),
+        }
+
+    def _confident(self, matches) -> bool:
+        if not matches or matches[0].domain not in _SWITCHABLE or matches[0].score < self._min_score:
+            return False
+        return len(matches) == 1 or matches[1].score <= matches[0].score - self._margin
+
+# ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+_SWITCHABLE = {"light", "switch", "fan", "input_boolean"}
+
+_PATTERNS = [
+    re.compile(r"^(?:turn|switch) (on|off) (?:the )?(.+)$"),
+    re.compile(r"^(?:turn|switch) (?:the )?(.+?) (on|off)$"),
+]
+
+# Targets that name several entities are left to the LLM
+_PLURAL = re.compile(r"\b(?:all|every|everything|and)\b")
+
+def _parse(message: str) -> tuple[str, str] | None:
+    """'Please turn on the kitchen light!' -> ('turn_on', 'kitchen light')."""
+    text = " ".join(message.lower().split()).strip(" .!?")
+    text = text.removeprefix("please ").removesuffix(" please").strip(" ,")
+    for i, pattern in enumerate(_PATTERNS):
+        m = pattern.match(text)
+        if m is None:
+            continue
+        state, target = m.groups() if i == 0 else reversed(m.groups())
+        if not target or _PLURAL.search(target):
+            return None
+        return f"turn_{state}", target
+    return None
@@ -1,40 +1,173 @@
 """Provider module — adapter for LLM services (OpenRouter)."""
 
-__all__ = ["LLMResponse", "ProviderPort", "OpenRouterAdapter"]
+__all__ = [
+    "LLMResponse", "LLMStreamEvent", "ProviderError", "ProviderPort", "OpenRouterAdapter", "CachingProvider", "RoutingProvider",
+]
 
 # ─── API (public contract) ───────────────────────────
 
+from collections import OrderedDict, deque
+from contextlib import aclosing
 from dataclasses import dataclass, field
-from typing import Protocol
+from typing import AsyncIterator, Protocol
+from email.utils import parsedate_to_datetime
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import random
+import time
+import uuid
 import httpx
+from robert.modules.files import atomic_write
+
+@dataclass
+class ProviderError:
+    """Why a request failed.
+
+    code is one of "rate_limited", "server_error", "timeout", "connection",
+    "auth", "bad_request", "bad_response", "upstream_error", "missing_key"
+    or "circuit_open". message is the human-readable text (also the
+    response's content).
+    """
+    code: str
+    message: str
+    status: int | None = None
+    retryable: bool = False
+    retry_after: float | None = None  # seconds, from the Retry-After header
 
 @dataclass
 class LLMResponse:
     content: str
     tool_calls: list = field(default_factory=list)
+    is_error: bool = False
+    prompt_tokens: int = 0
+    cached_tokens: int = 0  # prompt tokens served from the provider's prompt cache
+    error: ProviderError | None = None  # set when is_error comes from a structured failure
+
+@dataclass
+class LLMStreamEvent:
+    """A streamed piece of a completion: a text chunk, or the assembled
+    response (always the last event)."""
+    text: str = ""
+    response: LLMResponse | None = None
 
 class ProviderPort(Protocol):
     async def chat(self, messages: list[dict]) -> LLMResponse: ...
+    def chat_stream(self, messages: list[dict], tools: list[dict] = None) -> AsyncIterator[LLMStreamEvent]: ...
 
 
 class OpenRouterAdapter:
-    """Lite-weight adapter for OpenRouter API."""
-    def __init__(self, api_key: str, model: str):
+    """Lite-weight adapter for OpenRouter API (or any OpenAI-compatible `url`).
+
+    Owns one pooled `httpx.AsyncClient` (created on first use, kept alive
+    between calls) so the tool loop reuses connections instead of paying a
+    TCP+TLS handshake per iteration. Call `aclose()` on shutdown.
+
+    Transient failures are retried up to `max_retries` times. After
+    `breaker_threshold` consecutive failed requests a circuit breaker
+    answers immediately with a "circuit_open" error for `breaker_reset`
+    seconds, then lets one probe request through.
+
+    With `prompt_cache`, the system prompt is sent with a `cache_control`
+    breakpoint so providers that need explicit markers cache the prefix;
+    others cache it implicitly as long as it stays byte-identical.
+    """
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        prompt_cache: bool = False,
+        url: str = "",
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
         self._api_key = api_key
         self._model = model
-        self._url = "https://openrouter.ai/api/v1/chat/completions"
+        self._url = url or _OPENROUTER_URL
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and importlib.util.find_spec("h2") is None:
+            _log.warning("http2 requested but the 'h2' package is missing; using HTTP/1.1")
+            http2 = False
+        self._http2 = http2
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._prompt_cache = prompt_cache
+        self._max_retries = max(0, max_retries)
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._breaker = _CircuitBreaker(breaker_threshold, breaker_reset)
+        self._marked: tuple[str, dict] | None = None  # last system prompt and its cache-marked form
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://github.com/maker-norr/agent-robert",
+                "X-Title": "Agent R.O.B.E.R.T.",
+            }
+            if self._api_key:
+                headers["Authorization"] = f"Bearer {self._api_key}"
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                http2=self._http2,
+                transport=self._transport,
+                headers=headers,
+            )
+        return self._client
 
-    # (Deleted duplicate method)
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _format_messages(self, messages: list[dict]) -> list[dict]:
+        # Most requests carry no audio: send the caller's list as-is instead of copying it
+        if any(_is_audio_uri(m.get("content")) for m in messages):
+            messages = [self._format_message(m) for m in messages]
+        if self._prompt_cache and messages and messages[0].get("role") == "system":
+            messages = [self._cache_marked(messages[0]), *messages[1:]]
+        return messages
+
+    def _cache_marked(self, msg: dict) -> dict:
+        content = msg.get("content")
+        if not isinstance(content, str):
+            return msg
+        if self._marked is None or self._marked[0] != content:
+            self._marked = (content, {
+                "role": "system",
+                "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}],
+            })
+        return self._marked[1]
 
     def _format_message(self, msg: dict) -> dict:
         content = msg.get("content", "")
         role = msg.get("role", "user")
         
         # Check for our data URI marker
-        if isinstance(content, str) and content.startswith("data:audio/"):
+        if _is_audio_uri(content):
             parts = content.split(",")
             if len(parts) == 2:
                 base64_data = parts[1]
+                audio_format = _audio_format(parts[0])
                 return {
                     "role": role,
                     "content": [
@@ -42,7 +175,7 @@ class OpenRouterAdapter:
                             "type": "input_audio",
                             "input_audio": {
                                 "data": base64_data,
-                                "format": "wav"
+                                "format": audio_format
                             }
                         },
                         {
@@ -54,19 +187,19 @@ class OpenRouterAdapter:
         return msg
 
     async def chat(self, messages: list[dict], tools: list[dict] = None) -> LLMResponse:
-        """Call OpenRouter with messages."""
-        if not self._api_key:
-            return LLMResponse(content="Error: Missing OPENROUTER_API_KEY in .env")
-
-        headers = {
-            "Authorization": f"Bearer {self._api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://github.com/maker-norr/agent-robert",
-            "X-Title": "Agent R.O.B.E.R.T.",
-        }
-        
+        """Call OpenRouter with messages.
+
+        Transient failures (429, 5xx, timeouts, connection errors) are retried
+        with jittered exponential backoff, honouring `Retry-After`.
+        """
+        if not self._api_key and self._url == _OPENROUTER_URL:
+            return _failed(ProviderError("missing_key", "Error: Missing OPENROUTER_API_KEY in .env"))
+        permit = self._breaker.allow()
+        if permit is None:
+            return _failed(self._breaker.open_error())
+
         # Transform messages to handle audio
-        formatted_messages = [self._format_message(m) for m in messages]
+        formatted_messages = self._format_messages(messages)
         
         payload = {
             "model": self._model,
@@ -75,21 +208,620 @@ class OpenRouterAdapter:
         if tools:
             payload["tools"] = tools
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        try:
+            for attempt in range(self._max_retries + 1):
+                response = await self._post(payload)
+                delay = self._retry_delay(response.error, attempt)
+                if delay is None:
+                    break
+                _log.info("LLM request failed (%s), retrying in %.2fs", response.error.code, delay)
+                await asyncio.sleep(delay)
+            self._breaker.record(permit, response.error)
+        finally:
+            self._breaker.release(permit)  # a cancelled probe must not keep the circuit open
+        return response
+
+    async def _post(self, payload: dict) -> LLMResponse:
+        client = self._get_client()
+        try:
+            r = await client.post(self._url, json=payload)
+            if r.status_code >= 400:
+                return _failed(_http_error(r.status_code, r.text, r.headers))
+            data = r.json()
+            
+            choice = data.get("choices", [{}])[0]
+            msg = choice.get("message", {})
+            content = msg.get("content") or ""
+            tool_calls = msg.get("tool_calls") or []
+            prompt_tokens, cached_tokens = _usage(data)
+
+            return LLMResponse(
+                content=content,
+                tool_calls=tool_calls,
+                prompt_tokens=prompt_tokens,
+                cached_tokens=cached_tokens,
+            )
+        except Exception as e:
+            return _failed(_exception_error(e))
+
+    async def chat_stream(self, messages: list[dict], tools: list[dict] = None) -> AsyncIterator[LLMStreamEvent]:
+        """Call OpenRouter with `stream: true` and yield text as it arrives (SSE).
+
+        Retries like `chat`, but only until the first chunk has arrived.
+        """
+        if not self._api_key and self._url == _OPENROUTER_URL:
+            yield LLMStreamEvent(response=_failed(ProviderError("missing_key", "Error: Missing OPENROUTER_API_KEY in .env")))
+            return
+        permit = self._breaker.allow()
+        if permit is None:
+            yield LLMStreamEvent(response=_failed(self._breaker.open_error()))
+            return
+        try:
+            async with aclosing(self._stream(messages, tools, permit)) as events:
+                async for event in events:
+                    yield event
+        finally:
+            self._breaker.release(permit)  # also on cancellation or an abandoned stream
+
+    async def _stream(
+        self, messages: list[dict], tools: list[dict] | None, permit: "_Permit"
+    ) -> AsyncIterator[LLMStreamEvent]:
+        payload = {
+            "model": self._model,
+            "messages": self._format_messages(messages),
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if tools:
+            payload["tools"] = tools
+
+        client = self._get_client()
+        for attempt in range(self._max_retries + 1):
+            text = []
+            calls = _ToolCallAssembler()
+            usage = (0, 0)
+            started = False
+            error = None
             try:
-                r = await client.post(self._url, headers=headers, json=payload)
-                r.raise_for_status()
-                data = r.json()
-                
-                choice = data.get("choices", [{}])[0]
-                msg = choice.get("message", {})
-                content = msg.get("content") or ""
-                tool_calls = msg.get("tool_calls") or []
-                
-                return LLMResponse(content=content, tool_calls=tool_calls)
-            except httpx.HTTPStatusError as e:
-                return LLMResponse(content=f"LLM Error {e.response.status_code}: {e.response.text}")
+                async with client.stream("POST", self._url, json=payload) as r:
+                    if r.status_code >= 400:
+                        body = (await r.aread()).decode("utf-8", "replace")
+                        error = _http_error(r.status_code, body, r.headers)
+                    else:
+                        async for data in _iter_sse_data(r):
+                            started = True
+                            if "error" in data:
+                                err = data["error"]
+                                msg = err.get("message", err) if isinstance(err, dict) else err
+                                error = ProviderError("upstream_error", f"LLM Error: {msg}")
+                                break
+                            if data.get("usage"):
+                                usage = _usage(data)  # sent on the last chunk
+                            delta = (data.get("choices") or [{}])[0].get("delta") or {}
+                            if delta.get("content"):
+                                text.append(delta["content"])
+                                yield LLMStreamEvent(text=delta["content"])
+                            for tc in delta.get("tool_calls") or []:
+                                calls.add(tc)
             except Exception as e:
-                return LLMResponse(content=f"Connection Error: {str(e)}")
+                error = _exception_error(e)
+
+            delay = None if started else self._retry_delay(error, attempt)
+            if delay is None:
+                break
+            _log.info("LLM stream failed (%s), retrying in %.2fs", error.code, delay)
+            await asyncio.sleep(delay)
+
+        self._breaker.record(permit, error)
+        if error is not None:
+            yield LLMStreamEvent(response=_failed(error))
+            return
+        yield LLMStreamEvent(response=LLMResponse(
+            content="".join(text),
+            tool_calls=calls.result(),
+            prompt_tokens=usage[0],
+            cached_tokens=usage[1],
+        ))
+
+    def _retry_delay(self, error: "ProviderError | None", attempt: int) -> float | None:
+        """Seconds to wait before the next attempt, or None to stop here."""
+        if error is None or not error.retryable or attempt >= self._max_retries:
+            return None
+        if error.retry_after is not None:
+            # The server said when; waiting longer than our cap means giving up now
+            return error.retry_after if error.retry_after <= self._max_backoff else None
+        return random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+
+class CachingProvider:
+    """Opt-in response cache in front of another provider.
+
+    The key is a SHA-256 over the model, the tool schemas and every message
+    sent to the provider, so two sessions only share an answer when their
+    whole conversations match. Text is whitespace-normalized. Entries live
+    for `ttl` seconds in an LRU of `max_entries`, optionally mirrored to one
+    JSON file per key under `directory` so they survive restarts.
+
+    Turns that involve a side-effecting tool are never served from or
+    stored in the cache: neither when the current turn already contains such
+    a call nor when the response asks for one. Error responses are not
+    cached. Tool calls served from the cache get new ids.
+    """
+    def __init__(
+        self,
+        provider,
+        model: str = "",
+        ttl: float = 300.0,
+        max_entries: int = 256,
+        directory: str | None = None,
+        bypass_tools: tuple[str, ...] = ("ha_call_service", "write_file", "exec_shell"),
+    ):
+        self._provider = provider
+        self._model = model
+        self._ttl = ttl
+        self._max_entries = max(1, max_entries)
+        self._dir = directory
+        self._bypass = frozenset(bypass_tools)
+        self._entries: OrderedDict[str, tuple[float, LLMResponse]] = OrderedDict()
+        self._tools_digest: tuple[int, str] | None = None  # (id(tools), digest): schemas are memoized upstream
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def chat(self, messages: list[dict], tools: list[dict] = None) -> LLMResponse:
+        key = self._key(messages, tools)
+        if key is not None:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+        response = await self._provider.chat(messages, tools=tools)
+        self._store(key, response)
+        return response
+
+    async def chat_stream(self, messages: list[dict], tools: list[dict] = None) -> AsyncIterator[LLMStreamEvent]:
+        key = self._key(messages, tools)
+        cached = self._lookup(key) if key is not None else None
+        if cached is not None:
+            yield LLMStreamEvent(text=cached.content, response=cached)
+            return
+        stream = getattr(self._provider, "chat_stream", None)
+        if stream is None:
+            response = await self._provider.chat(messages, tools=tools)
+            self._store(key, response)
+            yield LLMStreamEvent(text=response.content, response=response)
+            return
+        async for chunk in stream(messages, tools=tools):
+            if chunk.response is not None:
+                self._store(key, chunk.response)
+            yield chunk
+
+    async def aclose(self):
+        close = getattr(self._provider, "aclose", None)
+        if close is not None:
+            await close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _key(self, messages: list[dict], tools: list[dict] | None) -> str | None:
+        if any(self._side_effecting(m.get("tool_calls")) for m in _current_turn(messages)):
+            self.bypassed += 1
+            return None
+        h = hashlib.sha256()
+        h.update(self._model.encode())
+        h.update(self._digest_tools(tools).encode())
+        for m in messages:
+            h.update(json.dumps(_normalized(m), sort_keys=True, separators=(",", ":")).encode())
+        return h.hexdigest()
+
+    def _digest_tools(self, tools: list[dict] | None) -> str:
+        if not tools:
+            return ""
+        if self._tools_digest is None or self._tools_digest[0] != id(tools):
+            blob = json.dumps(tools, sort_keys=True, separators=(",", ":")).encode()
+            self._tools_digest = (id(tools), hashlib.sha256(blob).hexdigest())
+        return self._tools_digest[1]
+
+    def _side_effecting(self, tool_calls) -> bool:
+        return any((tc.get("function") or {}).get("name") in self._bypass for tc in tool_calls or ())
+
+    def _lookup(self, key: str) -> LLMResponse | None:
+        entry = self._entries.get(key)
+        if entry is None and self._dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Fresh ids: a replayed call must not repeat an id already in the history
+            tool_calls = [{**tc, "id": f"call_{uuid.uuid4().hex[:24]}"} for tc in entry[1].tool_calls]
+            return LLMResponse(content=entry[1].content, tool_calls=tool_calls)
+        if entry is not None:
+            self._forget(key)  # expired
+        self.misses += 1
+        return None
+
+    def _store(self, key: str | None, response: LLMResponse):
+        if key is None or response.is_error:
+            return
+        if self._side_effecting(response.tool_calls):
+            self.bypassed += 1
+            return
+        entry = (time.time() + self._ttl, LLMResponse(content=response.content, tool_calls=response.tool_calls))
+        self._remember(key, entry)
+        if self._dir:
+            try:
+                atomic_write(self._file(key), json.dumps({
+                    "expires": entry[0], "content": response.content, "tool_calls": response.tool_calls,
+                }))
+            except OSError as e:
+                _log.warning("Could not persist cached response: %s", e)
+
+    def _remember(self, key: str, entry: tuple[float, LLMResponse]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._remove_file(oldest)
+            self.evictions += 1
+
+    def _forget(self, key: str):
+        self._entries.pop(key, None)
+        self._remove_file(key)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> tuple[float, LLMResponse] | None:
+        try:
+            with open(self._file(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["expires"], LLMResponse(content=data["content"], tool_calls=data.get("tool_calls") or [])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _remove_file(self, key: str):
+        if self._dir:
+            try:
+                os.unlink(self._file(key))
+            except FileNotFoundError:
+                pass
+
+class RoutingProvider:
+    """Spreads requests over several backends with failover and optional hedging.
+
+    Backends are tried in the configured order. A backend whose rolling
+    error rate reaches `max_error_rate` (over at least five requests) moves
+    behind the healthy ones. An error response or exception fails over to
+    the next backend. With `hedge`, if the first backend has not answered
+    within its rolling p95 latency (known after `min_samples` requests),
+    the next backend gets the same request too; the first good answer wins
+    and the other request is cancelled. Streams fail over only before their
+    first text chunk and are never hedged.
+    """
+    def __init__(
+        self,
+        backends: dict,
+        hedge: bool = False,
+        window: int = 100,
+        min_samples: int = 20,
+        max_error_rate: float = 0.5,
+    ):
+        if not backends:
+            raise ValueError("RoutingProvider needs at least one backend")
+        self._backends = [_Backend(name, provider, window) for name, provider in backends.items()]
+        self._hedge = hedge
+        self._min_samples = min_samples
+        self._max_error_rate = max_error_rate
+
+    async def chat(self, messages: list[dict], tools: list[dict] = None) -> LLMResponse:
+        order = self._order()
+        response = None
+        i = 0
+        while i < len(order):
+            first = order[i]
+            second = order[i + 1] if self._hedge and i + 1 < len(order) else None
+            if second is not None and len(first.latencies) >= self._min_samples:
+                response = await self._hedged(first, second, first.percentile(0.95), messages, tools)
+                i += 2
+            else:
+                response = await self._call(first, messages, tools)
+                i += 1
+            if not response.is_error:
+                return response
+            _log.warning("Provider backend failed, failing over: %.200s", response.content)
+        return response
+
+    async def chat_stream(self, messages: list[dict], tools: list[dict] = None) -> AsyncIterator[LLMStreamEvent]:
+        last = None
+        for backend in self._order():
+            stream = getattr(backend.provider, "chat_stream", None)
+            if stream is None:
+                response = await self._call(backend, messages, tools)
+                if not response.is_error:
+                    yield LLMStreamEvent(text=response.content, response=response)
+                    return
+                last = response
+                continue
+
+            started = time.perf_counter()
+            backend.requests += 1
+            sent_text = False
+            try:
+                async for chunk in stream(messages, tools=tools):
+                    final = chunk.response
+                    if final is not None:
+                        backend.record((time.perf_counter() - started) * 1000, final.is_error)
+                        if final.is_error and not sent_text:
+                            last = final
+                            break  # nothing shown yet: try the next backend
+                    sent_text = sent_text or bool(chunk.text)
+                    yield chunk
+                    if final is not None:
+                        return
+            except Exception as e:
+                backend.record((time.perf_counter() - started) * 1000, True)
+                last = _failed(_exception_error(e))
+                if sent_text:
+                    yield LLMStreamEvent(response=last)
+                    return
+            if sent_text:
+                return  # stream ended without a final response; never repeat text from another backend
+        yield LLMStreamEvent(response=last)
+
+    async def aclose(self):
+        for backend in self._backends:
+            close = getattr(backend.provider, "aclose", None)
+            if close is not None:
+                await close()
+
+    def stats(self) -> dict:
+        """Per backend: requests, errors, rolling error rate, p50/p95 latency and hedging counts."""
+        return {b.name: b.stats() for b in self._backends}
+
+    def _order(self) -> list["_Backend"]:
+        healthy = [b for b in self._backends if b.error_rate() < self._max_error_rate]
+        return healthy + [b for b in self._backends if b not in healthy]
+
+    async def _call(self, backend: "_Backend", messages: list[dict], tools: list[dict] | None) -> LLMResponse:
+        started = time.perf_counter()
+        backend.requests += 1
+        try:
+            response = await backend.provider.chat(messages, tools=tools)
+        except Exception as e:
+            response = _failed(_exception_error(e))
+        backend.record((time.perf_counter() - started) * 1000, response.is_error)
+        return response
+
+    async def _hedged(self, first, second, delay_ms: float, messages, tools) -> LLMResponse:
+        primary = asyncio.create_task(self._call(first, messages, tools))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay_ms / 1000)
+            if done:
+                response = primary.result()
+                return response if not response.is_error else await self._call(second, messages, tools)
+
+            second.hedges += 1
+            backup = asyncio.create_task(self._call(second, messages, tools))
+            pending.add(backup)
+            response = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response = task.result()
+                    if not response.is_error:
+                        if task is backup:
+                            second.hedge_wins += 1
+                        return response
+            return response
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
 # ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+_OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+def _is_audio_uri(content) -> bool:
+    return isinstance(content, str) and content.startswith("data:audio/")
+
+def _audio_format(header: str) -> str:
+    """'data:audio/mpeg;base64' -> 'mp3'; anything unknown falls back to 'wav'."""
+    subtype = header[len("data:audio/"):].split(";")[0].lower()
+    return {"mpeg": "mp3", "mp3": "mp3", "x-wav": "wav", "wave": "wav"}.get(subtype, "wav")
+
+def _usage(data: dict) -> tuple[int, int]:
+    """(prompt_tokens, cached_tokens) from an OpenAI-style `usage` block."""
+    usage = data.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return usage.get("prompt_tokens") or 0, details.get("cached_tokens") or 0
+
+def _failed(error: ProviderError) -> LLMResponse:
+    return LLMResponse(content=error.message, is_error=True, error=error)
+
+def _http_error(status: int, body: str, headers) -> ProviderError:
+    message = f"LLM Error {status}: {body}"
+    if status == 429:
+        code = "rate_limited"
+    elif status in (408, 504):
+        code = "timeout"
+    elif status >= 500:
+        code = "server_error"
+    elif status in (401, 403):
+        code = "auth"
+    else:
+        code = "bad_request"
+    retryable = code in ("rate_limited", "timeout", "server_error")
+    return ProviderError(code, message, status, retryable, _retry_after(headers.get("retry-after")))
+
+def _exception_error(e: Exception) -> ProviderError:
+    if isinstance(e, httpx.TimeoutException):
+        return ProviderError("timeout", f"Connection Error: timed out ({e})", retryable=True)
+    if isinstance(e, httpx.TransportError):
+        return ProviderError("connection", f"Connection Error: {e}", retryable=True)
+    return ProviderError("bad_response", f"Connection Error: {e}")
+
+def _retry_after(value: str | None) -> float | None:
+    """Retry-After is either delay-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True)
+class _Permit:
+    probe: bool = False
+
+class _CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `reset` seconds.
+
+    Half-open lets a single probe through; its outcome closes or re-opens the
+    circuit. Callers hand the permit from allow() back to record() and
+    release(), so a call that started before the circuit opened never ends
+    someone else's probe.
+    """
+    def __init__(self, threshold: int, reset: float):
+        self._threshold = max(1, threshold)
+        self._reset = reset
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    def allow(self) -> "_Permit | None":
+        """A permit for one call, or None while the circuit is open."""
+        if self._opened_at is None:
+            return _Permit()
+        if self._probing or time.monotonic() - self._opened_at < self._reset:
+            return None
+        self._probing = True
+        return _Permit(probe=True)
+
+    def record(self, permit: "_Permit", error: ProviderError | None):
+        # Only transient failures say the upstream is unhealthy; a 400 proves it is up
+        if error is not None and error.retryable:
+            self._failures += 1
+            if permit.probe or self._failures >= self._threshold:
+                self._opened_at = time.monotonic()
+        else:
+            self._failures = 0
+            self._opened_at = None
+
+    def release(self, permit: "_Permit"):
+        """End the call; after the probe (done or cancelled) the next call may probe again."""
+        if permit.probe:
+            self._probing = False
+
+    def open_error(self) -> ProviderError:
+        remaining = max(0.0, self._reset - (time.monotonic() - self._opened_at))
+        return ProviderError(
+            "circuit_open",
+            f"LLM Error: provider unavailable, not retrying for {remaining:.0f}s",
+            retry_after=remaining,
+        )
+
+class _Backend:
+    """A routed provider plus its rolling latency and error window."""
+    def __init__(self, name: str, provider, window: int):
+        self.name = name
+        self.provider = provider
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.outcomes: deque[bool] = deque(maxlen=window)  # True = error
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, ms: float, is_error: bool):
+        self.outcomes.append(is_error)
+        if is_error:
+            self.errors += 1
+        else:
+            self.latencies.append(ms)
+
+    def error_rate(self) -> float:
+        if len(self.outcomes) < 5:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(self.percentile(0.5), 1),
+            "p95_ms": round(self.percentile(0.95), 1),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+def _current_turn(messages: list[dict]) -> list[dict]:
+    """The last user message and everything after it."""
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=0)
+    return messages[last_user:]
+
+def _normalized(msg: dict) -> dict:
+    content = msg.get("content")
+    if isinstance(content, str):
+        return {**msg, "content": " ".join(content.split())}
+    return msg
+
+async def _iter_sse_data(response: httpx.Response) -> AsyncIterator[dict]:
+    """Yield the JSON payload of each `data:` line; comments and keep-alives are skipped."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue  # blank separators and ": OPENROUTER PROCESSING" comments
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            _log.warning("Skipping malformed SSE chunk: %.200s", data)
+
+class _ToolCallAssembler:
+    """Merges streamed tool_call deltas (keyed by `index`) into complete tool calls."""
+    def __init__(self):
+        self._calls: dict[int, dict] = {}
+
+    def add(self, delta: dict):
+        call = self._calls.setdefault(
+            delta.get("index", len(self._calls)),
+            {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+        )
+        if delta.get("id"):
+            call["id"] = delta["id"]
+        f = delta.get("function") or {}
+        if f.get("name"):
+            call["function"]["name"] += f["name"]
+        if f.get("arguments"):
+            call["function"]["arguments"] += f["arguments"]
+
+    def result(self) -> list[dict]:
+        return [self._calls[i] for i in sorted(self._calls)]
@@ -0,0 +1,322 @@
+"""Server module — serves the /agent contract over HTTP from one event loop."""
+
+__all__ = ["AgentServer"]
+
+# ─── API (public contract) ───────────────────────────
+
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from http import HTTPStatus
+
+from robert.modules.agent import AgentPort
+from robert.modules.telemetry import Metrics
+
+
+class AgentServer:
+    """Minimal HTTP/1.1 front end for an AgentService (no web framework).
+
+        POST /agent          {"message", "session_key"} -> AgentResponse as JSON
+        POST /agent/stream   same body -> Server-Sent Events, one per AgentEvent
+        GET  /health         load and state; 503 while draining
+        GET  /metrics        Prometheus text, when `metrics` is given
+
+    The /agent routes need `Authorization: Bearer <key>` when `api_keys` is
+    non-empty. At most `max_pending` agent requests are accepted at once
+    (running, or waiting in the agent's own admission queue); beyond that
+    the server answers 503 with Retry-After instead of queueing without
+    bound. `shutdown()` stops accepting, lets in-flight requests finish for
+    up to `drain_timeout` seconds, cancels the rest and closes the agent.
+    """
+    def __init__(
+        self,
+        agent: AgentPort,
+        api_keys: list[str] = (),
+        host: str = "127.0.0.1",
+        port: int = 8787,
+        max_pending: int = 64,
+        max_body: int = 16 * 1024 * 1024,  # audio arrives inline as a data: URI
+        drain_timeout: float = 30.0,
+        idle_timeout: float = 60.0,
+        cors_origin: str = "",
+        metrics: Metrics | None = None,
+    ):
+        self._agent = agent
+        self._api_keys = [k.encode() for k in api_keys if k]
+        self._host = host
+        self._port = port
+        self._max_pending = max(1, max_pending)
+        self._max_body = max_body
+        self._drain_timeout = drain_timeout
+        self._idle_timeout = idle_timeout
+        self._cors_origin = cors_origin
+        self._metrics = metrics
+        self._server: asyncio.AbstractServer | None = None
+        self._pending = 0
+        self._quiet = asyncio.Event()  # set while no agent request is in flight
+        self._quiet.set()
+        self._stop = asyncio.Event()
+        self._draining = False
+        self._idle: set[asyncio.StreamWriter] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.rejected = 0
+
+    async def start(self) -> int:
+        """Start listening; returns the bound port (useful with port=0)."""
+        if self._server is None:
+            if not self._api_keys:
+                _log.warning("No API keys configured; /agent accepts unauthenticated requests")
+            self._server = await asyncio.start_server(self._connection, self._host, self._port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def run(self):
+        """Serve until SIGINT/SIGTERM (or `stop()`), then drain and shut down."""
+        port = await self.start()
+        _log.info("Serving on http://%s:%d (max %d pending)", self._host, port, self._max_pending)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C cancels run() instead; the finally still drains
+        try:
+            await self._stop.wait()
+        finally:
+            await self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    async def shutdown(self):
+        if self._server is None:
+            return
+        self._draining = True
+        self._server.close()
+        for writer in list(self._idle):
+            writer.close()
+        try:
+            await asyncio.wait_for(self._quiet.wait(), self._drain_timeout)
+        except asyncio.TimeoutError:
+            _log.warning("Drain timed out with %d requests in flight; cancelling them", self._pending)
+            for task in list(self._tasks):
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        await self._agent.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "status": "draining" if self._draining else "ok",
+            "pending": self._pending,
+            "max_pending": self._max_pending,
+            "rejected": self.rejected,
+        }
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self._idle.add(writer)
+        try:
+            while not self._draining:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader, self._max_body), self._idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except _HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                self._idle.discard(writer)
+                if not await self._dispatch(request, writer) or self._draining:
+                    break
+                self._idle.add(writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._idle.discard(writer)
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _dispatch(self, request: "_Request", writer: asyncio.StreamWriter) -> bool:
+        """Answer one request; returns whether the connection stays open."""
+        route = request.target.split("?", 1)[0]
+        keep_alive = request.headers.get("connection", "").lower() != "close"
+
+        if request.method == "OPTIONS" and self._cors_origin:
+            status = await self._send(writer, 204, b"", keep_alive=keep_alive, extra={
+                "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Authorization, Content-Type",
+            })
+        elif route == "/health" and request.method == "GET":
+            status = await self._send_json(writer, 503 if self._draining else 200, self.stats(), keep_alive)
+        elif route == "/metrics" and request.method == "GET" and self._metrics is not None:
+            body = self._metrics.render().encode()
+            status = await self._send(writer, 200, body, "text/plain; version=0.0.4", keep_alive)
+        elif route not in ("/agent", "/agent/stream"):
+            status = await self._send_json(writer, 404, {"error": "Not found."}, keep_alive)
+        elif request.method != "POST":
+            status = await self._send_json(writer, 405, {"error": "Use POST."}, keep_alive, {"Allow": "POST"})
+        elif not self._authorized(request.headers):
+            status = await self._send_json(
+                writer, 401, {"error": "Missing or invalid API key."}, keep_alive, {"WWW-Authenticate": "Bearer"},
+            )
+        elif self._draining or self._pending >= self._max_pending:
+            self.rejected += 1
+            status = await self._send_json(
+                writer, 503, {"error": "Server busy, retry shortly."}, keep_alive, {"Retry-After": "1"},
+            )
+        else:
+            try:
+                message, session_key = _parse_body(request.body)
+            except _HTTPError as e:
+                status = await self._send_json(writer, e.status, {"error": e.message}, keep_alive)
+            else:
+                self._pending += 1
+                self._quiet.clear()
+                try:
+                    if route == "/agent/stream":
+                        status = await self._stream(writer, message, session_key, keep_alive)
+                    else:
+                        status = await self._answer(writer, message, session_key, keep_alive)
+                finally:
+                    self._pending -= 1
+                    if self._pending == 0:
+                        self._quiet.set()
+
+        if self._metrics is not None:
+            self._metrics.inc(
+                "robert_http_requests_total", help="HTTP requests by route and status.",
+                route=route if route in _ROUTES else "other", status=str(status),
+            )
+        return keep_alive
+
+    async def _answer(self, writer, message: str, session_key: str, keep_alive: bool) -> int:
+        try:
+            response = await self._agent.process(message, session_key)
+        except Exception:
+            _log.exception("Turn failed for session %s", session_key)
+            return await self._send_json(writer, 500, {"error": "Internal error."}, keep_alive)
+        return await self._send_json(writer, 200, asdict(response), keep_alive)
+
+    async def _stream(self, writer, message: str, session_key: str, keep_alive: bool) -> int:
+        # Chunked encoding keeps the connection reusable after the stream ends
+        writer.write(self._head(200, "text/event-stream", keep_alive, {
+            "Transfer-Encoding": "chunked", "Cache-Control": "no-cache",
+        }))
+        try:
+            async with aclosing(self._agent.process_stream(message, session_key)) as events:
+                async for event in events:
+                    await _write_chunk(writer, _sse(event.type, _event_data(event)))
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception:
+            _log.exception("Streamed turn failed for session %s", session_key)
+            await _write_chunk(writer, _sse("error", {"error": "Internal error."}))
+        await _write_chunk(writer, b"")
+        return 200
+
+    def _authorized(self, headers: dict) -> bool:
+        if not self._api_keys:
+            return True
+        scheme, _, key = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            return False
+        supplied = key.strip().encode()
+        return any(hmac.compare_digest(supplied, k) for k in self._api_keys)
+
+    async def _send_json(self, writer, status: int, payload: dict, keep_alive: bool, extra: dict = None) -> int:
+        return await self._send(writer, status, json.dumps(payload).encode(), "application/json", keep_alive, extra)
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str = "application/json",
+                    keep_alive: bool = True, extra: dict = None) -> int:
+        headers = {"Content-Length": str(len(body)), **(extra or {})}
+        writer.write(self._head(status, content_type, keep_alive, headers) + body)
+        await writer.drain()
+        return status
+
+    def _head(self, status: int, content_type: str, keep_alive: bool, headers: dict) -> bytes:
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}"]
+        if self._cors_origin:
+            lines.append(f"Access-Control-Allow-Origin: {self._cors_origin}")
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append("Connection: keep-alive" if keep_alive and not self._draining else "Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+# ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+_ROUTES = {"/agent", "/agent/stream", "/health", "/metrics"}
+
+@dataclass
+class _Request:
+    method: str
+    target: str
+    headers: dict[str, str]  # lower-cased names
+    body: bytes
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+async def _read_request(reader: asyncio.StreamReader, max_body: int) -> _Request | None:
+    """Read one request; None on a cleanly closed connection."""
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise _HTTPError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except ValueError:  # a line longer than the stream limit
+        raise _HTTPError(431, "Request header too large.")
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise _HTTPError(411, "Chunked request bodies are not supported; send Content-Length.")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise _HTTPError(400, "Invalid Content-Length.")
+    if length > max_body:
+        raise _HTTPError(413, f"Request body over {max_body} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    return _Request(parts[0], parts[1], headers, body)
+
+def _parse_body(body: bytes) -> tuple[str, str]:
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise _HTTPError(400, "Body must be JSON.")
+    message = data.get("message") if isinstance(data, dict) else None
+    if not isinstance(message, str) or not message:
+        raise _HTTPError(400, "'message' is required.")
+    session_key = data.get("session_key") or "default"
+    if not isinstance(session_key, str):
+        raise _HTTPError(400, "'session_key' must be a string.")
+    return message, session_key
+
+def _event_data(event) -> dict:
+    if event.type == "done":
+        return asdict(event.response)
+    return {k: v for k, v in asdict(event).items() if k not in ("type", "response") and v}
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+async def _write_chunk(writer: asyncio.StreamWriter, data: bytes):
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    await writer.drain()
@@ -1,47 +1,164 @@
-"""Session module — handles conversation history persistence via JSONL."""
+"""Session module — conversation history, persisted through a SessionStore (JSONL by default)."""
 
 __all__ = ["Session", "SessionManager"]
 
 # ─── API (public contract) ───────────────────────────
 
+import asyncio
 import json
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime
 
-@dataclass
+from robert.modules.blobs import BlobStore, parse_data_uri, to_data_uri
+from robert.modules.session_store import JsonlSessionStore, SessionInfo, SessionStore
+
+@dataclass(slots=True)
 class Message:
     role: str
     content: str
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
     tool_calls: list = field(default_factory=list)
     tool_call_id: str = ""
+    blob: str = ""  # digest of a binary attachment held in the BlobStore
+    mime: str = ""
+    keep: int = 0  # summary records: how many preceding messages stay verbatim
+    _wire: dict | None = field(default=None, init=False, repr=False, compare=False)
+
+    def to_record(self) -> dict:
+        """JSONL form. We filter out empty strings/lists to keep JSONL clean."""
+        d = {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+        for k in ("tool_calls", "tool_call_id", "blob", "mime", "keep"):
+            v = getattr(self, k)
+            if v:
+                d[k] = v
+        return d
+
+    def to_wire(self) -> dict:
+        """Provider-ready (OpenAI chat format) dict, built once and reused.
+
+        Callers must treat the result as read-only; it is shared between requests.
+        """
+        if self._wire is None:
+            d = {"role": self.role, "content": self.content}
+            if self.tool_calls:
+                d["tool_calls"] = self.tool_calls
+            if self.tool_call_id:
+                d["tool_call_id"] = self.tool_call_id
+            self._wire = d
+        return self._wire
 
 class Session:
-    def __init__(self, key: str, storage_path: str):
+    """Conversation history for one session key.
+
+    Records go to `store` under `name`; without a store, `storage_path` names
+    a JSONL file. With `load_last`, only the last that many messages (plus
+    the newest summary) are loaded; a window never starts with tool results
+    whose tool call was cut off.
+
+    Appends are buffered in memory and written as one batch by `flush()` /
+    `commit()` (normally once per turn). What survives a crash depends on
+    `durability`:
+
+    - "none":  the end of a turn does not write anything; records stay in
+               memory until the flush timer, eviction, close or a full
+               buffer. A process crash can lose those records.
+    - "flush": the batch is written to the OS at the end of each turn;
+               survives a process crash, not a power loss.
+    - "fsync": the batch is written and fsync'ed at the end of each turn;
+               survives a power loss.
+
+    A crash in the middle of a write can leave a torn last line; the JSONL
+    store drops that partial line on load so later appends start clean.
+    """
+    def __init__(
+        self,
+        key: str,
+        storage_path: str = "",
+        durability: str = "flush",
+        flush_interval_ms: int = 0,
+        blobs: BlobStore | None = None,
+        keep_answered_audio: int = 0,
+        store: SessionStore | None = None,
+        name: str = "",
+        load_last: int = 0,
+    ):
+        if store is None:
+            store = JsonlSessionStore(os.path.dirname(storage_path) or ".", fsync=durability == "fsync")
+            name = os.path.basename(storage_path).removesuffix(".jsonl")
         self.key = key
-        self._path = storage_path
+        self._store = store
+        self._name = name or key
+        self._load_last = load_last
+        self._blobs = blobs
+        self._keep_answered_audio = keep_answered_audio
         self._messages: list[Message] = []
+        self._summary: Message | None = None
+        self._summary_start = 0
+        self.size_bytes = 0
+        self._disk_state = None
+        self._durability = durability
+        self._writer = _SessionWriter(store, self._name)
+        self._flush_interval = flush_interval_ms / 1000
+        self._flush_timer = None
+        self._pins = 0  # turns currently using this session (SessionManager.acquire)
         self._load()
 
     def _load(self):
-        if not os.path.exists(self._path):
-            return
-        with open(self._path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    data = json.loads(line)
-                    self._messages.append(Message(**data))
+        self._messages = []
+        self._summary = None
+        self._summary_start = 0
+        self.size_bytes = 0
+        for raw in self._store.load(self._name, self._load_last):
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError:
+                _log.warning("Skipping corrupt record in session %s", self._name)
+                continue
+            self._add_loaded(Message(**data))
+            self.size_bytes += len(raw)
+        self._disk_state = self._stat()
+
+    def _add_loaded(self, msg: Message):
+        if self._load_last and msg.role == "tool" and not self._messages:
+            return  # Its tool call is outside the loaded window
+        if msg.role == "summary":
+            self._summary = msg
+            self._summary_start = max(0, len(self._messages) - msg.keep)
+        else:
+            self._messages.append(msg)
+
+    def _stat(self):
+        return self._store.version(self._name)
+
+    def is_stale(self) -> bool:
+        """True if the stored records changed since this session last read or wrote them."""
+        return self._stat() != self._disk_state
+
+    def reload(self):
+        # Keep our own buffered records: write them out, then re-read everything.
+        self._cancel_flush_timer()
+        self._writer.flush()
+        self._load()
 
     def add_user_message(self, content: str):
         self._append(Message(role="user", content=content))
 
     def add_user_audio_message(self, content: str):
         # content is "data:audio/wav;base64,....."
-        # We store it as content, but the provider must parse it.
-        # Alternatively, we could add a `type="audio"` field to Message.
-        # For simplicity in Level 1, we'll prefix it.
-        self._append(Message(role="user", content=content))
+        # With a blob store the bytes are kept out of the JSONL; the record
+        # only references them and they are loaded back when the LLM needs them.
+        parsed = parse_data_uri(content) if self._blobs else None
+        if parsed is None:
+            self._append(Message(role="user", content=content))
+            return
+        mime, data = parsed
+        digest = self._blobs.put(data)
+        self._append(Message(role="user", content=_AUDIO_PLACEHOLDER, blob=digest, mime=mime))
 
     def add_assistant_message(self, content: str):
         self._append(Message(role="assistant", content=content))
@@ -52,34 +169,313 @@ class Session:
     def add_tool_result_message(self, tool_call_id: str, content: str):
         self._append(Message(role="tool", content=content, tool_call_id=tool_call_id))
 
+    def add_summary(self, content: str, upto: int):
+        """Record that messages[:upto] are now represented by `content`."""
+        msg = Message(role="summary", content=content, keep=len(self._messages) - upto)
+        self._summary = msg
+        self._summary_start = upto
+        self._write(msg)
+
+    @property
+    def messages(self) -> list[Message]:
+        return self._messages
+
+    @property
+    def summary(self) -> str:
+        return self._summary.content if self._summary else ""
+
+    @property
+    def summary_start(self) -> int:
+        """Index of the first message not covered by the summary."""
+        return self._summary_start
+
     def _append(self, msg: Message):
         self._messages.append(msg)
-        with open(self._path, "a", encoding="utf-8") as f:
-            # We filter out empty strings/lists to keep JSONL clean
-            d = {k: v for k, v in vars(msg).items() if v or k == "content"}
-            f.write(json.dumps(d) + "\n")
-
-    def get_messages_for_llm(self, system_prompt: str) -> list[dict]:
-        msgs = [{"role": "system", "content": system_prompt}]
-        for m in self._messages:
-            d = {"role": m.role, "content": m.content}
-            if m.tool_calls:
-                d["tool_calls"] = m.tool_calls
-            if m.tool_call_id:
-                d["tool_call_id"] = m.tool_call_id
-            msgs.append(d)
-        return msgs
+        self._write(msg)
+
+    def _write(self, msg: Message):
+        line = (json.dumps(msg.to_record()) + "\n").encode("utf-8")
+        self._writer.write(line)
+        self.size_bytes += len(line)
+        if self._flush_interval and self._flush_timer is None:
+            self._schedule_flush()
+
+    def flush(self):
+        """Write buffered records to disk now, on the calling thread."""
+        self._cancel_flush_timer()
+        self._write_out()
+
+    def _write_out(self):
+        if self._writer.flush():
+            self._disk_state = self._stat()
+
+    async def commit(self):
+        """End-of-turn write, honouring `durability`, off the event loop."""
+        if not self._writer.pending_bytes:
+            return
+        if self._durability == "none" and self._writer.pending_bytes < _MAX_PENDING_BYTES:
+            return
+        self._cancel_flush_timer()
+        await asyncio.to_thread(self._write_out)
+
+    def close(self):
+        self._cancel_flush_timer()
+        self._writer.close()
+        self._disk_state = self._stat()
+        self._store.release(self._name)
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (sync caller): rely on the explicit flush/commit.
+        self._flush_timer = loop.call_later(self._flush_interval, self._on_flush_timer, loop)
+
+    def _on_flush_timer(self, loop):
+        self._flush_timer = None
+        loop.create_task(asyncio.to_thread(self._write_out))
+
+    def _cancel_flush_timer(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def get_messages_for_llm(self, system_prompt: str, start: int = 0) -> list[dict]:
+        return [{"role": "system", "content": system_prompt}] + self.history_for_llm(start)
+
+    def history_for_llm(self, start: int = 0) -> list[dict]:
+        """Wire-format messages from `start` on, reusing each message's cached dict."""
+        dropped = None
+        out = []
+        for i in range(start, len(self._messages)):
+            m = self._messages[i]
+            if _is_audio(m):
+                # Audio content depends on blob loading and answered state: never cached.
+                if dropped is None:
+                    dropped = self._answered_audio_to_drop()
+                d = {"role": m.role, "content": self._llm_content(m, i in dropped)}
+            else:
+                d = m.to_wire()
+            out.append(d)
+        return out
+
+    def _llm_content(self, m: Message, dropped: bool) -> str:
+        if dropped:
+            return _ANSWERED_AUDIO_PLACEHOLDER
+        if m.blob and self._blobs is not None:
+            try:
+                return to_data_uri(m.mime, self._blobs.get(m.blob))
+            except FileNotFoundError:
+                _log.warning("Missing blob %s in session %s", m.blob, self.key)
+        return m.content
+
+    def _answered_audio_to_drop(self) -> set[int]:
+        """Indexes of audio messages that were already answered and may leave the context.
+
+        The newest `keep_answered_audio` answered recordings are kept; an
+        unanswered one (the current question) is always sent.
+        """
+        dropped = set()
+        answered = False
+        kept = 0
+        for i in range(len(self._messages) - 1, -1, -1):
+            m = self._messages[i]
+            if m.role == "assistant" and not m.tool_calls:
+                answered = True
+            elif answered and m.role == "user" and _is_audio(m):
+                if kept < self._keep_answered_audio:
+                    kept += 1
+                else:
+                    dropped.add(i)
+        return dropped
 
 class SessionManager:
-    def __init__(self, directory: str = "sessions"):
-        self._dir = directory
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+    """Hands out sessions, keeping recently used ones alive in a bounded LRU cache.
+
+    The cache is limited by session count, by the approximate size of the
+    cached history and by idle time. A cached session is re-read if its
+    stored records were changed by someone else since we last touched it.
+    Sessions handed out by `acquire` stay cached (are never evicted and
+    closed under a running turn) until they are `release`d.
+
+    Sessions live in `store`, by default one JSONL file per session in
+    `directory`. With `load_last`, sessions load only their recent history.
+    """
+    def __init__(
+        self,
+        directory: str = "sessions",
+        max_sessions: int = 64,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_seconds: float = 1800.0,
+        durability: str = "flush",
+        flush_interval_ms: int = 0,
+        blobs: BlobStore | None = None,
+        keep_answered_audio: int = 0,
+        store: SessionStore | None = None,
+        load_last: int = 0,
+    ):
+        self._store = store or JsonlSessionStore(directory, fsync=durability == "fsync")
+        self._load_last = load_last
+        self._durability = durability
+        self._flush_interval_ms = flush_interval_ms
+        self._blobs = blobs
+        self._keep_answered_audio = keep_answered_audio
+        self._max_sessions = max_sessions
+        self._max_bytes = max_bytes
+        self._idle_seconds = idle_seconds
+        self._cache: OrderedDict[str, tuple[Session, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    def storage_key(self, key: str) -> str:
+        """The sanitized name a session key is stored under; keys that map to
+        the same name share one session."""
+        return "".join(c for c in key if c.isalnum() or c in ("-", "_")).lower()
 
     def get_session(self, key: str) -> Session:
-        # Sanitize key for filename
-        safe_key = "".join(c for c in key if c.isalnum() or c in ("-", "_")).lower()
-        path = os.path.join(self._dir, f"{safe_key}.jsonl")
-        return Session(key, path)
+        name = self.storage_key(key)
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        entry = self._cache.pop(name, None)
+        if entry is not None:
+            session = entry[0]
+            self.hits += 1
+            if session.is_stale():
+                session.reload()
+                self.reloads += 1
+        else:
+            session = Session(
+                key,
+                durability=self._durability,
+                flush_interval_ms=self._flush_interval_ms,
+                blobs=self._blobs,
+                keep_answered_audio=self._keep_answered_audio,
+                store=self._store,
+                name=name,
+                load_last=self._load_last,
+            )
+            self.misses += 1
+
+        self._cache[name] = (session, now)
+        self._evict_oversize()
+        return session
+
+    def acquire(self, key: str) -> Session:
+        """`get_session`, pinning the session in the cache until `release`."""
+        session = self.get_session(key)
+        session._pins += 1
+        return session
+
+    def release(self, session: Session):
+        session._pins -= 1
+        if not session._pins:
+            self._evict_idle(time.monotonic())
+            self._evict_oversize()
+
+    def list_sessions(self, limit: int = 0) -> list[SessionInfo]:
+        """Stored sessions, most recently written first."""
+        return self._store.list_sessions(limit)
+
+    def delete_session(self, key: str) -> bool:
+        name = self.storage_key(key)
+        self._drop_cached(name)
+        return self._store.delete(name)
+
+    def trim_session(self, key: str, keep_last: int) -> int:
+        """Delete all but the last `keep_last` messages (and the newest summary)."""
+        name = self.storage_key(key)
+        self._drop_cached(name)
+        return self._store.trim(name, keep_last)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+            "sessions": len(self._cache),
+            "bytes": sum(s.size_bytes for s, _ in self._cache.values()),
+        }
+
+    def _drop_cached(self, name: str):
+        entry = self._cache.pop(name, None)
+        if entry is not None:
+            entry[0].close()
+
+    def _evict_idle(self, now: float):
+        # Entries are ordered by last use, so idle ones sit at the front.
+        for name, (session, last_used) in list(self._cache.items()):
+            if now - last_used < self._idle_seconds:
+                break
+            if session._pins:
+                continue
+            del self._cache[name]
+            session.close()
+            self.evictions += 1
+
+    def _evict_oversize(self):
+        total = sum(s.size_bytes for s, _ in self._cache.values())
+        # Never evict the entry that was just handed out (last in order), nor a pinned one.
+        for name, (session, _) in list(self._cache.items())[:-1]:
+            if len(self._cache) <= self._max_sessions and total <= self._max_bytes:
+                break
+            if session._pins:
+                continue
+            del self._cache[name]
+            session.close()
+            total -= session.size_bytes
+            self.evictions += 1
+
+    def close(self):
+        """Write out and close every cached session (call on shutdown)."""
+        while self._cache:
+            _, (session, _) = self._cache.popitem()
+            session.close()
+        self._store.close()
 
 # ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+_AUDIO_PLACEHOLDER = "[audio message]"
+_ANSWERED_AUDIO_PLACEHOLDER = "[audio message — already answered, recording omitted]"
+
+def _is_audio(m: Message) -> bool:
+    return m.mime.startswith("audio/") or m.content.startswith("data:audio")
+
+# With durability "none", a turn still writes once this much is buffered.
+_MAX_PENDING_BYTES = 256 * 1024
+
+class _SessionWriter:
+    """Buffers a session's records and hands them to the store in one batch.
+
+    `write` only buffers; `flush` appends all buffered records with a single
+    store call and is safe to run in a worker thread.
+    """
+    def __init__(self, store: SessionStore, name: str):
+        self._store = store
+        self._name = name
+        self._pending: list[bytes] = []
+        self.pending_bytes = 0
+        self._lock = threading.Lock()
+
+    def write(self, line: bytes):
+        with self._lock:
+            self._pending.append(line)
+            self.pending_bytes += len(line)
+
+    def flush(self) -> bool:
+        with self._lock:
+            if not self._pending:
+                return False
+            records = self._pending
+            self._pending = []
+            self.pending_bytes = 0
+            self._store.append(self._name, records)
+            return True
+
+    def close(self):
+        self.flush()
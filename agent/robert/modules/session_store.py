@@ -0,0 +1,520 @@
+"""Session store module — where session records are persisted (JSONL files or SQLite)."""
+
+__all__ = ["SessionStore", "SessionInfo", "JsonlSessionStore", "SqliteSessionStore"]
+
+# ─── API (public contract) ───────────────────────────
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Protocol
+
+from robert.modules.files import atomic_write
+
+
+@dataclass
+class SessionInfo:
+    name: str  # storage key (SessionManager.storage_key)
+    updated: float  # unix time of the last write
+    size_bytes: int
+
+class SessionStore(Protocol):
+    """Append-only record log per session name.
+
+    A record is one `Message.to_record()` dict encoded as a newline-
+    terminated JSON line, with "role" as its first key. Stores hand records
+    back exactly as they were appended.
+    """
+    def load(self, name: str, limit: int = 0) -> list[bytes]:
+        """All records, or with `limit` only the recent ones: the last `limit`
+        messages, but nothing older than the newest summary checkpoint (the
+        summary plus the messages it keeps verbatim). The newest summary is
+        always included."""
+        ...
+
+    def append(self, name: str, records: list[bytes]): ...
+
+    def version(self, name: str) -> object:
+        """Token that changes whenever the session's records change (None if absent)."""
+        ...
+
+    def release(self, name: str):
+        """Drop any handle kept open for the session (it may be reopened later)."""
+        ...
+
+    def list_sessions(self, limit: int = 0) -> list[SessionInfo]:
+        """Sessions, most recently written first."""
+        ...
+
+    def delete(self, name: str) -> bool: ...
+
+    def trim(self, name: str, keep_last: int) -> int:
+        """Delete all but the last `keep_last` messages (the newest summary
+        is kept); returns how many records were removed."""
+        ...
+
+    def close(self): ...
+
+class JsonlSessionStore:
+    """One append-only `<name>.jsonl` file per session in `directory`.
+
+    Each session keeps one binary file handle open for appends until it is
+    released. A torn last line (the process died mid-write) is cut off on
+    load so later appends start on a clean line. A limited load reads the
+    file backwards and stops as soon as it has the records it needs.
+
+    With `segment_bytes`, a file that grows past that size is rotated: its
+    older records are appended (as one gzip member) to
+    `archive/<name>.jsonl.gz` and the file is rewritten with just the newest
+    summary and the last `rotate_keep` messages, or fewer if those would
+    take more than half of `segment_bytes` (so the next rotation is at least
+    that many bytes away), cut back to the start of a turn. Loads stay
+    bounded however old the session gets. `read_archive` returns the
+    archived part. A crash during rotation can leave records in both
+    places, never in neither.
+    """
+    def __init__(self, directory: str = "sessions", fsync: bool = False,
+                 segment_bytes: int = 0, rotate_keep: int = 200):
+        self._dir = directory
+        self._fsync = fsync
+        self._segment_bytes = segment_bytes
+        self._rotate_keep = max(1, rotate_keep)
+        self.rotations = 0
+        self._files: dict[str, object] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self._dir, f"{name}.jsonl")
+
+    def archive_path(self, name: str) -> str:
+        return os.path.join(self._dir, "archive", f"{name}.jsonl.gz")
+
+    def load(self, name: str, limit: int = 0) -> list[bytes]:
+        path = self.path(name)
+        if not os.path.exists(path):
+            return []
+        if limit:
+            return _read_tail(path, limit)
+        records = []
+        good_bytes = 0
+        with open(path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    # Torn write: the process died before the line was complete.
+                    _log.warning("Dropping partial last record in %s", path)
+                    break
+                good_bytes += len(raw)
+                if raw.strip():
+                    records.append(raw)
+        if good_bytes < os.path.getsize(path):
+            os.truncate(path, good_bytes)
+        return records
+
+    def read_archive(self, name: str) -> list[bytes]:
+        """Records rotated out of the session file, oldest first."""
+        try:
+            with gzip.open(self.archive_path(name), "rb") as f:
+                return [raw for raw in f if raw.strip()]
+        except FileNotFoundError:
+            return []
+
+    def append(self, name: str, records: list[bytes]):
+        with self._lock:
+            f = self._files.get(name)
+            if f is None:
+                f = self._files[name] = open(self.path(name), "ab")
+        f.write(b"".join(records))
+        f.flush()
+        if self._fsync:
+            os.fsync(f.fileno())
+        if self._segment_bytes and f.tell() > self._segment_bytes:
+            self._rotate(name)
+
+    def version(self, name: str) -> object:
+        try:
+            st = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def release(self, name: str):
+        with self._lock:
+            f = self._files.pop(name, None)
+        if f is not None:
+            f.close()
+
+    def list_sessions(self, limit: int = 0) -> list[SessionInfo]:
+        sessions = []
+        with os.scandir(self._dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".jsonl"):
+                    st = entry.stat()
+                    sessions.append(SessionInfo(entry.name[:-len(".jsonl")], st.st_mtime, st.st_size))
+        sessions.sort(key=lambda s: s.updated, reverse=True)
+        return sessions[:limit] if limit else sessions
+
+    def delete(self, name: str) -> bool:
+        self.release(name)
+        try:
+            os.remove(self.archive_path(name))
+        except FileNotFoundError:
+            pass
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def trim(self, name: str, keep_last: int) -> int:
+        """Like `SessionStore.trim`; archived records are left alone."""
+        records = self.load(name)
+        kept = _tail(records, keep_last)
+        if len(kept) == len(records):
+            return 0
+        self.release(name)
+        atomic_write(self.path(name), b"".join(kept), self._fsync)
+        return len(records) - len(kept)
+
+    def close(self):
+        with self._lock:
+            files, self._files = list(self._files.values()), {}
+        for f in files:
+            f.close()
+
+    def _rotate(self, name: str):
+        self.release(name)
+        records = self.load(name)
+        archived, kept = _split_for_rotation(records, self._rotate_keep, self._segment_bytes // 2)
+        if not archived:
+            return
+        os.makedirs(os.path.dirname(self.archive_path(name)), exist_ok=True)
+        with open(self.archive_path(name), "ab") as f:
+            f.write(gzip.compress(b"".join(archived)))
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+        atomic_write(self.path(name), b"".join(kept), self._fsync)
+        self.rotations += 1
+        _log.info("Rotated session %s: archived %d records, kept %d", name, len(archived), len(kept))
+
+class SqliteSessionStore:
+    """All sessions in one SQLite database in WAL mode.
+
+    Records are stored verbatim (one row each, with the role alongside) and
+    indexed by (session, seq), so the last N messages of a session are an
+    index range scan and sessions can be listed by recency, trimmed and
+    deleted without rewriting anything. With `fsync`, commits are synced
+    to disk (synchronous=FULL); otherwise they survive a process crash but
+    not a power loss (synchronous=NORMAL).
+    """
+    def __init__(self, path: str = "sessions/sessions.db", fsync: bool = False):
+        self._path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+        self._db.executescript(_SCHEMA)
+
+    def load(self, name: str, limit: int = 0) -> list[bytes]:
+        with self._lock:
+            if not limit:
+                rows = self._db.execute(
+                    "SELECT record FROM records WHERE session = ? ORDER BY seq", (name,),
+                ).fetchall()
+                return [r[0] for r in rows]
+            rows = self._db.execute(
+                "SELECT seq, record FROM records WHERE session = ? AND role != 'summary' "
+                "ORDER BY seq DESC LIMIT ?", (name, limit),
+            ).fetchall()
+            rows += self._db.execute(
+                "SELECT seq, record FROM records WHERE session = ? AND role = 'summary' "
+                "ORDER BY seq DESC LIMIT 1", (name,),
+            ).fetchall()
+        return _since_checkpoint([record for _, record in sorted(rows)])
+
+    def append(self, name: str, records: list[bytes]):
+        size = sum(len(r) for r in records)
+        with self._lock, self._transaction():
+            self._db.executemany(
+                "INSERT INTO records (session, role, record) VALUES (?, ?, ?)",
+                [(name, _role(r), r) for r in records],
+            )
+            self._db.execute(
+                "INSERT INTO sessions (name, updated, bytes, version) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET updated = excluded.updated, "
+                "bytes = bytes + excluded.bytes, version = version + 1",
+                (name, time.time(), size),
+            )
+
+    def version(self, name: str) -> object:
+        with self._lock:
+            row = self._db.execute("SELECT version FROM sessions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def release(self, name: str):
+        pass  # No per-session handles
+
+    def list_sessions(self, limit: int = 0) -> list[SessionInfo]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, updated, bytes FROM sessions ORDER BY updated DESC LIMIT ?", (limit or -1,),
+            ).fetchall()
+        return [SessionInfo(*row) for row in rows]
+
+    def delete(self, name: str) -> bool:
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM records WHERE session = ?", (name,))
+            return self._db.execute("DELETE FROM sessions WHERE name = ?", (name,)).rowcount > 0
+
+    def trim(self, name: str, keep_last: int) -> int:
+        with self._lock, self._transaction():
+            keep = [seq for (seq,) in self._db.execute(
+                "SELECT seq FROM records WHERE session = ? AND role != 'summary' "
+                "ORDER BY seq DESC LIMIT 1 OFFSET ?", (name, max(0, keep_last - 1)),
+            )]
+            if not keep or keep_last <= 0:
+                return 0
+            # Never keep a tool result whose tool call is trimmed away
+            cut = self._db.execute(
+                "SELECT COALESCE(MIN(CASE WHEN role != 'tool' THEN seq END), MAX(seq) + 1) "
+                "FROM records WHERE session = ? AND seq >= ?", (name, keep[0]),
+            ).fetchone()[0]
+            summary = self._db.execute(
+                "SELECT MAX(seq) FROM records WHERE session = ? AND role = 'summary'", (name,),
+            ).fetchone()[0] or 0
+            removed = self._db.execute(
+                "DELETE FROM records WHERE session = ? AND seq < ? AND seq != ?", (name, cut, summary),
+            ).rowcount
+            if removed:
+                self._db.execute(
+                    "UPDATE sessions SET version = version + 1, bytes = "
+                    "(SELECT COALESCE(SUM(LENGTH(record)), 0) FROM records WHERE session = ?) WHERE name = ?",
+                    (name, name),
+                )
+            return removed
+
+    def import_jsonl(self, source: JsonlSessionStore) -> int:
+        """Copy every JSONL session that is not in the database yet, keeping
+        its last-modified time; returns the number imported. Files are left in place."""
+        imported = 0
+        for info in reversed(source.list_sessions()):
+            if self.version(info.name) is not None:
+                continue
+            records = source.read_archive(info.name) + source.load(info.name)
+            if not records:
+                continue
+            self.append(info.name, records)
+            with self._lock:
+                self._db.execute("UPDATE sessions SET updated = ? WHERE name = ?", (info.updated, info.name))
+            imported += 1
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+# ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_by_recency ON sessions (updated);
+CREATE TABLE IF NOT EXISTS records (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    role TEXT NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_by_session ON records (session, seq);
+"""
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection."""
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+
+    def __enter__(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+_ROLE_PREFIX = b'{"role": "'
+
+def _role(record: bytes) -> str:
+    # Records are written by json.dumps(Message.to_record()), which puts "role"
+    # first, so the role can be read without parsing the whole line.
+    if record.startswith(_ROLE_PREFIX):
+        end = record.find(b'"', len(_ROLE_PREFIX))
+        if end > 0:
+            return record[len(_ROLE_PREFIX):end].decode()
+    try:
+        return json.loads(record).get("role", "")
+    except (ValueError, AttributeError):
+        return ""
+
+def _tail(records: list[bytes], limit: int) -> list[bytes]:
+    """The last `limit` non-summary records, plus the newest summary if it is older.
+
+    Like a rotation, the kept part never starts at a tool result whose
+    tool call is cut off.
+    """
+    if limit <= 0:
+        return records
+    count = 0
+    summary_seen = False
+    for i in range(len(records) - 1, -1, -1):
+        role = _role(records[i])
+        if role == "summary":
+            summary_seen = True
+            continue
+        count += 1
+        if count == limit:
+            while i < len(records) and _role(records[i]) == "tool":
+                i += 1
+            if summary_seen or i == 0:
+                return records[i:]
+            for j in range(i - 1, -1, -1):
+                if _role(records[j]) == "summary":
+                    return [records[j]] + records[i:]
+            return records[i:]
+    return records
+
+def _summary_keep(record: bytes) -> int:
+    try:
+        return int(json.loads(record).get("keep", 0))
+    except (ValueError, AttributeError, TypeError):
+        return 0
+
+def _since_checkpoint(records: list[bytes]) -> list[bytes]:
+    """Drop messages older than the newest summary's verbatim-kept ones."""
+    for i in range(len(records) - 1, -1, -1):
+        if _role(records[i]) == "summary":
+            keep = _summary_keep(records[i])
+            start = i
+            while start > 0 and keep > 0:
+                start -= 1
+                if _role(records[start]) != "summary":
+                    keep -= 1
+            return records[start:]
+    return records
+
+def _read_tail(path: str, limit: int) -> list[bytes]:
+    """`SessionStore.load(limit)` for a JSONL file, reading backwards from the end."""
+    newest_first = []
+    count = 0
+    keep_left = None  # messages still wanted before the newest summary, once it is found
+    with open(path, "rb+") as f:
+        lines = _reverse_lines(f)
+        for raw in lines:
+            role = _role(raw)
+            if role == "summary":
+                if keep_left is None:
+                    newest_first.append(raw)
+                    keep_left = _summary_keep(raw)
+                    if keep_left == 0:
+                        break
+                continue
+            newest_first.append(raw)
+            count += 1
+            if keep_left is not None:
+                keep_left -= 1
+                if keep_left == 0:
+                    break
+            if count == limit:
+                if keep_left is None:
+                    # The newest summary is older than the window: find it, but take nothing else
+                    summary = next((r for r in lines if _role(r) == "summary"), None)
+                    if summary is not None:
+                        newest_first.append(summary)
+                break
+    return newest_first[::-1]
+
+def _reverse_lines(f):
+    """Complete, non-blank lines of a binary file, newest first.
+
+    A torn last line (one without its newline) is cut off the file first.
+    """
+    end = f.seek(0, os.SEEK_END)
+    pos = end
+    buf = b""
+    checked = False
+    while pos > 0:
+        step = min(_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        lines = buf.split(b"\n")
+        buf = lines.pop(0)  # may still continue in the previous block
+        if lines and not checked:
+            checked = True
+            partial = lines.pop()  # whatever follows the last newline
+            if partial:
+                _log.warning("Dropping partial last record in %s", f.name)
+                f.truncate(end - len(partial))
+        for raw in reversed(lines):
+            if raw.strip():
+                yield raw + b"\n"
+    if not checked and buf:
+        _log.warning("Dropping partial last record in %s", f.name)
+        f.truncate(0)
+    elif buf.strip():
+        yield buf + b"\n"
+
+_BLOCK = 64 * 1024
+
+def _split_for_rotation(records: list[bytes], keep: int,
+                        max_bytes: int = 0) -> tuple[list[bytes], list[bytes]]:
+    """(records to archive, records to keep) for a rotation keeping `keep`
+    messages, fewer if they take more than `max_bytes` (the last one is always kept).
+
+    The kept part starts at a user message, like the context window's
+    cuts, so it never begins mid-exchange; if the newest turn started
+    before the cut, all of it is kept. It never reaches back past the
+    newest summary's coverage; if that summary is archived, a copy (with
+    nothing kept verbatim) heads the kept part.
+    """
+    positions = [i for i, r in enumerate(records) if _role(r) != "summary"]
+    summary = max((i for i, r in enumerate(records) if _role(r) == "summary"), default=None)
+    first = max(0, len(positions) - keep)
+    if max_bytes:
+        size = 0
+        for k in range(len(positions) - 1, first - 1, -1):
+            size += len(records[positions[k]])
+            if size > max_bytes:
+                first = min(k + 1, len(positions) - 1)
+                break
+    floor = 0
+    if summary is not None:
+        floor = sum(1 for i in positions if i < summary) - _summary_keep(records[summary])
+        first = max(first, floor)
+    users = [k for k in range(floor, len(positions)) if _role(records[positions[k]]) == "user"]
+    if users:
+        first = next((k for k in users if k >= first), users[-1])
+    while first < len(positions) and _role(records[positions[first]]) == "tool":
+        first += 1
+    cut = positions[first] if first < len(positions) else len(records)
+    archived, kept = records[:cut], records[cut:]
+    if summary is not None and summary < cut:
+        data = json.loads(records[summary])
+        data.pop("keep", None)
+        kept = [(json.dumps(data) + "\n").encode()] + kept
+    return archived, kept
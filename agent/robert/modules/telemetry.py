@@ -0,0 +1,211 @@
+"""Telemetry module — per-turn timing spans and Prometheus-format metrics."""
+
+__all__ = ["Span", "Trace", "Metrics"]
+
+# ─── API (public contract) ───────────────────────────
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+from robert.modules.files import atomic_write
+
+
+@dataclass
+class Span:
+    name: str  # e.g. "session.load", "provider.chat", "tool"
+    start_ms: float  # offset from the start of the turn
+    duration_ms: float
+    attrs: dict = field(default_factory=dict)
+
+class Trace:
+    """The spans of one turn, in the order they finished."""
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the block; the yielded dict can take attributes known only at the end."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            end = time.perf_counter()
+            self.spans.append(Span(name, (start - self._t0) * 1000, (end - start) * 1000, attrs))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def as_dicts(self) -> list[dict]:
+        return [asdict(s) for s in self.spans]
+
+class Metrics:
+    """Counters and histograms, rendered in the Prometheus text exposition format.
+
+    Export by scraping GET /metrics (`serve()`, or `start()` when `port` is
+    set) or by pointing `file_path` at a node-exporter textfile directory;
+    the file is rewritten atomically at most every `file_interval` seconds
+    and on `aclose()`.
+    """
+    def __init__(self, file_path: str = "", file_interval: float = 5.0, buckets: tuple[float, ...] = None,
+                 host: str = "127.0.0.1", port: int | None = None):
+        self._file_path = file_path
+        self._host = host
+        self._port = port
+        self._file_interval = file_interval
+        self._written_at = 0.0
+        self._buckets = buckets or _DEFAULT_BUCKETS_MS
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+        self._help: dict[str, str] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    def inc(self, name: str, value: float = 1.0, help: str = "", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+        if help:
+            self._help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = "", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = _Histogram(self._buckets)
+        hist.observe(value)
+        if help:
+            self._help.setdefault(name, help)
+
+    def record_turn(self, trace: Trace, outcome: str):
+        """Fold one turn's spans into the standard agent metrics."""
+        self.inc("robert_turns_total", help="Agent turns by outcome.", outcome=outcome)
+        self.observe("robert_turn_duration_ms", trace.elapsed_ms(), help="Wall time of a whole turn.")
+        for span in trace.spans:
+            self.observe("robert_span_duration_ms", span.duration_ms, help="Time spent per span type.", span=span.name)
+            if span.name == "tool":
+                self.inc(
+                    "robert_tool_calls_total", help="Tool calls by tool and result.",
+                    tool=span.attrs.get("tool", ""), error=str(bool(span.attrs.get("error"))).lower(),
+                )
+        self.maybe_write()
+
+    def render(self) -> str:
+        lines = []
+        seen = set()
+
+        def header(name: str, kind: str):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self._counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {_num(value)}")
+        for (name, labels), hist in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(hist.bounds, hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _num(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {hist.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_num(hist.total)}")
+            lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def maybe_write(self, force: bool = False):
+        if not self._file_path:
+            return
+        now = time.monotonic()
+        if not force and now - self._written_at < self._file_interval:
+            return
+        self._written_at = now
+        try:
+            atomic_write(self._file_path, self.render())
+        except OSError as e:
+            _log.warning("Could not write metrics file %s: %s", self._file_path, e)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9464) -> int:
+        """Expose GET /metrics on a local port (0 = any free port); returns the port."""
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        """Start the configured endpoint, if any.
+
+        A bind failure is logged and the endpoint stays off; metrics are
+        still collected (and written to `file_path`).
+        """
+        if self._port is None or self._server is not None:
+            return
+        try:
+            port = await self.serve(self._host, self._port)
+        except OSError as e:
+            _log.warning("Could not serve metrics on %s:%d, continuing without: %s", self._host, self._port, e)
+            self._port = None
+            return
+        _log.info("Serving metrics on http://%s:%d/metrics", self._host, port)
+
+    async def aclose(self):
+        self.maybe_write(force=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split(" ")
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+# ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+_DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+class _Histogram:
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(str(v))}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(round(value, 3))
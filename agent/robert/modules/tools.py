@@ -6,8 +6,14 @@ __all__ = ["ToolRegistry", "ToolPort", "ToolResult"]
 
 from dataclasses import dataclass
 from typing import Any, Protocol
+import asyncio
+import mmap
 import os
+import signal
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from robert.modules.files import atomic_write
 
 @dataclass
 class ToolResult:
@@ -15,29 +21,49 @@ class ToolResult:
     is_error: bool = False
 
 class ToolPort(Protocol):
+    # Tools with side effects whose order matters set this to False so they
+    # never run concurrently with other calls from the same LLM turn.
+    parallel_safe: bool
+    # Tools that enforce their own timeout may set this to the longest one;
+    # the agent then waits at least that long before cancelling them.
+    time_limit: float | None
     def get_schema(self) -> dict: ...
     async def execute(self, **kwargs) -> ToolResult: ...
 
 class ToolRegistry:
     """Manages available tools and their security policies."""
-    def __init__(self, workspace_root: str, tool_configs: dict):
+    def __init__(self, workspace_root: str, tool_configs: dict, io_workers: int = 4):
         self._workspace = os.path.abspath(workspace_root)
         self._configs = tool_configs
         self._tools: dict[str, ToolPort] = {}
+        self._io = _FileIO(io_workers)
+        self._ha_mirror = None
+        self._ha_client = None
+        self._schemas: list[dict] | None = None
+        self.version = 0  # bumped by register(); cached prompts key on it
         self._register_defaults()
 
     def _register_defaults(self):
         # Read-only file (Always enabled, but restricted)
-        self.register("read_file", _ReadFileTool(self._workspace))
+        read_cfg = self._configs.get("read_file")
+        max_bytes = read_cfg.options.get("maxBytes", 64 * 1024) if read_cfg else 64 * 1024
+        self.register("read_file", _ReadFileTool(self._workspace, max_bytes=max_bytes, io=self._io))
         
         # Write file (Disabled by default)
         if self._configs.get("fileWrite", {}).enabled:
-            self.register("write_file", _WriteFileTool(self._workspace))
+            self.register("write_file", _WriteFileTool(self._workspace, io=self._io))
             
         # Shell exec (Disabled by default + Allowlist)
         shell_cfg = self._configs.get("shell", {})
         if shell_cfg.enabled:
-            self.register("exec_shell", _ShellTool(self._workspace, shell_cfg.allowlist))
+            opts = shell_cfg.options
+            self.register("exec_shell", _ShellTool(
+                self._workspace,
+                shell_cfg.allowlist,
+                timeout=opts.get("timeout", 10.0),
+                command_timeouts=opts.get("commandTimeouts", {}),
+                max_output_bytes=opts.get("maxOutputBytes", 64 * 1024),
+            ))
 
         # Home Assistant (Disabled by default)
         ha_cfg = self._configs.get("homeassistant", {})
@@ -47,21 +73,64 @@ class ToolRegistry:
             ha_token = os.environ.get("HOMEASSISTANT_TOKEN", "")
             
             if ha_url and ha_token:
-                from robert.modules.tools_ha import HAGetStateTool, HACallServiceTool, HAListEntitiesTool
-                self.register("ha_get_state", HAGetStateTool(ha_url, ha_token))
-                self.register("ha_call_service", HACallServiceTool(ha_url, ha_token))
-                self.register("ha_list_entities", HAListEntitiesTool(ha_url, ha_token))
+                from robert.modules.tools_ha import (
+                    HAClient, HAGetStateTool, HACallServiceTool, HAFindEntityTool, HAListEntitiesTool,
+                    HAStateMirror,
+                )
+                mirror = None
+                if ha_cfg.options.get("mirror", False):
+                    mirror = HAStateMirror(
+                        ha_url, ha_token, stale_after=ha_cfg.options.get("mirrorStaleAfter", 90.0)
+                    )
+                self._ha_mirror = mirror
+                # One pooled client for every HA tool
+                client = HAClient(ha_url, ha_token, timeout=ha_cfg.options.get("timeout", 10.0))
+                self._ha_client = client
+                self.register("ha_get_state", HAGetStateTool(ha_url, ha_token, mirror=mirror, client=client))
+                self.register("ha_call_service", HACallServiceTool(ha_url, ha_token, mirror=mirror, client=client))
+                self.register("ha_list_entities", HAListEntitiesTool(ha_url, ha_token, mirror=mirror, client=client))
+                self.register("ha_find_entity", HAFindEntityTool(ha_url, ha_token, mirror=mirror, client=client))
 
     def register(self, name: str, tool: ToolPort):
         self._tools[name] = tool
+        self._schemas = None
+        self.version += 1
+
+    def get(self, name: str) -> ToolPort | None:
+        return self._tools.get(name)
+
+    def is_parallel_safe(self, name: str) -> bool:
+        return getattr(self._tools.get(name), "parallel_safe", True)
+
+    def time_limit(self, name: str) -> float | None:
+        """The longest run the tool allows itself, if it enforces one."""
+        return getattr(self._tools.get(name), "time_limit", None)
 
     def get_all_schemas(self) -> list[dict]:
-        return [t.get_schema() for t in self._tools.values()]
+        """All tool schemas, built once per registry version. Treat as read-only."""
+        if self._schemas is None:
+            self._schemas = [t.get_schema() for t in self._tools.values()]
+        return self._schemas
 
     async def call(self, name: str, **kwargs) -> ToolResult:
         if name not in self._tools:
             return ToolResult(content=f"Error: Tool '{name}' not found or disabled.", is_error=True)
-        return await self._tools[name].execute(**kwargs)
+        result = await self._tools[name].execute(**kwargs)
+        if isinstance(result, str):
+            # The HA tools report plain strings; failures start with "Error"
+            result = ToolResult(content=result, is_error=result.startswith("Error"))
+        return result
+
+    def io_stats(self) -> dict:
+        """Workspace file I/O latency per operation: count, total_ms, max_ms."""
+        return self._io.stats()
+
+    async def aclose(self):
+        if self._ha_mirror is not None:
+            await self._ha_mirror.stop()
+        if self._ha_client is not None:
+            await self._ha_client.aclose()
+        self._io.shutdown()
 
 # ─── INTERNAL (private implementations) ──────────────
 
@@ -74,37 +143,120 @@ def _is_safe_path(base: str, path: str) -> bool:
         return False
 
 class _ReadFileTool:
-    def __init__(self, workspace: str):
+    """Reads workspace files, whole or in pages.
+
+    Files are memory-mapped, so a range from a large log is served without
+    loading the rest of it. Anything beyond `max_bytes` is cut off with a
+    footer telling the model the file's size and line count and how to
+    ask for the next page.
+    """
+    def __init__(self, workspace: str, max_bytes: int = 64 * 1024, io: "_FileIO | None" = None):
         self._workspace = workspace
+        self._max_bytes = max_bytes
+        self._io = io or _default_io()
 
     def get_schema(self):
         return {
             "type": "function",
             "function": {
                 "name": "read_file",
-                "description": "Read the content of a file within the allowed workspace.",
+                "description": (
+                    "Read the content of a file within the allowed workspace. "
+                    "Large files are returned in pages; use start_line/end_line or offset to read more."
+                ),
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "path": {"type": "string", "description": "Relative path to file."}
+                        "path": {"type": "string", "description": "Relative path to file."},
+                        "start_line": {"type": "integer", "description": "First line to read (1-based)."},
+                        "end_line": {"type": "integer", "description": "Last line to read (inclusive)."},
+                        "offset": {"type": "integer", "description": "Byte offset to start reading at."},
+                        "max_bytes": {"type": "integer", "description": "Maximum number of bytes to return."}
                     },
                     "required": ["path"]
                 }
             }
         }
 
-    async def execute(self, path: str):
+    async def execute(
+        self,
+        path: str,
+        start_line: int | None = None,
+        end_line: int | None = None,
+        offset: int | None = None,
+        max_bytes: int | None = None,
+    ):
         if not _is_safe_path(self._workspace, path):
             return ToolResult("Error: Access denied. Path is outside workspace.", is_error=True)
+        limit = min(max_bytes or self._max_bytes, self._max_bytes)
         try:
-            with open(os.path.join(self._workspace, path), "r", encoding="utf-8") as f:
-                return ToolResult(f.read())
+            full_path = os.path.join(self._workspace, path)
+            return await self._io.run("read", _read_range, full_path, start_line, end_line, offset, limit)
         except Exception as e:
             return ToolResult(f"Error reading file: {str(e)}", is_error=True)
 
+def _read_range(full_path, start_line, end_line, offset, limit) -> ToolResult:
+    size = os.path.getsize(full_path)
+    if size == 0:
+        return ToolResult("")
+    with open(full_path, "rb") as f:
+        if b"\0" in f.read(_BINARY_SNIFF_BYTES):
+            return ToolResult(f"Binary file ({size} bytes); content not shown.", is_error=True)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if start_line is not None or end_line is not None:
+                first = max(1, start_line or 1)
+                begin = _line_offset(mm, first)
+                stop = _line_offset(mm, end_line + 1, start=begin, start_line=first) if end_line else size
+            else:
+                first = None
+                begin = min(max(0, offset or 0), size)
+                stop = size
+            end = min(stop, begin + limit)
+            text = mm[begin:end].decode("utf-8", "replace")
+            if begin == 0 and end == size:
+                return ToolResult(text)  # the whole file: no paging footer
+
+            total_lines = _count_lines(mm)
+            shown = f"bytes {begin}-{end} of {size}"
+            if first is not None:
+                last = first + mm[begin:end].count(b"\n") - (1 if text.endswith("\n") else 0)
+                shown = f"lines {first}-{max(first, last)}, {shown}"
+            more = " Use start_line/end_line or offset to read more." if end < size else ""
+            sep = "\n" if text.endswith("\n") else "\n\n"
+            return ToolResult(f"{text}{sep}[read_file: showing {shown}; file has {total_lines} lines.{more}]")
+
+def _line_offset(mm, line: int, start: int = 0, start_line: int = 1) -> int:
+    """Byte offset where 1-based `line` begins (file size if past the end).
+
+    Scanning starts at byte `start`, which must be where `start_line` begins.
+    """
+    line_no = start_line
+    pos = start
+    while line_no < line:
+        nl = mm.find(b"\n", pos)
+        if nl < 0:
+            return len(mm)
+        pos = nl + 1
+        line_no += 1
+    return pos
+
+def _count_lines(mm) -> int:
+    count = 0
+    for i in range(0, len(mm), _COUNT_CHUNK):
+        count += mm[i:i + _COUNT_CHUNK].count(b"\n")
+    if len(mm) and mm[len(mm) - 1:len(mm)] != b"\n":
+        count += 1  # last line without a trailing newline
+    return count
+
+_BINARY_SNIFF_BYTES = 8192
+_COUNT_CHUNK = 1024 * 1024
+
 class _WriteFileTool:
-    def __init__(self, workspace: str):
+    parallel_safe = False
+
+    def __init__(self, workspace: str, io: "_FileIO | None" = None):
         self._workspace = workspace
+        self._io = io or _default_io()
 
     def get_schema(self):
         return {
@@ -127,16 +279,73 @@ class _WriteFileTool:
         if not _is_safe_path(self._workspace, path):
             return ToolResult("Error: Access denied. Path is outside workspace.", is_error=True)
         try:
-            with open(os.path.join(self._workspace, path), "w", encoding="utf-8") as f:
-                f.write(content)
-                return ToolResult(f"File '{path}' written successfully.")
+            await self._io.run("write", atomic_write, os.path.join(self._workspace, path), content, True)
+            return ToolResult(f"File '{path}' written successfully.")
         except Exception as e:
             return ToolResult(f"Error writing file: {str(e)}", is_error=True)
 
+class _FileIO:
+    """Runs blocking workspace file operations on a small, bounded thread pool.
+
+    Latency is measured from submission, so time spent queued behind a
+    slow disk shows up in the stats as well.
+    """
+    def __init__(self, workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="robert-fileio")
+        self._stats: dict[str, list[float]] = {}  # op -> [count, total_ms, max_ms]
+
+    async def run(self, op: str, fn, *args):
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            entry = self._stats.setdefault(op, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+
+    def stats(self) -> dict:
+        return {
+            op: {"count": int(n), "total_ms": round(total, 3), "max_ms": round(peak, 3)}
+            for op, (n, total, peak) in self._stats.items()
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+_shared_io: _FileIO | None = None
+
+def _default_io() -> _FileIO:
+    global _shared_io
+    if _shared_io is None:
+        _shared_io = _FileIO()
+    return _shared_io
+
 class _ShellTool:
-    def __init__(self, workspace: str, allowlist: list[str]):
+    """Runs allowlisted commands as asyncio subprocesses.
+
+    The event loop keeps serving other sessions while a command runs. On
+    timeout the whole process group is killed (so `sh -c` children die too).
+    Output is read as it is produced; only the first and last
+    `max_output_bytes / 2` bytes are kept.
+    """
+    parallel_safe = False
+
+    def __init__(
+        self,
+        workspace: str,
+        allowlist: list[str],
+        timeout: float = 10.0,
+        command_timeouts: dict[str, float] | None = None,
+        max_output_bytes: int = 64 * 1024,
+    ):
         self._workspace = workspace
         self._allowlist = allowlist
+        self._timeout = timeout
+        self._command_timeouts = {k.lower(): v for k, v in (command_timeouts or {}).items()}
+        self._max_output = max_output_bytes
+        self.time_limit = max([timeout, *self._command_timeouts.values()])
 
     def get_schema(self):
         return {
@@ -161,16 +370,76 @@ class _ShellTool:
             return ToolResult(f"Error: Command '{cmd_base}' is not in the allowlist ({self._allowlist}).", is_error=True)
 
         # 2. Execute
+        timeout = self._command_timeouts.get(cmd_base, self._timeout)
         try:
-            result = subprocess.run(
-                command, 
-                shell=True, 
-                cwd=self._workspace, 
-                capture_output=True, 
-                text=True, 
-                timeout=10
+            proc = await asyncio.create_subprocess_shell(
+                command,
+                cwd=self._workspace,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                **_new_process_group(),
             )
-            out = result.stdout + result.stderr
-            return ToolResult(out if out else f"(Exit Code {result.returncode})")
         except Exception as e:
             return ToolResult(f"Error executing command: {str(e)}", is_error=True)
+
+        output = _BoundedOutput(self._max_output)
+        try:
+            await asyncio.wait_for(self._drain(proc, output), timeout)
+        except asyncio.TimeoutError:
+            _kill_process_group(proc)
+            await proc.wait()
+            out = output.text()
+            return ToolResult(f"{out}\nError: Command timed out after {timeout:g}s and was killed.", is_error=True)
+        except BaseException:
+            _kill_process_group(proc)
+            raise
+
+        out = output.text()
+        return ToolResult(out if out else f"(Exit Code {proc.returncode})")
+
+    async def _drain(self, proc, output: "_BoundedOutput"):
+        while chunk := await proc.stdout.read(64 * 1024):
+            output.add(chunk)
+        await proc.wait()
+
+class _BoundedOutput:
+    """Keeps the head and tail of a byte stream, counting what was dropped in between."""
+    def __init__(self, limit: int):
+        self._half = max(1, limit // 2)
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._total = 0
+
+    def add(self, chunk: bytes):
+        self._total += len(chunk)
+        room = self._half - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self._tail += chunk
+            if len(self._tail) > self._half:
+                del self._tail[:len(self._tail) - self._half]
+
+    def text(self) -> str:
+        omitted = self._total - len(self._head) - len(self._tail)
+        head = self._head.decode("utf-8", "replace")
+        tail = self._tail.decode("utf-8", "replace")
+        if omitted > 0:
+            return f"{head}\n... [{omitted} bytes omitted] ...\n{tail}"
+        return head + tail
+
+def _new_process_group() -> dict:
+    if os.name == "posix":
+        return {"start_new_session": True}
+    return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+def _kill_process_group(proc):
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -1,10 +1,16 @@
 """Home Assistant Tools — Enables control of HA entities via REST API."""
 
-from dataclasses import dataclass
-import os
+import asyncio
+import heapq
 import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any
+
 import httpx
-from typing import Any, Protocol
 
 # ─── API (public contract) ───────────────────────────
 
@@ -12,29 +18,390 @@ from typing import Any, Protocol
 class HAServiceCall:
     domain: str
     service: str
+    entity_id: str | list[str] = ""
+    target: dict = field(default_factory=dict)  # area_id / label_id
+    data: dict = field(default_factory=dict)    # service data, e.g. brightness_pct
+
+    def payload(self) -> dict:
+        body = {**self.data, **self.target}
+        if self.entity_id:
+            body["entity_id"] = self.entity_id
+        return body
+
+class HAClient:
+    """Pooled HTTP client for the HA REST API, shared by all HA tools.
+
+    The underlying `httpx.AsyncClient` is created on first use and keeps
+    its connections alive between tool calls; `aclose()` releases them.
+    """
+    def __init__(
+        self,
+        ha_url: str,
+        ha_token: str,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.url = ha_url.rstrip("/")
+        self._token = ha_token
+        self._timeout = timeout
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.url}/api/",
+                timeout=self._timeout,
+                limits=self._limits,
+                transport=self._transport,
+                headers={
+                    "Authorization": f"Bearer {self._token}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self._client
+
+    async def get(self, endpoint: str) -> Any:
+        resp = await self._get_client().get(endpoint)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def post(self, endpoint: str, data: dict) -> Any:
+        resp = await self._get_client().post(endpoint, json=data)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def render(self, template: str) -> str:
+        resp = await self._get_client().post("template", json={"template": template})
+        resp.raise_for_status()
+        return resp.text
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class HAStateMirror:
+    """Local copy of all HA entity states, kept current via the websocket API.
+
+    A background task authenticates, subscribes to `state_changed`, loads
+    the full state list once (`get_states`) and then applies each event.
+    It pings the server every `ping_interval` seconds and reconnects with
+    backoff (reloading everything) if the connection drops. While it is not
+    `is_fresh()` (not loaded yet, disconnected, or silent for longer than
+    `stale_after`), the HA tools fall back to REST.
+
+    Needs the optional `websockets` package (`pip install agent-robert[ha]`);
+    without it the mirror stays disabled and every lookup uses REST.
+    """
+    def __init__(
+        self,
+        ha_url: str,
+        ha_token: str,
+        stale_after: float = 90.0,
+        ping_interval: float = 30.0,
+        max_backoff: float = 30.0,
+    ):
+        base = ha_url.rstrip("/")
+        self._ws_url = base.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + "/api/websocket"
+        self._token = ha_token
+        self._stale_after = stale_after
+        self._ping_interval = ping_interval
+        self._max_backoff = max_backoff
+        self._states: dict[str, dict] = {}
+        self._loaded = False
+        self._connected = False
+        self._last_message = 0.0
+        self._task: asyncio.Task | None = None
+        self._listeners: list = []
+        self.events_applied = 0
+        self.reconnects = 0
+
+    def add_listener(self, listener):
+        """Register an object with `reset(states)` and `update(entity_id, state_or_None)`."""
+        self._listeners.append(listener)
+        if self._loaded:
+            listener.reset(self.all())
+
+    def ensure_started(self):
+        """Start the background subscriber (idempotent; needs a running loop)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._connected = False
+        self._loaded = False
+
+    def is_fresh(self) -> bool:
+        return (
+            self._loaded
+            and self._connected
+            and time.monotonic() - self._last_message < self._stale_after
+        )
+
+    def get(self, entity_id: str) -> dict | None:
+        return self._states.get(entity_id)
+
+    def all(self) -> list[dict]:
+        return list(self._states.values())
+
+    async def _run(self):
+        try:
+            import websockets
+        except ImportError:
+            _log.warning("HA state mirror disabled: the 'websockets' package is not installed")
+            return
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self._ws_url, max_size=None) as ws:
+                    await self._session(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _log.warning("HA websocket disconnected: %s", e)
+            # Events may have been missed: not fresh again until get_states reloads everything
+            self._connected = False
+            self._loaded = False
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self._max_backoff)
+
+    async def _session(self, ws):
+        msg = json.loads(await ws.recv())
+        if msg.get("type") == "auth_required":
+            await ws.send(json.dumps({"type": "auth", "access_token": self._token}))
+            msg = json.loads(await ws.recv())
+        if msg.get("type") != "auth_ok":
+            raise ConnectionError(f"HA websocket auth failed: {msg.get('message', msg.get('type'))}")
+
+        # Subscribe before loading so no change can slip in between.
+        await ws.send(json.dumps({"id": 1, "type": "subscribe_events", "event_type": "state_changed"}))
+        await ws.send(json.dumps({"id": 2, "type": "get_states"}))
+        self._connected = True
+        self._last_message = time.monotonic()
+
+        pinger = asyncio.create_task(self._ping(ws))
+        try:
+            async for raw in ws:
+                self._last_message = time.monotonic()
+                self._handle(json.loads(raw))
+        finally:
+            pinger.cancel()
+
+    def _handle(self, msg: dict):
+        if msg.get("type") == "result" and msg.get("id") == 2:
+            if msg.get("success"):
+                self._states = {s["entity_id"]: s for s in msg.get("result") or []}
+                self._loaded = True
+                for listener in self._listeners:
+                    listener.reset(self.all())
+        elif msg.get("type") == "event":
+            data = msg.get("event", {}).get("data", {})
+            entity_id = data.get("entity_id")
+            if not entity_id:
+                return
+            new_state = data.get("new_state")
+            if new_state is None:
+                self._states.pop(entity_id, None)
+            else:
+                self._states[entity_id] = new_state
+            self.events_applied += 1
+            for listener in self._listeners:
+                listener.update(entity_id, new_state)
+
+    async def _ping(self, ws):
+        msg_id = 100
+        while True:
+            await asyncio.sleep(self._ping_interval)
+            msg_id += 1
+            await ws.send(json.dumps({"id": msg_id, "type": "ping"}))
+
+@dataclass
+class EntityMatch:
     entity_id: str
+    name: str
+    area: str
+    domain: str
+    state: str
+    score: float
+
+class EntityIndex:
+    """Ranked fuzzy lookup over entity_id, friendly_name, area and domain.
+
+    Each entity's words go into a token index and its text into a trigram
+    index, so a query only scores entities that share a word or trigram with
+    it. Updates touch only the entity that changed (and only re-index it
+    when its name or area changed), so the index can follow the state
+    mirror event by event.
+    """
+    def __init__(self):
+        self._entries: dict[str, _IndexEntry] = {}
+        self._by_token: dict[str, set[str]] = {}
+        self._by_trigram: dict[str, set[str]] = {}
+        self._areas: dict[str, str] = {}
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def reset(self, states: list[dict]):
+        self._entries.clear()
+        self._by_token.clear()
+        self._by_trigram.clear()
+        for state in states:
+            self._add(state["entity_id"], state)
+        self.version += 1
+
+    def sync(self, states: list[dict]):
+        """Bring the index in line with a full state list, touching only differences."""
+        seen = set()
+        for state in states:
+            seen.add(state["entity_id"])
+            self.update(state["entity_id"], state)
+        for entity_id in [e for e in self._entries if e not in seen]:
+            self.update(entity_id, None)
+
+    def update(self, entity_id: str, state: dict | None):
+        old = self._entries.get(entity_id)
+        if state is None:
+            if old is not None:
+                self._remove(old)
+                self.version += 1
+            return
+        name = state.get("attributes", {}).get("friendly_name") or ""
+        if old is not None and old.name == name and old.area == self._areas.get(entity_id, ""):
+            old.state = state.get("state", "")
+            return
+        if old is not None:
+            self._remove(old)
+        self._add(entity_id, state)
+        self.version += 1
+
+    def set_areas(self, areas: dict[str, str]):
+        """Apply an entity_id -> area name map; re-indexes entities whose area changed."""
+        changed = [e for e in self._entries.values() if areas.get(e.entity_id, "") != e.area]
+        self._areas = dict(areas)
+        for entry in changed:
+            self._remove(entry)
+            self._add(entry.entity_id, entry.to_state())
+        if changed:
+            self.version += 1
+
+    def search(self, query: str, domain: str | None = None, limit: int = 5) -> list[EntityMatch]:
+        q = query.strip().lower()
+        if not q:
+            return []
+        if q in self._entries:
+            return [self._entries[q].match(1.0)]
+        words = _words(q)
+        if not words:
+            return []
+        grams = _trigrams(" ".join(words))
+        word_sets = [set().union(*(self._by_token.get(v, ()) for v in _variants(w))) for w in words]
+        # The domain is one of the entity_id's words, so its token set narrows
+        # candidates before any per-entity work.
+        in_domain = self._by_token.get(domain, set()) if domain else None
+
+        # Fast path: entities containing every query word. They all share the
+        # same word score, so only their trigram overlap is left to rank.
+        exact = set.intersection(*word_sets)
+        if in_domain is not None:
+            exact &= in_domain
+        if exact:
+            candidates = exact
+        else:
+            # Fuzzy path (typos, partial names): count shared trigrams per
+            # entity in one C-level pass and re-rank only the best few.
+            matched = [ids for ids in word_sets if ids]
+            pool = set.intersection(*matched) if matched else set()
+            if in_domain is not None:
+                pool &= in_domain
+            if len(pool) >= limit * _RERANK_FACTOR:
+                # Plenty of entities have every recognised word, and they lead
+                # on word score: count only them, on much shorter postings.
+                counts = Counter(chain.from_iterable(
+                    pool & ids for g in grams if (ids := self._by_trigram.get(g))
+                ))
+            else:
+                # Shared words count too, weighted to match the scoring below
+                word_weight = max(1, round(1.5 * len(grams) / len(words)))
+                postings = [self._by_trigram.get(g, ()) for g in grams]
+                for ids in word_sets:
+                    postings.extend([ids] * word_weight)
+                counts = Counter(chain.from_iterable(postings))
+                if in_domain is not None:
+                    counts = Counter({e: c for e, c in counts.items() if e in in_domain})
+            candidates = [e for e, _ in counts.most_common(limit * _RERANK_FACTOR)]
+
+        results = []
+        for entity_id in candidates:
+            e = self._entries[entity_id]
+            if domain and e.domain != domain:
+                continue
+            word_share = sum(1 for ids in word_sets if entity_id in ids) / len(words)
+            score = 0.6 * word_share + 0.4 * len(e.grams & grams) / len(grams)
+            if score >= _MIN_SCORE:
+                results.append((score, entity_id))
+        return [self._entries[eid].match(round(score, 3))
+                for score, eid in heapq.nsmallest(limit, results, key=lambda x: (-x[0], x[1]))]
+
+    def _add(self, entity_id: str, state: dict):
+        entry = _IndexEntry.build(
+            entity_id,
+            name=state.get("attributes", {}).get("friendly_name") or "",
+            area=self._areas.get(entity_id, ""),
+            state=state.get("state", ""),
+        )
+        self._entries[entity_id] = entry
+        for t in entry.tokens:
+            self._by_token.setdefault(t, set()).add(entity_id)
+        for g in entry.grams:
+            self._by_trigram.setdefault(g, set()).add(entity_id)
+
+    def _remove(self, entry: "_IndexEntry"):
+        del self._entries[entry.entity_id]
+        for index, keys in ((self._by_token, entry.tokens), (self._by_trigram, entry.grams)):
+            for k in keys:
+                ids = index.get(k)
+                if ids is not None:
+                    ids.discard(entry.entity_id)
+                    if not ids:
+                        del index[k]
 
 class HomeAssistantTool:
     """Base class for HA tools."""
-    def __init__(self, ha_url: str, ha_token: str):
-        self._url = ha_url.rstrip("/")
-        self._token = ha_token
-        self._headers = {
-            "Authorization": f"Bearer {self._token}",
-            "Content-Type": "application/json",
-        }
+    def __init__(
+        self,
+        ha_url: str,
+        ha_token: str,
+        mirror: HAStateMirror | None = None,
+        client: HAClient | None = None,
+    ):
+        self._client = client or HAClient(ha_url, ha_token)
+        self._mirror = mirror
+
+    def _fresh_mirror(self) -> HAStateMirror | None:
+        """The mirror if it can answer right now, else None (use REST)."""
+        if self._mirror is None:
+            return None
+        self._mirror.ensure_started()
+        return self._mirror if self._mirror.is_fresh() else None
 
     async def _get(self, endpoint: str) -> dict | list:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self._url}/api/{endpoint}", headers=self._headers)
-            resp.raise_for_status()
-            return resp.json()
+        return await self._client.get(endpoint)
 
     async def _post(self, endpoint: str, data: dict) -> list:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{self._url}/api/{endpoint}", headers=self._headers, json=data)
-            resp.raise_for_status()
-            return resp.json()
+        return await self._client.post(endpoint, data)
 
 
 class HAGetStateTool(HomeAssistantTool):
@@ -58,7 +425,13 @@ class HAGetStateTool(HomeAssistantTool):
     async def execute(self, entity_id: str) -> str:
         # Check if executed as a tool call which wraps args in another dict? No, simple kwargs.
         try:
-            state = await self._get(f"states/{entity_id}")
+            mirror = self._fresh_mirror()
+            if mirror is not None:
+                state = mirror.get(entity_id)
+                if state is None:
+                    return f"Entity '{entity_id}' not found."
+            else:
+                state = await self._get(f"states/{entity_id}")
             # Format nicely for LLM
             s = state.get("state", "unknown")
             attrs = state.get("attributes", {})
@@ -72,33 +445,87 @@ class HAGetStateTool(HomeAssistantTool):
             return f"Connection error: {e}"
 
 class HACallServiceTool(HomeAssistantTool):
-    """Tool to call a service (turn_on, turn_off, etc)."""
+    """Tool to call a service (turn_on, turn_off, etc) on one or many targets.
+
+    Entities are grouped by domain when no domain is given, and each
+    distinct service is sent as one request, so "turn off the downstairs
+    lights" is a single call however many lights there are.
+    """
+    parallel_safe = False  # "turn off, then on" must keep its order
+
     def get_schema(self):
+        ids = {"description": "One ID or a list of IDs.", "anyOf": [
+            {"type": "string"}, {"type": "array", "items": {"type": "string"}},
+        ]}
         return {
             "type": "function",
             "function": {
                 "name": "ha_call_service",
-                "description": "Call a service on a Home Assistant entity (e.g. turn_on, turn_off).",
+                "description": (
+                    "Call a service on Home Assistant entities (e.g. turn_on, turn_off). "
+                    "Target many entities, a whole area or a label in one call."
+                ),
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "domain": {"type": "string", "description": "Service domain (e.g. light, switch)."},
+                        "domain": {
+                            "type": "string",
+                            "description": "Service domain (e.g. light). Optional when entity IDs are given.",
+                        },
                         "service": {"type": "string", "description": "Service name (e.g. turn_on)."},
-                        "entity_id": {"type": "string", "description": "Target entity ID."}
+                        "entity_id": {**ids, "description": "Target entity ID(s)."},
+                        "area_id": {**ids, "description": "Target area ID(s); needs domain."},
+                        "label_id": {**ids, "description": "Target label ID(s); needs domain."},
+                        "data": {
+                            "type": "object",
+                            "description": "Service data, e.g. {\"brightness_pct\": 30} or {\"temperature\": 21}.",
+                        },
                     },
-                    "required": ["domain", "service", "entity_id"]
+                    "required": ["service"]
                 }
             }
         }
 
-    async def execute(self, domain: str, service: str, entity_id: str) -> str:
+    async def execute(
+        self,
+        service: str,
+        domain: str = None,
+        entity_id: str | list[str] = None,
+        area_id: str | list[str] = None,
+        label_id: str | list[str] = None,
+        data: dict = None,
+    ) -> str:
+        try:
+            calls = self.plan(service, domain, entity_id, area_id, label_id, data)
+        except ValueError as e:
+            return f"Error calling service: {e}"
+        results = await asyncio.gather(*(self._call(c) for c in calls))
+        return "\n".join(results)
+
+    def plan(self, service, domain=None, entity_id=None, area_id=None, label_id=None, data=None) -> list[HAServiceCall]:
+        """Split a request into one HAServiceCall per distinct domain.service."""
+        entity_ids = _id_list(entity_id)
+        target = {k: v for k, v in (("area_id", _id_list(area_id)), ("label_id", _id_list(label_id))) if v}
+        data = dict(data or {})
+        if domain:
+            return [HAServiceCall(domain, service, _one_or_many(entity_ids), target, data)]
+        if target:
+            raise ValueError("domain is required when targeting an area or label")
+        if not entity_ids:
+            raise ValueError("give a domain or at least one entity_id")
+        by_domain: dict[str, list[str]] = {}
+        for eid in entity_ids:
+            by_domain.setdefault(eid.split(".", 1)[0], []).append(eid)
+        return [HAServiceCall(d, service, _one_or_many(ids), {}, data) for d, ids in by_domain.items()]
+
+    async def _call(self, call: HAServiceCall) -> str:
+        what = ", ".join(_id_list(call.entity_id) + [f"{k} {', '.join(v)}" for k, v in call.target.items()]) or "no target"
         try:
             # e.g. POST /api/services/light/turn_on
-            data = {"entity_id": entity_id}
-            await self._post(f"services/{domain}/{service}", data)
-            return f"Service {domain}.{service} called for {entity_id}."
+            await self._post(f"services/{call.domain}/{call.service}", call.payload())
+            return f"Service {call.domain}.{call.service} called for {what}."
         except Exception as e:
-            return f"Error calling service: {e}"
+            return f"Error calling {call.domain}.{call.service} for {what}: {e}"
 
 class HAListEntitiesTool(HomeAssistantTool):
     """Tool to list all available entities (for discovery)."""
@@ -119,7 +546,8 @@ class HAListEntitiesTool(HomeAssistantTool):
 
     async def execute(self, domain: str = None) -> str:
         try:
-            states = await self._get("states")
+            mirror = self._fresh_mirror()
+            states = mirror.all() if mirror is not None else await self._get("states")
             # Filter and summarize
             results = []
             for s in states:
@@ -132,6 +560,149 @@ class HAListEntitiesTool(HomeAssistantTool):
                 results.append(f"- {eid} ({friendly}): {state}")
             
             # Limit output to avoid context overflow
-            return "\n".join(results[:50]) or "No entities found."
+            if len(results) > _LIST_LIMIT:
+                hidden = len(results) - _LIST_LIMIT
+                results = results[:_LIST_LIMIT] + [f"... and {hidden} more; use ha_find_entity to search by name."]
+            return "\n".join(results) or "No entities found."
         except Exception as e:
             return f"Error listing entities: {e}"
+
+class HAFindEntityTool(HomeAssistantTool):
+    """Tool to find entity IDs by fuzzy name/area/domain search (uses EntityIndex)."""
+    def __init__(
+        self,
+        ha_url: str,
+        ha_token: str,
+        mirror: HAStateMirror | None = None,
+        client: HAClient | None = None,
+        index: EntityIndex | None = None,
+        refresh_seconds: float = 60.0,
+        area_refresh_seconds: float = 600.0,
+    ):
+        super().__init__(ha_url, ha_token, mirror=mirror, client=client)
+        self.index = index or EntityIndex()
+        self._refresh_seconds = refresh_seconds
+        self._area_refresh_seconds = area_refresh_seconds
+        self._synced_at = float("-inf")
+        self._areas_at = float("-inf")
+        if mirror is not None:
+            mirror.add_listener(self.index)
+
+    def get_schema(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": "ha_find_entity",
+                "description": (
+                    "Find Home Assistant entities by name, room/area or type, e.g. "
+                    "'kitchen light'. Returns the best matching entity IDs, ranked."
+                ),
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {"type": "string", "description": "What to look for (e.g. 'downstairs lamp')."},
+                        "domain": {"type": "string", "description": "Optional domain filter (e.g. light)."},
+                        "limit": {"type": "integer", "description": "Max results (default 5)."}
+                    },
+                    "required": ["query"]
+                }
+            }
+        }
+
+    async def execute(self, query: str, domain: str = None, limit: int = 5) -> str:
+        try:
+            await self.refresh()
+        except Exception as e:
+            if not len(self.index):
+                return f"Error loading entities: {e}"
+        matches = self.index.search(query, domain=domain, limit=max(1, min(limit, 25)))
+        if not matches:
+            return f"No entities match '{query}'."
+        return "\n".join(
+            f"- {m.entity_id} ({m.name or m.entity_id}{', area: ' + m.area if m.area else ''}): {m.state}"
+            for m in matches
+        )
+
+    async def refresh(self):
+        """Make the index current: from the mirror if it is live, else a REST snapshot."""
+        now = time.monotonic()
+        if self._fresh_mirror() is None and now - self._synced_at > self._refresh_seconds:
+            self.index.sync(await self._get("states"))
+            self._synced_at = now
+        if now - self._areas_at > self._area_refresh_seconds:
+            self._areas_at = now
+            try:
+                self.index.set_areas(await self._load_areas())
+            except Exception as e:
+                _log.warning("Could not load HA areas: %s", e)
+
+    async def _load_areas(self) -> dict[str, str]:
+        # One template render returns the area of every entity.
+        template = "{% for s in states %}{{ s.entity_id }}={{ area_name(s.entity_id) or '' }}\n{% endfor %}"
+        areas = {}
+        for line in (await self._client.render(template)).splitlines():
+            entity_id, _, area = line.partition("=")
+            if area.strip():
+                areas[entity_id.strip()] = area.strip()
+        return areas
+
+# ─── INTERNAL (private) ──
+
+_log = logging.getLogger(__name__)
+
+@dataclass
+class _IndexEntry:
+    entity_id: str
+    name: str
+    area: str
+    state: str
+    tokens: frozenset
+    grams: frozenset
+
+    @classmethod
+    def build(cls, entity_id: str, name: str, area: str, state: str) -> "_IndexEntry":
+        words = _words(f"{entity_id} {name} {area}")
+        return cls(entity_id, name, area, state, frozenset(words), frozenset(_trigrams(" ".join(words))))
+
+    @property
+    def domain(self) -> str:
+        return self.entity_id.split(".", 1)[0]
+
+    def match(self, score: float) -> EntityMatch:
+        return EntityMatch(self.entity_id, self.name, self.area, self.domain, self.state, score)
+
+    def to_state(self) -> dict:
+        return {"entity_id": self.entity_id, "state": self.state, "attributes": {"friendly_name": self.name}}
+
+# ha_list_entities output cap
+_LIST_LIMIT = 50
+# Below this a match is noise (a couple of shared trigrams)
+_MIN_SCORE = 0.25
+# Fuzzy lookups score this many times `limit` of the best-counted candidates
+_RERANK_FACTOR = 4
+
+def _id_list(value) -> list[str]:
+    # Models send IDs as a string, a comma-separated string or a list
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [v.strip() for v in value if v and v.strip()]
+
+def _one_or_many(ids: list[str]) -> str | list[str]:
+    if not ids:
+        return ""
+    return ids[0] if len(ids) == 1 else ids
+
+def _words(text: str) -> list[str]:
+    return "".join(c if c.isalnum() else " " for c in text.lower()).split()
+
+def _trigrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _variants(word: str) -> tuple[str, ...]:
+    # "lights" should find "light"
+    if len(word) > 3 and word.endswith("s"):
+        return (word, word[:-1])
+    return (word,)
@@ -0,0 +1,21 @@
+"""Stand-ins shared by the agent-level tests: a scripted LLM and a trivial tool."""
+
+from robert.modules.tools import ToolResult
+
+
+class ScriptedProvider:
+    """Returns the queued responses in order and records every request."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def chat(self, messages, tools=None):
+        self.requests.append(list(messages))
+        return self.responses.pop(0)
+
+class EchoTool:
+    def get_schema(self):
+        return {"type": "function", "function": {"name": "echo", "description": "Echo text."}}
+
+    async def execute(self, text: str):
+        return ToolResult(f"echo: {text}")
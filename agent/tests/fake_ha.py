@@ -0,0 +1,174 @@
+"""Tiny local Home Assistant stand-ins, shared by the tests and the benchmarks.
+
+FakeHARest serves the REST endpoints the tools use on a bare asyncio server,
+so it needs nothing beyond the standard library. FakeHomeAssistant adds the
+websocket API (it needs the websockets package) and serves the GET endpoints
+on the same port.
+"""
+
+import asyncio
+import json
+from http import HTTPStatus
+
+
+class FakeHARest:
+    """Minimal HTTP/1.1 server with keep-alive for the HA REST endpoints.
+
+    Serves GET /api/states, GET /api/states/<id>, POST /api/services/<d>/<s>
+    and POST /api/template. Use as an async context manager; `url` is set
+    once it is listening.
+    """
+    def __init__(self, states: list[dict]):
+        self.states = {s["entity_id"]: s for s in states}
+        self.url = ""
+        self.requests = 0
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                status, data = _route(self.states, method, path, body)
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+class FakeHomeAssistant:
+    def __init__(self, states: list[dict], token: str = "test-token"):
+        self.token = token
+        self.states = {s["entity_id"]: s for s in states}
+        self.rest_requests = 0
+        self.states_gate: asyncio.Event | None = None  # when set, get_states waits for it
+        self._subscribers: dict = {}  # connection -> subscription id
+        self._server = None
+        self.url = ""
+
+    async def __aenter__(self):
+        from websockets.asyncio.server import serve
+
+        self._server = await serve(self._ws_handler, "127.0.0.1", 0, process_request=self._rest)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.states_gate is not None:
+            self.states_gate.set()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def set_state(self, entity_id: str, state: str, **attributes):
+        new = {"entity_id": entity_id, "state": state, "attributes": attributes}
+        old = self.states.get(entity_id)
+        self.states[entity_id] = new
+        await self._broadcast(entity_id, old, new)
+
+    async def remove(self, entity_id: str):
+        old = self.states.pop(entity_id)
+        await self._broadcast(entity_id, old, None)
+
+    async def drop_connections(self):
+        for ws in list(self._subscribers):
+            await ws.close()
+
+    async def _broadcast(self, entity_id, old, new):
+        for ws, sub_id in list(self._subscribers.items()):
+            await ws.send(json.dumps({
+                "id": sub_id,
+                "type": "event",
+                "event": {
+                    "event_type": "state_changed",
+                    "data": {"entity_id": entity_id, "old_state": old, "new_state": new},
+                },
+            }))
+
+    def _rest(self, connection, request):
+        if request.path == "/api/websocket":
+            return None  # continue with the websocket handshake
+        self.rest_requests += 1
+        if request.headers.get("Authorization") != f"Bearer {self.token}":
+            return connection.respond(HTTPStatus.UNAUTHORIZED, "401: Unauthorized")
+        status, data = _route(self.states, "GET", request.path, b"")
+        return connection.respond(status, data.decode())
+
+    async def _ws_handler(self, ws):
+        await ws.send(json.dumps({"type": "auth_required"}))
+        auth = json.loads(await ws.recv())
+        if auth.get("access_token") != self.token:
+            await ws.send(json.dumps({"type": "auth_invalid", "message": "Invalid access token"}))
+            return
+        await ws.send(json.dumps({"type": "auth_ok"}))
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg["type"] == "subscribe_events":
+                    self._subscribers[ws] = msg["id"]
+                    await ws.send(json.dumps({"id": msg["id"], "type": "result", "success": True, "result": None}))
+                elif msg["type"] == "get_states":
+                    if self.states_gate is not None:
+                        await self.states_gate.wait()
+                    await ws.send(json.dumps({
+                        "id": msg["id"], "type": "result", "success": True,
+                        "result": list(self.states.values()),
+                    }))
+                elif msg["type"] == "ping":
+                    await ws.send(json.dumps({"id": msg["id"], "type": "pong"}))
+        finally:
+            self._subscribers.pop(ws, None)
+
+async def wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise TimeoutError("condition not met")
+        await asyncio.sleep(0.01)
+
+def _route(states: dict, method: str, path: str, body: bytes) -> tuple[HTTPStatus, bytes]:
+    """(status, JSON body) for one REST request against `states`."""
+    if method == "GET" and path == "/api/states":
+        return HTTPStatus.OK, json.dumps(list(states.values())).encode()
+    if method == "GET" and path.startswith("/api/states/"):
+        state = states.get(path[len("/api/states/"):])
+        if state is None:
+            return HTTPStatus.NOT_FOUND, b'{"message": "Entity not found."}'
+        return HTTPStatus.OK, json.dumps(state).encode()
+    if method == "POST" and path.startswith("/api/services/"):
+        ids = json.loads(body or b"{}").get("entity_id", [])
+        changed = []
+        for entity_id in [ids] if isinstance(ids, str) else ids:
+            if entity_id in states:
+                states[entity_id]["state"] = "on" if path.endswith("turn_on") else "off"
+                changed.append(states[entity_id])
+        return HTTPStatus.OK, json.dumps(changed).encode()
+    if method == "POST" and path == "/api/template":
+        return HTTPStatus.OK, b""
+    return HTTPStatus.NOT_FOUND, b'{"message": "Not found."}'
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fake_agent import EchoTool, ScriptedProvider
+
+from robert.modules.agent import AgentService, ContextBuilder
+from robert.modules.config import AgentConfig, ToolConfig
+from robert.modules.context import ContextWindow
+from robert.modules.providers import LLMResponse, LLMStreamEvent, ProviderError
+from robert.modules.session import SessionManager
+from robert.modules.tools import ToolRegistry, ToolResult
+
+
+def _tool_call(call_id, name, **args):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+
+def _service(tmp_path, provider, **kwargs):
+    tools = ToolRegistry(workspace_root=str(tmp_path), tool_configs=AgentConfig().tools)
+    tools.register("echo", EchoTool())
+    return AgentService(
+        provider=provider,
+        session_manager=SessionManager(str(tmp_path / "sessions")),
+        context_builder=ContextBuilder(),
+        tools=tools,
+        **kwargs,
+    )
+
+@pytest.mark.asyncio
+async def test_process_runs_tool_loop_and_persists(tmp_path):
+    provider = ScriptedProvider(
+        LLMResponse(content="", tool_calls=[_tool_call("c1", "echo", text="hi")]),
+        LLMResponse(content="done"),
+    )
+    agent = _service(tmp_path, provider)
+
+    resp = await agent.process("say hi", "user1")
+
+    assert resp.content == "done"
+    assert resp.iterations == 2
+    assert resp.context_tokens > 0
+    assert provider.requests[1][-1] == {"role": "tool", "content": "echo: hi", "tool_call_id": "c1"}
+
+    lines = (tmp_path / "sessions" / "user1.jsonl").read_text().splitlines()
+    assert [json.loads(line)["role"] for line in lines] == ["user", "assistant", "tool", "assistant"]
+
+class SlowProvider:
+    """Answers after a delay and tracks how many calls overlap."""
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.seen = []
+
+    async def chat(self, messages, tools=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.seen.append(messages[-1]["content"])
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return LLMResponse(content=f"re: {messages[-1]['content']}")
+
+@pytest.mark.asyncio
+async def test_same_session_is_serialized(tmp_path):
+    provider = SlowProvider()
+    agent = _service(tmp_path, provider)
+
+    await asyncio.gather(*(agent.process(f"m{i}", "ha-chat") for i in range(3)))
+
+    assert provider.max_in_flight == 1
+    assert provider.seen == ["m0", "m1", "m2"]
+    lines = (tmp_path / "sessions" / "ha-chat.jsonl").read_text().splitlines()
+    assert [json.loads(line)["content"] for line in lines] == ["m0", "re: m0", "m1", "re: m1", "m2", "re: m2"]
+    assert agent.stats()["locked_sessions"] == 0
+
+@pytest.mark.asyncio
+async def test_different_sessions_run_concurrently_up_to_cap(tmp_path):
+    provider = SlowProvider()
+    agent = _service(tmp_path, provider)
+    await asyncio.gather(*(agent.process("hi", f"user{i}") for i in range(4)))
+    assert provider.max_in_flight == 4
+
+    capped = SlowProvider()
+    agent = _service(tmp_path, capped, max_concurrency=2)
+    await asyncio.gather(*(agent.process("hi", f"user{i}") for i in range(4)))
+    assert capped.max_in_flight == 2
+    assert agent.stats()["max_waiting"] >= 2
+    assert agent.stats()["completed"] == 4
+
+class StreamingProvider(ScriptedProvider):
+    async def chat_stream(self, messages, tools=None):
+        response = await self.chat(messages, tools)
+        for word in response.content.split():
+            yield LLMStreamEvent(text=word + " ")
+        yield LLMStreamEvent(response=response)
+
+@pytest.mark.asyncio
+async def test_process_stream_yields_events_and_persists_like_process(tmp_path):
+    provider = StreamingProvider(
+        LLMResponse(content="", tool_calls=[_tool_call("c1", "echo", text="hi")]),
+        LLMResponse(content="all done"),
+    )
+    agent = _service(tmp_path, provider)
+
+    events = [e async for e in agent.process_stream("say hi", "user1")]
+
+    assert [e.type for e in events] == ["tool_start", "tool_end", "text", "text", "done"]
+    assert events[1].text == "echo: hi"
+    final = events[-1].response
+    assert final.content == "all done"
+    assert final.first_token_ms is not None
+
+    lines = (tmp_path / "sessions" / "user1.jsonl").read_text().splitlines()
+    assert [json.loads(line)["role"] for line in lines] == ["user", "assistant", "tool", "assistant"]
+    assert agent.stats()["locked_sessions"] == 0
+
+class SleepTool:
+    def __init__(self, log, parallel_safe=True, delay=0.02):
+        self.log = log
+        self.parallel_safe = parallel_safe
+        self.delay = delay
+
+    def get_schema(self):
+        return {"type": "function", "function": {"name": "sleep", "description": "Sleep."}}
+
+    async def execute(self, tag: str):
+        self.log.append(("start", tag))
+        await asyncio.sleep(self.delay)
+        self.log.append(("end", tag))
+        return ToolResult(f"slept {tag}")
+
+@pytest.mark.asyncio
+async def test_independent_tool_calls_run_concurrently_in_order(tmp_path):
+    log = []
+    provider = ScriptedProvider(
+        LLMResponse(content="", tool_calls=[
+            _tool_call("c1", "slow", tag="a"),
+            _tool_call("c2", "slow", tag="b"),
+            _tool_call("c3", "write", tag="w"),
+            _tool_call("c4", "slow", tag="c"),
+        ]),
+        LLMResponse(content="done"),
+    )
+    agent = _service(tmp_path, provider)
+    agent._tools.register("slow", SleepTool(log))
+    agent._tools.register("write", SleepTool(log, parallel_safe=False))
+
+    await agent.process("go", "user1")
+
+    # a and b overlap; the unsafe call runs alone between the batches
+    assert log[:2] == [("start", "a"), ("start", "b")]
+    assert log[4:6] == [("start", "w"), ("end", "w")]
+    results = [m for m in provider.requests[1] if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in results] == ["c1", "c2", "c3", "c4"]
+
+@pytest.mark.asyncio
+async def test_tool_timeout_and_bad_arguments(tmp_path):
+    provider = ScriptedProvider(
+        LLMResponse(content="", tool_calls=[
+            _tool_call("c1", "slow", tag="a"),
+            {"id": "c2", "function": {"name": "echo", "arguments": "{not json"}},
+        ]),
+        LLMResponse(content="done"),
+    )
+    agent = _service(tmp_path, provider, tool_timeout=0.01)
+    agent._tools.register("slow", SleepTool([], delay=1))
+
+    await agent.process("go", "user1")
+
+    results = [m["content"] for m in provider.requests[1] if m["role"] == "tool"]
+    assert "timed out" in results[0]
+    assert "Invalid JSON" in results[1]
+
+@pytest.mark.skipif(os.name != "posix", reason="uses POSIX shell commands")
+@pytest.mark.asyncio
+async def test_shell_command_timeouts_outlast_the_tool_timeout(tmp_path):
+    configs = AgentConfig().tools
+    configs["shell"] = ToolConfig(enabled=True, allowlist=["sleep"], options={"commandTimeouts": {"sleep": 0.5}})
+    provider = ScriptedProvider(
+        LLMResponse(content="", tool_calls=[
+            _tool_call("c1", "exec_shell", command="sleep 0.3"),
+            _tool_call("c2", "exec_shell", command="sleep 5"),
+        ]),
+        LLMResponse(content="done"),
+    )
+    agent = AgentService(
+        provider=provider,
+        session_manager=SessionManager(str(tmp_path / "sessions")),
+        context_builder=ContextBuilder(),
+        tools=ToolRegistry(workspace_root=str(tmp_path), tool_configs=configs),
+        tool_timeout=0.1,
+    )
+
+    await agent.process("go", "user1")
+
+    results = [m["content"] for m in provider.requests[1] if m["role"] == "tool"]
+    assert results[0] == "(Exit Code 0)"  # longer than toolTimeout, within its command timeout
+    assert "Command timed out after 0.5s and was killed" in results[1]  # the shell's own timeout fired
+
+@pytest.mark.asyncio
+async def test_system_prefix_is_memoized_and_cache_hits_reported(tmp_path):
+    builds = []
+
+    class CountingBuilder(ContextBuilder):
+        def build_system_prompt(self, tools=None):
+            builds.append(len(tools))
+            return super().build_system_prompt(tools)
+
+    provider = ScriptedProvider(
+        LLMResponse(content="", tool_calls=[_tool_call("c1", "echo", text="hi")], prompt_tokens=900),
+        LLMResponse(content="one", prompt_tokens=1000, cached_tokens=800),
+        LLMResponse(content="two", prompt_tokens=1100, cached_tokens=1000),
+    )
+    agent = _service(tmp_path, provider)
+    agent._context = CountingBuilder()
+
+    first = await agent.process("a", "user1")
+    await agent.process("b", "user1")
+    assert (first.prompt_tokens, first.cached_tokens) == (1900, 800)
+    assert builds == [2]  # one build for three LLM calls over two turns
+    assert provider.requests[0][0]["content"] == provider.requests[2][0]["content"]
+
+    # Registering a tool invalidates the cached prompt and schemas
+    agent._tools.register("echo2", EchoTool())
+    provider.responses.append(LLMResponse(content="three"))
+    await agent.process("c", "user1")
+    assert builds == [2, 3]
+
+@pytest.mark.asyncio
+async def test_provider_errors_are_reported_but_not_persisted(tmp_path):
+    error = ProviderError("rate_limited", "LLM Error 429: slow down", 429, retryable=True)
+    provider = ScriptedProvider(LLMResponse(content=error.message, is_error=True, error=error))
+    agent = _service(tmp_path, provider)
+
+    resp = await agent.process("hi", "user1")
+
+    assert (resp.content, resp.error) == ("LLM Error 429: slow down", "rate_limited")
+    lines = (tmp_path / "sessions" / "user1.jsonl").read_text().splitlines()
+    assert [json.loads(line)["role"] for line in lines] == ["user"]
+
+@pytest.mark.asyncio
+async def test_history_is_summarized_after_the_reply(tmp_path):
+    provider = ScriptedProvider(
+        LLMResponse(content="a0"), LLMResponse(content="a1"),
+        LLMResponse(content="Asked twice."), LLMResponse(content="a2"),
+    )
+    agent = _service(tmp_path, provider, window=ContextWindow(max_tokens=200, keep_recent_turns=1))
+
+    await agent.process("q0 " + "x" * 400, "user1")
+    resp = await agent.process("q1 " + "x" * 400, "user1")
+    assert resp.content == "a1"
+    assert len(provider.requests) == 2  # the reply did not wait for the summary
+
+    await agent.process("q2", "user1")  # queues behind the summary
+
+    assert "Asked twice." in provider.requests[3][1]["content"]
+    assert agent.stats()["locked_sessions"] == 0
+    await agent.aclose()
@@ -0,0 +1,52 @@
+import base64
+
+from robert.modules.blobs import BlobStore, parse_data_uri
+from robert.modules.session import Session
+
+AUDIO = b"RIFF....WAVEfmt fake audio bytes"
+AUDIO_URI = "data:audio/wav;base64," + base64.b64encode(AUDIO).decode()
+
+def test_blob_store_is_content_addressed(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    d1 = store.put(AUDIO)
+    d2 = store.put(AUDIO)
+
+    assert d1 == d2
+    assert store.get(d1) == AUDIO
+    assert len(list((tmp_path / "blobs").rglob("*"))) == 2  # one shard dir + one blob
+
+def test_parse_data_uri():
+    assert parse_data_uri(AUDIO_URI) == ("audio/wav", AUDIO)
+    assert parse_data_uri("hello") is None
+    assert parse_data_uri("data:audio/wav;base64,@@@") is None
+
+def test_session_keeps_audio_out_of_jsonl(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    session_file = tmp_path / "voice.jsonl"
+    session = Session("voice", str(session_file), blobs=store)
+
+    session.add_user_audio_message(AUDIO_URI)
+    session.flush()
+    assert "base64" not in session_file.read_text()
+
+    # The recording is loaded back only when building the LLM request
+    reloaded = Session("voice", str(session_file), blobs=store)
+    msgs = reloaded.get_messages_for_llm("sys")
+    assert msgs[1]["content"] == AUDIO_URI
+
+def test_answered_audio_is_dropped_from_context(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    session = Session("voice", str(tmp_path / "voice.jsonl"), blobs=store)
+
+    session.add_user_audio_message(AUDIO_URI)
+    session.add_assistant_message("It is sunny.")
+    session.add_user_audio_message(AUDIO_URI)
+
+    msgs = session.get_messages_for_llm("sys")
+    assert "already answered" in msgs[1]["content"]
+    assert msgs[3]["content"] == AUDIO_URI  # the current question keeps its audio
+
+    keep_one = Session("voice", str(tmp_path / "voice.jsonl"), blobs=store, keep_answered_audio=1)
+    keep_one.add_user_audio_message(AUDIO_URI)
+    keep_one.add_assistant_message("It is sunny.")
+    assert keep_one.get_messages_for_llm("sys")[1]["content"] == AUDIO_URI
@@ -0,0 +1,98 @@
+import pytest
+
+from robert.modules.context import ContextWindow, estimate_tokens
+from robert.modules.providers import LLMResponse
+from robert.modules.session import Session
+
+
+class FakeProvider:
+    def __init__(self, content="summary text"):
+        self.content = content
+        self.calls = []
+
+    async def chat(self, messages, tools=None):
+        self.calls.append(messages)
+        return LLMResponse(content=self.content)
+
+def _fill(session, turns, size=400):
+    for i in range(turns):
+        session.add_user_message(f"q{i} " + "x" * size)
+        session.add_tool_call_message("", [{"id": f"c{i}", "function": {"name": "read_file", "arguments": "{}"}}])
+        session.add_tool_result_message(f"c{i}", "r" * size)
+        session.add_assistant_message(f"a{i} " + "y" * size)
+
+def test_build_fits_budget_without_splitting_tool_calls(tmp_path):
+    session = Session("s", str(tmp_path / "s.jsonl"))
+    _fill(session, turns=10)
+
+    window = ContextWindow(max_tokens=500)
+    messages, tokens = window.build(session, "sys")
+
+    assert messages[0] == {"role": "system", "content": "sys"}
+    assert messages[1]["role"] == "user"  # history always starts at a turn boundary
+    assert messages[-1]["content"].startswith("a9")
+    assert tokens == estimate_tokens(messages)
+    assert tokens <= 500
+
+def test_build_keeps_newest_turn_even_over_budget(tmp_path):
+    session = Session("s", str(tmp_path / "s.jsonl"))
+    _fill(session, turns=2)
+
+    messages, _ = ContextWindow(max_tokens=10).build(session, "sys")
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "tool", "assistant"]
+
+@pytest.mark.asyncio
+async def test_consolidate_persists_summary(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    session = Session("s", path)
+    _fill(session, turns=6)
+    provider = FakeProvider("User asked six questions.")
+
+    window = ContextWindow(max_tokens=1000, keep_recent_turns=2)
+    assert await window.consolidate(session, provider) is True
+    assert session.summary_start == 16  # 4 turns x 4 messages folded in
+
+    session.flush()
+    reloaded = Session("s", path)
+    assert reloaded.summary == "User asked six questions."
+    assert reloaded.summary_start == 16
+
+    messages, _ = window.build(reloaded, "sys")
+    assert messages[1]["content"].endswith("User asked six questions.")
+    assert messages[2]["content"].startswith("q4")
+
+@pytest.mark.asyncio
+async def test_consolidate_skips_small_or_failed(tmp_path):
+    session = Session("s", str(tmp_path / "s.jsonl"))
+    _fill(session, turns=1)
+    assert await ContextWindow(max_tokens=100000).consolidate(session, FakeProvider()) is False
+
+    _fill(session, turns=10)
+    failing = FakeProvider()
+    failing.chat = lambda messages, tools=None: _error()
+    assert await ContextWindow(max_tokens=1000).consolidate(session, failing) is False
+    assert session.summary == ""
+
+async def _error():
+    return LLMResponse(content="LLM Error 500", is_error=True)
+
+def test_view_appends_only_new_messages(tmp_path):
+    session = Session("s", str(tmp_path / "s.jsonl"))
+    _fill(session, turns=3)
+    session.add_user_message("next question")
+
+    view = ContextWindow().open(session, "sys")
+    first, tokens = view.sync()
+    snapshot = list(first)
+
+    session.add_tool_call_message("", [{"id": "c9", "function": {"name": "read_file", "arguments": "{}"}}])
+    session.add_tool_result_message("c9", "result")
+    second, more_tokens = view.sync()
+
+    assert second is first  # extended in place, not rebuilt
+    assert second[:len(snapshot)] == snapshot
+    assert all(a is b for a, b in zip(second, snapshot))
+    assert [m["role"] for m in second[-2:]] == ["assistant", "tool"]
+    assert more_tokens == estimate_tokens(second)
+    # Wire dicts are cached on the messages themselves
+    assert session.history_for_llm(0)[0] is session.messages[0].to_wire()
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from fake_agent import ScriptedProvider
+
+from robert.modules.agent import AgentService, ContextBuilder
+from robert.modules.config import AgentConfig
+from robert.modules.intents import IntentRouter, _parse
+from robert.modules.providers import LLMResponse
+from robert.modules.session import SessionManager
+from robert.modules.tools import ToolRegistry
+from robert.modules.tools_ha import EntityIndex
+
+
+class FakeFinder:
+    def __init__(self, states):
+        self.index = EntityIndex()
+        self.index.reset(states)
+
+    def get_schema(self):
+        return {"type": "function", "function": {"name": "ha_find_entity", "description": "Find."}}
+
+    async def refresh(self):
+        pass
+
+class FakeService:
+    parallel_safe = False
+
+    def __init__(self):
+        self.calls = []
+
+    def get_schema(self):
+        return {"type": "function", "function": {"name": "ha_call_service", "description": "Call."}}
+
+    async def execute(self, **kwargs):
+        self.calls.append(kwargs)
+        return f"Service {kwargs['domain']}.{kwargs['service']} called for {kwargs['entity_id']}."
+
+def _state(entity_id, name):
+    return {"entity_id": entity_id, "state": "off", "attributes": {"friendly_name": name}}
+
+def _agent(tmp_path, provider):
+    tools = ToolRegistry(workspace_root=str(tmp_path), tool_configs=AgentConfig().tools)
+    tools.register("ha_find_entity", FakeFinder([
+        _state("light.kitchen", "Kitchen Light"),
+        _state("light.bedroom_left", "Bedroom Lamp Left"),
+        _state("light.bedroom_right", "Bedroom Lamp Right"),
+        _state("sensor.kitchen_temperature", "Kitchen Temperature"),
+    ]))
+    service = FakeService()
+    tools.register("ha_call_service", service)
+    agent = AgentService(
+        provider=provider,
+        session_manager=SessionManager(str(tmp_path / "sessions")),
+        context_builder=ContextBuilder(),
+        tools=tools,
+        intents=IntentRouter(tools),
+    )
+    return agent, service
+
+def test_parse_phrasings():
+    assert _parse("Please turn on the kitchen light!") == ("turn_on", "kitchen light")
+    assert _parse("switch the fan off") == ("turn_off", "fan")
+    assert _parse("turn off all the lights") is None
+    assert _parse("what's the temperature?") is None
+
+@pytest.mark.asyncio
+async def test_fast_path_executes_and_records_like_the_llm(tmp_path):
+    agent, service = _agent(tmp_path, ScriptedProvider())  # any LLM call would fail
+
+    resp = await agent.process("Turn on the kitchen light", "u1")
+
+    assert resp.content == "Turned on Kitchen Light."
+    assert resp.iterations == 0
+    assert service.calls == [{"domain": "light", "service": "turn_on", "entity_id": "light.kitchen"}]
+    records = [json.loads(line) for line in (tmp_path / "sessions" / "u1.jsonl").read_text().splitlines()]
+    assert [r["role"] for r in records] == ["user", "assistant", "tool", "assistant"]
+    call = records[1]["tool_calls"][0]
+    assert call["function"]["name"] == "ha_call_service"
+    assert records[2]["tool_call_id"] == call["id"]
+    assert agent.stats()["intents"]["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_ambiguous_or_unknown_commands_go_to_the_llm(tmp_path):
+    provider = ScriptedProvider(LLMResponse(content="Which one?"), LLMResponse(content="21 degrees"))
+    agent, service = _agent(tmp_path, provider)
+
+    assert (await agent.process("turn off the bedroom lamp", "u1")).content == "Which one?"
+    assert (await agent.process("how warm is the kitchen?", "u1")).content == "21 degrees"
+
+    assert service.calls == []
+    stats = agent.stats()["intents"]
+    assert (stats["hits"], stats["ambiguous"], stats["misses"]) == (0, 1, 1)
+    assert stats["avg_llm_turn_ms"] > 0
@@ -0,0 +1,453 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from robert.modules.providers import (
+    CachingProvider,
+    LLMResponse,
+    LLMStreamEvent,
+    OpenRouterAdapter,
+    RoutingProvider,
+)
+
+
+def _completion(content="hi"):
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+@pytest.mark.asyncio
+async def test_adapter_reuses_one_client():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json=_completion())
+
+    adapter = OpenRouterAdapter("key", "model", transport=httpx.MockTransport(handler))
+    await adapter.chat([{"role": "user", "content": "a"}])
+    client = adapter._client
+    resp = await adapter.chat([{"role": "user", "content": "b"}])
+
+    assert resp.content == "hi"
+    assert adapter._client is client
+    assert seen[0].headers["Authorization"] == "Bearer key"
+
+    await adapter.aclose()
+    assert client.is_closed
+
+@pytest.mark.asyncio
+async def test_adapter_reports_http_errors():
+    adapter = OpenRouterAdapter(
+        "key", "model", max_retries=0, transport=httpx.MockTransport(lambda r: httpx.Response(500, text="boom"))
+    )
+    resp = await adapter.chat([{"role": "user", "content": "a"}])
+    assert resp.is_error
+    assert "500" in resp.content
+    await adapter.aclose()
+
+def _sse(*chunks):
+    lines = [": OPENROUTER PROCESSING", ""]
+    for c in chunks:
+        lines += [f"data: {json.dumps(c)}", ""]
+    lines += ["data: [DONE]", ""]
+    return "\n".join(lines).encode()
+
+@pytest.mark.asyncio
+async def test_chat_stream_assembles_text_and_tool_calls():
+    body = _sse(
+        {"choices": [{"delta": {"content": "Hel"}}]},
+        {"choices": [{"delta": {"content": "lo"}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "id": "c1", "function": {"name": "ha_get_state", "arguments": '{"entity'}}]}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "function": {"arguments": '_id": "light.a"}'}}]}}]},
+    )
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+    adapter = OpenRouterAdapter("key", "model", transport=httpx.MockTransport(handler))
+    events = [e async for e in adapter.chat_stream([{"role": "user", "content": "a"}])]
+    await adapter.aclose()
+
+    assert [e.text for e in events if e.text] == ["Hel", "lo"]
+    final = events[-1].response
+    assert final.content == "Hello"
+    assert final.tool_calls == [{
+        "id": "c1", "type": "function",
+        "function": {"name": "ha_get_state", "arguments": '{"entity_id": "light.a"}'},
+    }]
+
+@pytest.mark.asyncio
+async def test_prompt_cache_marks_system_prefix_and_reports_usage():
+    sent = []
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        body = _completion()
+        body["usage"] = {"prompt_tokens": 1200, "prompt_tokens_details": {"cached_tokens": 1024}}
+        return httpx.Response(200, json=body)
+
+    adapter = OpenRouterAdapter("key", "model", prompt_cache=True, transport=httpx.MockTransport(handler))
+    messages = [{"role": "system", "content": "You are R."}, {"role": "user", "content": "a"}]
+    resp = await adapter.chat(messages)
+    await adapter.aclose()
+
+    assert (resp.prompt_tokens, resp.cached_tokens) == (1200, 1024)
+    assert sent[0]["messages"][0] == {
+        "role": "system",
+        "content": [{"type": "text", "text": "You are R.", "cache_control": {"type": "ephemeral"}}],
+    }
+    assert sent[0]["messages"][1] == messages[1]
+    assert messages[0]["content"] == "You are R."  # caller's list untouched
+
+@pytest.mark.asyncio
+async def test_chat_stream_reports_usage_from_last_chunk():
+    body = _sse(
+        {"choices": [{"delta": {"content": "ok"}}]},
+        {"choices": [], "usage": {"prompt_tokens": 50, "prompt_tokens_details": {"cached_tokens": 40}}},
+    )
+    adapter = OpenRouterAdapter("key", "model", transport=httpx.MockTransport(
+        lambda r: httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+    ))
+    events = [e async for e in adapter.chat_stream([{"role": "user", "content": "a"}])]
+    await adapter.aclose()
+    final = events[-1].response
+    assert (final.content, final.prompt_tokens, final.cached_tokens) == ("ok", 50, 40)
+
+class CountingProvider:
+    def __init__(self, response=None):
+        self.calls = 0
+        self.response = response or LLMResponse(content="It is 21 degrees.")
+
+    async def chat(self, messages, tools=None):
+        self.calls += 1
+        return self.response
+
+SYSTEM = {"role": "system", "content": "You are R."}
+
+def _ask(text, *history):
+    return [SYSTEM, *history, {"role": "user", "content": text}]
+
+@pytest.mark.asyncio
+async def test_response_cache_hits_on_the_same_window(tmp_path):
+    inner = CountingProvider()
+    cache = CachingProvider(inner, model="m", max_entries=2)
+    tools = [{"type": "function", "function": {"name": "ha_get_state"}}]
+
+    await cache.chat(_ask("How warm is it?"), tools=tools)
+    resp = await cache.chat(_ask("How  warm is it? "), tools=tools)  # whitespace is normalized
+    assert resp.content == "It is 21 degrees." and inner.calls == 1
+
+    # The whole history is part of the key
+    polled = [{"role": "user", "content": "How warm is it?"}, {"role": "assistant", "content": "It is 21 degrees."}]
+    await cache.chat(_ask("How warm is it?", *polled), tools=tools)
+    await cache.chat(_ask("How warm is it?", *polled), tools=tools)
+    await cache.chat(_ask("How warm is it?", *polled, *polled), tools=tools)
+    assert inner.calls == 3
+    await cache.chat(_ask("How warm is it?"), tools=tools)  # evicted by the two polled entries (LRU of 2)
+    assert inner.calls == 4
+    assert cache.stats()["evictions"] == 2
+
+    events = [e async for e in cache.chat_stream(_ask("How warm is it?"), tools=tools)]
+    assert [e.text for e in events] == ["It is 21 degrees."] and inner.calls == 4
+
+@pytest.mark.asyncio
+async def test_response_cache_never_shares_answers_across_histories():
+    class EchoingProvider:
+        calls = 0
+
+        async def chat(self, messages, tools=None):
+            self.calls += 1
+            said = [m["content"] for m in messages if m["role"] == "user"]
+            return LLMResponse(content=f"Heard: {' | '.join(said)}")
+
+    inner = EchoingProvider()
+    cache = CachingProvider(inner, model="m")
+    alice = [{"role": "user", "content": "My name is Alice"}, {"role": "assistant", "content": "Got it."}]
+    bob = [{"role": "user", "content": "My name is Bob"}, {"role": "assistant", "content": "Got it."}]
+
+    # Same last exchange, different earlier context: no shared answer
+    to_alice = await cache.chat(_ask("What is my name?", *alice))
+    to_bob = await cache.chat(_ask("What is my name?", *bob))
+    assert inner.calls == 2
+    assert "Alice" in to_alice.content and "Bob" not in to_alice.content
+    assert "Bob" in to_bob.content and "Alice" not in to_bob.content
+
+    # ...and the same "yes" after different questions misses too
+    await cache.chat(_ask("yes", {"role": "assistant", "content": "Turn on the fan?"}))
+    await cache.chat(_ask("yes", {"role": "assistant", "content": "Open the blinds?"}))
+    assert inner.calls == 4
+
+@pytest.mark.asyncio
+async def test_response_cache_gives_replayed_tool_calls_fresh_ids():
+    call = {"id": "call_1", "type": "function", "function": {"name": "ha_get_state", "arguments": "{}"}}
+    inner = CountingProvider(LLMResponse(content="", tool_calls=[call]))
+    cache = CachingProvider(inner, model="m")
+
+    first = await cache.chat(_ask("How warm is it?"))
+    second = await cache.chat(_ask("How warm is it?"))
+    third = await cache.chat(_ask("How warm is it?"))
+
+    assert inner.calls == 1
+    ids = [r.tool_calls[0]["id"] for r in (first, second, third)]
+    assert len(set(ids)) == 3
+    assert second.tool_calls[0]["function"] == call["function"]
+
+@pytest.mark.asyncio
+async def test_response_cache_bypasses_side_effects_errors_and_expired(tmp_path):
+    turn_on = {"id": "c1", "type": "function", "function": {"name": "ha_call_service", "arguments": "{}"}}
+    inner = CountingProvider(LLMResponse(content="", tool_calls=[turn_on]))
+    cache = CachingProvider(inner)
+    await cache.chat(_ask("turn on the light"))
+    await cache.chat(_ask("turn on the light"))
+    assert inner.calls == 2  # a response that calls a side-effecting tool is never stored
+
+    inner.response = LLMResponse(content="Done.")
+    after_call = _ask("turn on the light") + [
+        {"role": "assistant", "content": "", "tool_calls": [turn_on]},
+        {"role": "tool", "content": "ok", "tool_call_id": "c1"},
+    ]
+    await cache.chat(after_call)
+    await cache.chat(after_call)
+    assert inner.calls == 4 and cache.stats()["bypassed"] >= 3
+
+    inner.response = LLMResponse(content="boom", is_error=True)
+    await cache.chat(_ask("x"))
+    await cache.chat(_ask("x"))
+    assert inner.calls == 6
+
+    inner.response = LLMResponse(content="fresh")
+    expiring = CachingProvider(inner, ttl=0)
+    await expiring.chat(_ask("y"))
+    await expiring.chat(_ask("y"))
+    assert inner.calls == 8
+
+@pytest.mark.asyncio
+async def test_response_cache_survives_restart_on_disk(tmp_path):
+    inner = CountingProvider()
+    await CachingProvider(inner, directory=str(tmp_path)).chat(_ask("status?"))
+    resp = await CachingProvider(inner, directory=str(tmp_path)).chat(_ask("status?"))
+    assert resp.content == "It is 21 degrees." and inner.calls == 1
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+class FakeBackend:
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name, self.delay, self.fail = name, delay, fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def chat(self, messages, tools=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail == "raise":
+            raise ConnectionError("refused")
+        if self.fail:
+            return LLMResponse(content=f"LLM Error 503: {self.name}", is_error=True)
+        return LLMResponse(content=self.name)
+
+@pytest.mark.asyncio
+async def test_routing_fails_over_and_demotes_unhealthy_backends():
+    bad, worse, good = FakeBackend("bad", fail=True), FakeBackend("worse", fail="raise"), FakeBackend("good")
+    router = RoutingProvider({"bad": bad, "worse": worse, "good": good})
+
+    for _ in range(5):
+        assert (await router.chat([{"role": "user", "content": "hi"}])).content == "good"
+    # Both failing backends now have a 100% error rate and go to the back
+    await router.chat([{"role": "user", "content": "hi"}])
+    assert (bad.calls, worse.calls, good.calls) == (5, 5, 6)
+
+    stats = router.stats()
+    assert stats["bad"]["error_rate"] == 1.0 and stats["good"]["errors"] == 0
+    assert stats["good"]["requests"] == 6
+
+@pytest.mark.asyncio
+async def test_routing_hedges_after_p95_delay():
+    primary, backup = FakeBackend("primary", delay=0.01), FakeBackend("backup", delay=0.01)
+    router = RoutingProvider({"primary": primary, "backup": backup}, hedge=True, min_samples=3)
+    for _ in range(3):
+        await router.chat([])  # learns primary's p95 (~10 ms); no hedging yet
+    assert backup.calls == 0
+
+    primary.delay = 1.0  # primary stalls: backup fires after ~p95 and wins
+    assert (await router.chat([])).content == "backup"
+    assert primary.cancelled == 1
+    assert router.stats()["backup"]["hedge_wins"] == 1
+
+@pytest.mark.asyncio
+async def test_routing_hedge_cancels_backend_requests_with_the_caller():
+    primary, backup = FakeBackend("primary", delay=0.01), FakeBackend("backup", delay=0.01)
+    router = RoutingProvider({"primary": primary, "backup": backup}, hedge=True, min_samples=3)
+    for _ in range(3):
+        await router.chat([])
+
+    primary.delay = backup.delay = 1.0
+    for wait in (0.001, 0.05):  # cancelled before the hedge fires, then after
+        caller = asyncio.create_task(router.chat([]))
+        await asyncio.sleep(wait)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+    assert primary.cancelled == 2 and backup.cancelled == 1
+
+class FakeStreamingBackend(FakeBackend):
+    async def chat_stream(self, messages, tools=None):
+        if self.fail:
+            yield LLMStreamEvent(response=LLMResponse(content="LLM Error 500", is_error=True))
+            return
+        yield LLMStreamEvent(text=self.name)
+        yield LLMStreamEvent(response=LLMResponse(content=self.name))
+
+@pytest.mark.asyncio
+async def test_routing_stream_fails_over_before_first_chunk():
+    router = RoutingProvider({"a": FakeStreamingBackend("a", fail=True), "b": FakeStreamingBackend("b")})
+    events = [e async for e in router.chat_stream([])]
+    assert [e.text for e in events if e.text] == ["b"]
+    assert events[-1].response.content == "b"
+
+@pytest.mark.asyncio
+async def test_adapter_talks_to_openai_compatible_url_without_key():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json=_completion("local"))
+
+    adapter = OpenRouterAdapter(
+        "", "llama3", url="http://localhost:11434/v1/chat/completions", transport=httpx.MockTransport(handler)
+    )
+    assert (await adapter.chat([{"role": "user", "content": "a"}])).content == "local"
+    assert str(seen[0].url) == "http://localhost:11434/v1/chat/completions"
+    assert "Authorization" not in seen[0].headers
+    await adapter.aclose()
+
+def _flaky(*responses):
+    queue = list(responses)
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return queue.pop(0) if len(queue) > 1 else queue[0]
+    return httpx.MockTransport(handler), seen
+
+@pytest.mark.asyncio
+async def test_adapter_retries_transient_errors_honouring_retry_after():
+    transport, seen = _flaky(httpx.Response(503, headers={"Retry-After": "0"}), httpx.Response(200, json=_completion()))
+    adapter = OpenRouterAdapter("key", "model", backoff=0.001, transport=transport)
+    assert (await adapter.chat([])).content == "hi"
+    assert len(seen) == 2
+
+    # Told to wait longer than we are willing to: give up at once with a structured error
+    transport, seen = _flaky(httpx.Response(429, headers={"Retry-After": "3600"}, text="slow down"))
+    adapter = OpenRouterAdapter("key", "model", max_backoff=5, transport=transport)
+    resp = await adapter.chat([])
+    assert resp.is_error and len(seen) == 1
+    assert (resp.error.code, resp.error.status, resp.error.retry_after) == ("rate_limited", 429, 3600)
+
+    transport, seen = _flaky(httpx.Response(400, text="bad"))
+    resp = await OpenRouterAdapter("key", "model", transport=transport).chat([])
+    assert resp.error.code == "bad_request" and not resp.error.retryable and len(seen) == 1
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fast_fails_then_probes():
+    transport, seen = _flaky(httpx.Response(502), httpx.Response(502), httpx.Response(200, json=_completion()))
+    adapter = OpenRouterAdapter(
+        "key", "model", max_retries=0, breaker_threshold=2, breaker_reset=0.05, transport=transport
+    )
+    await adapter.chat([])
+    await adapter.chat([])
+    resp = await adapter.chat([])
+    assert resp.error.code == "circuit_open" and len(seen) == 2  # no request sent
+
+    await asyncio.sleep(0.06)
+    assert (await adapter.chat([])).content == "hi"  # the probe succeeds and closes the circuit
+    assert (await adapter.chat([])).content == "hi"
+    assert len(seen) == 4
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_recovers_from_cancelled_probes():
+    state = {"mode": "fail"}
+    hang = asyncio.Event()
+    body = _sse({"choices": [{"delta": {"content": "a"}}]}, {"choices": [{"delta": {"content": "b"}}]})
+
+    async def handler(request):
+        if state["mode"] == "fail":
+            return httpx.Response(502)
+        if state["mode"] == "hang":
+            await hang.wait()
+        if json.loads(request.content).get("stream"):
+            return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json=_completion())
+
+    adapter = OpenRouterAdapter(
+        "key", "model", max_retries=0, breaker_threshold=1, breaker_reset=0.05,
+        transport=httpx.MockTransport(handler),
+    )
+    await adapter.chat([])
+    await asyncio.sleep(0.06)
+
+    # The half-open probe is cancelled (e.g. it lost a hedge race)
+    state["mode"] = "hang"
+    probe = asyncio.create_task(adapter.chat([]))
+    await asyncio.sleep(0.01)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    # A streamed probe abandoned after its first chunk
+    state["mode"] = "ok"
+    stream = adapter.chat_stream([])
+    assert (await anext(stream)).text == "a"
+    await stream.aclose()
+
+    assert (await adapter.chat([])).content == "hi"
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_keeps_one_probe_when_older_calls_end():
+    hang = asyncio.Event()
+    seen = []
+
+    async def handler(request):
+        seen.append(request)
+        if len(seen) == 2:
+            return httpx.Response(502)  # opens the circuit
+        await hang.wait()
+        return httpx.Response(200, json=_completion())
+
+    adapter = OpenRouterAdapter(
+        "key", "model", max_retries=0, breaker_threshold=1, breaker_reset=0.05,
+        transport=httpx.MockTransport(handler),
+    )
+    old = asyncio.create_task(adapter.chat([]))  # started while the circuit was closed
+    await asyncio.sleep(0.01)
+    await adapter.chat([])
+    await asyncio.sleep(0.06)
+    probe = asyncio.create_task(adapter.chat([]))
+    await asyncio.sleep(0.01)
+
+    old.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await old
+    resp = await asyncio.wait_for(adapter.chat([]), 1)  # a second probe would hang
+    assert resp.error.code == "circuit_open" and len(seen) == 3  # still only the one probe
+
+    hang.set()
+    assert (await probe).content == "hi"
+    assert (await adapter.chat([])).content == "hi"
+
+@pytest.mark.asyncio
+async def test_chat_stream_retries_before_first_chunk():
+    body = _sse({"choices": [{"delta": {"content": "ok"}}]})
+    transport, seen = _flaky(
+        httpx.Response(503),
+        httpx.Response(200, content=body, headers={"content-type": "text/event-stream"}),
+    )
+    adapter = OpenRouterAdapter("key", "model", backoff=0.001, transport=transport)
+    events = [e async for e in adapter.chat_stream([])]
+    assert events[-1].response.content == "ok" and len(seen) == 2
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from robert.modules.agent import AgentEvent, AgentResponse
+from robert.modules.server import AgentServer
+from robert.modules.telemetry import Metrics
+
+
+class FakeAgent:
+    """Echoes the message; turns block on `gate` until it is set."""
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.started = 0
+        self.closed = False
+
+    async def process(self, message, session_key):
+        self.started += 1
+        await self.gate.wait()
+        return AgentResponse(content=f"{session_key}: {message}", iterations=1)
+
+    async def process_stream(self, message, session_key):
+        yield AgentEvent("text", text="Hel")
+        yield AgentEvent("text", text="lo")
+        yield AgentEvent("done", response=AgentResponse(content="Hello", iterations=1))
+
+    async def aclose(self):
+        self.closed = True
+
+async def _server(agent, **kwargs):
+    server = AgentServer(agent, port=0, **kwargs)
+    port = await server.start()
+    return server, f"http://127.0.0.1:{port}"
+
+@pytest.mark.asyncio
+async def test_agent_route_auth_and_health():
+    metrics = Metrics()
+    server, url = await _server(FakeAgent(), api_keys=["k1"], metrics=metrics)
+    try:
+        async with httpx.AsyncClient(base_url=url) as client:
+            denied = await client.post("/agent", json={"message": "hi"})
+            bad = await client.post("/agent", json={"session_key": "s"}, headers={"Authorization": "Bearer k1"})
+            ok = await client.post(
+                "/agent", json={"message": "hi", "session_key": "ha-chat"}, headers={"Authorization": "Bearer k1"},
+            )
+            health = await client.get("/health")
+            scraped = await client.get("/metrics")
+    finally:
+        await server.shutdown()
+
+    assert denied.status_code == 401
+    assert bad.status_code == 400
+    assert ok.status_code == 200
+    assert ok.json()["content"] == "ha-chat: hi"
+    assert ok.json()["iterations"] == 1
+    assert health.json() == {"status": "ok", "pending": 0, "max_pending": 64, "rejected": 0}
+    assert 'robert_http_requests_total{route="/agent",status="401"} 1' in scraped.text
+
+@pytest.mark.asyncio
+async def test_stream_route_sends_server_sent_events():
+    server, url = await _server(FakeAgent())
+    try:
+        async with httpx.AsyncClient(base_url=url) as client:
+            resp = await client.post("/agent/stream", json={"message": "hi"})
+            again = await client.post("/agent", json={"message": "same connection"})
+    finally:
+        await server.shutdown()
+
+    assert resp.headers["content-type"] == "text/event-stream"
+    events = [block.split("\n") for block in resp.text.strip().split("\n\n")]
+    assert [e[0] for e in events] == ["event: text", "event: text", "event: done"]
+    assert json.loads(events[0][1][len("data: "):]) == {"text": "Hel"}
+    assert json.loads(events[2][1][len("data: "):])["content"] == "Hello"
+    assert again.status_code == 200
+
+@pytest.mark.asyncio
+async def test_overload_is_rejected_and_shutdown_drains():
+    agent = FakeAgent()
+    agent.gate.clear()
+    server, url = await _server(agent, max_pending=1)
+    async with httpx.AsyncClient(base_url=url) as client:
+        first = asyncio.create_task(client.post("/agent", json={"message": "slow"}))
+        while agent.started == 0:
+            await asyncio.sleep(0.01)
+        busy = await client.post("/agent", json={"message": "one too many"})
+
+        stopping = asyncio.create_task(server.shutdown())
+        await asyncio.sleep(0.05)
+        assert not stopping.done()  # waits for the in-flight turn
+        agent.gate.set()
+        done = await first
+        await stopping
+
+    assert busy.status_code == 503
+    assert busy.headers["retry-after"] == "1"
+    assert done.status_code == 200
+    assert done.headers["connection"] == "close"
+    assert agent.closed
+    with pytest.raises(httpx.ConnectError):
+        async with httpx.AsyncClient() as client:
+            await client.get(f"{url}/health")
@@ -1,5 +1,6 @@
 import json
 import os
+import pytest
 from robert.modules.session import Session, Message
 
 def test_session_message_flow(tmp_path):
@@ -9,6 +10,10 @@ def test_session_message_flow(tmp_path):
     # Add messages
     session.add_user_message("hello")
     session.add_assistant_message("hi")
+
+    # Appends are buffered until the end of the turn
+    assert not session_file.exists()
+    session.flush()
     
     # Verify file content
     lines = session_file.read_text().splitlines()
@@ -32,3 +37,96 @@ def test_session_loading(tmp_path):
     assert len(msgs) == 2 # system + user
     assert msgs[0]["role"] == "system"
     assert msgs[1]["content"] == "saved"
+
+def test_session_manager_cache_hits(tmp_path):
+    from robert.modules.session import SessionManager
+    manager = SessionManager(str(tmp_path))
+
+    s1 = manager.get_session("user1")
+    s1.add_user_message("hello")
+    s1.flush()
+    s2 = manager.get_session("user1")
+
+    assert s2 is s1
+    assert manager.hits == 1
+    assert manager.misses == 1
+
+def test_session_manager_reloads_when_file_changes(tmp_path):
+    from robert.modules.session import SessionManager
+    manager = SessionManager(str(tmp_path))
+
+    session = manager.get_session("user1")
+    session.add_user_message("hello")
+    session.flush()
+
+    # Someone else appends to the file behind the cache's back
+    with open(tmp_path / "user1.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps({"role": "assistant", "content": "external"}) + "\n")
+
+    session = manager.get_session("user1")
+    assert [m["content"] for m in session.get_messages_for_llm("sys")[1:]] == ["hello", "external"]
+    assert manager.reloads == 1
+
+def test_session_manager_eviction(tmp_path):
+    from robert.modules.session import SessionManager
+    manager = SessionManager(str(tmp_path), max_sessions=2)
+
+    a = manager.get_session("a")
+    manager.get_session("b")
+    manager.get_session("c")  # evicts "a", the least recently used
+
+    assert manager.evictions == 1
+    assert manager.get_session("a") is not a
+
+    manager = SessionManager(str(tmp_path), idle_seconds=0)
+    manager.get_session("a")
+    manager.get_session("b")  # "a" has been idle longer than 0s
+    assert manager.stats()["sessions"] == 1
+
+def test_session_torn_write_recovery(tmp_path):
+    session_file = tmp_path / "torn.jsonl"
+    good = json.dumps({"role": "user", "content": "complete"}) + "\n"
+    session_file.write_text(good + '{"role": "assistant", "cont')
+
+    session = Session("torn", str(session_file))
+    assert [m["content"] for m in session.get_messages_for_llm("sys")[1:]] == ["complete"]
+    # The partial record is cut off so the next append starts on a clean line
+    assert session_file.read_text() == good
+
+    session.add_assistant_message("next")
+    session.flush()
+    reloaded = Session("torn", str(session_file))
+    assert [m["content"] for m in reloaded.get_messages_for_llm("sys")[1:]] == ["complete", "next"]
+
+@pytest.mark.asyncio
+async def test_session_commit_durability(tmp_path):
+    flushed = Session("a", str(tmp_path / "a.jsonl"), durability="fsync")
+    flushed.add_user_message("one")
+    flushed.add_assistant_message("two")
+    await flushed.commit()
+    assert len((tmp_path / "a.jsonl").read_text().splitlines()) == 2
+
+    lazy = Session("b", str(tmp_path / "b.jsonl"), durability="none")
+    lazy.add_user_message("one")
+    await lazy.commit()
+    assert not (tmp_path / "b.jsonl").exists()
+    lazy.close()
+    assert len((tmp_path / "b.jsonl").read_text().splitlines()) == 1
+
+@pytest.mark.asyncio
+async def test_acquired_sessions_are_not_evicted_mid_turn(tmp_path):
+    from robert.modules.session import SessionManager
+    manager = SessionManager(str(tmp_path), max_sessions=1, idle_seconds=0, durability="none")
+
+    busy = manager.acquire("busy")
+    busy.add_user_message("question")
+    manager.get_session("other")  # over the limit, and "busy" is idle: still not evicted
+    busy.add_assistant_message("answer")
+    await busy.commit()
+    assert manager.get_session("busy") is busy
+    manager.release(busy)
+
+    manager.get_session("other")  # now it can go
+    assert manager.evictions >= 1
+    manager.close()
+    assert len((tmp_path / "busy.jsonl").read_text().splitlines()) == 2
@@ -0,0 +1,187 @@
+import json
+import os
+
+import pytest
+
+from robert.modules.session import Session, SessionManager
+from robert.modules.session_store import JsonlSessionStore, SqliteSessionStore
+
+
+def _record(role, content, **extra):
+    return (json.dumps({"role": role, "content": content, **extra}) + "\n").encode()
+
+def _stores(tmp_path):
+    return [JsonlSessionStore(str(tmp_path / "jsonl")), SqliteSessionStore(str(tmp_path / "db" / "s.db"))]
+
+def _history():
+    return [
+        _record("user", "q1"),
+        _record("assistant", "a1"),
+        _record("summary", "talked about q1", keep=0),
+        _record("user", "q2"),
+        _record("assistant", "", tool_calls=[{"id": "c1"}]),
+        _record("tool", "result", tool_call_id="c1"),
+        _record("assistant", "a2"),
+        _record("user", "q3"),
+        _record("assistant", "a3"),
+    ]
+
+@pytest.mark.parametrize("index", [0, 1], ids=["jsonl", "sqlite"])
+def test_store_load_last_keeps_summary_and_skips_orphan_tools(tmp_path, index):
+    store = _stores(tmp_path)[index]
+    store.append("s1", _history())
+
+    assert store.load("s1") == _history()
+    assert store.load("s1", limit=2) == [_history()[2]] + _history()[-2:]
+
+    session = Session("s1", store=store, load_last=4)
+    assert session.summary == "talked about q1"
+    # The window starts at the tool result, whose tool call was cut off
+    assert [m.content for m in session.messages] == ["a2", "q3", "a3"]
+    assert session.summary_start == 0
+    store.close()
+
+@pytest.mark.parametrize("index", [0, 1], ids=["jsonl", "sqlite"])
+def test_store_list_delete_and_trim(tmp_path, index):
+    store = _stores(tmp_path)[index]
+    store.append("old", [_record("user", "hi")])
+    if index == 0:
+        os.utime(store.path("old"), (1, 1))
+    store.append("new", _history())
+
+    assert [s.name for s in store.list_sessions()] == ["new", "old"]
+    assert [s.name for s in store.list_sessions(limit=1)] == ["new"]
+
+    version = store.version("new")
+    assert store.trim("new", keep_last=3) == 5
+    assert store.version("new") != version
+    assert store.load("new") == [_history()[2]] + _history()[-3:]
+    assert store.trim("new", keep_last=3) == 0
+
+    assert store.delete("old")
+    assert not store.delete("old")
+    assert store.version("old") is None
+    assert [s.name for s in store.list_sessions()] == ["new"]
+    store.close()
+
+def test_sqlite_imports_jsonl_sessions(tmp_path):
+    jsonl = JsonlSessionStore(str(tmp_path / "sessions"))
+    jsonl.append("a", _history())
+    jsonl.append("b", [_record("user", "hello")])
+    jsonl.close()
+
+    db = SqliteSessionStore(str(tmp_path / "sessions.db"))
+    assert db.import_jsonl(jsonl) == 2
+    assert db.import_jsonl(jsonl) == 0
+    assert db.load("a") == _history()
+    assert {s.name: s.size_bytes for s in db.list_sessions()} == {
+        s.name: s.size_bytes for s in jsonl.list_sessions()
+    }
+    db.close()
+
+@pytest.mark.asyncio
+async def test_session_manager_on_sqlite(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "s.db"))
+    manager = SessionManager(store=store)
+
+    session = manager.get_session("User-1")
+    session.add_user_message("hello")
+    session.add_assistant_message("hi")
+    await session.commit()
+
+    # Someone else appends behind the cache's back
+    store.append("user-1", [_record("user", "external")])
+    session = manager.get_session("User-1")
+    assert [m.content for m in session.messages] == ["hello", "hi", "external"]
+    assert manager.reloads == 1
+
+    assert manager.trim_session("User-1", keep_last=1) == 2
+    assert [m.content for m in manager.get_session("User-1").messages] == ["external"]
+    assert [s.name for s in manager.list_sessions()] == ["user-1"]
+    manager.close()
+
+@pytest.mark.parametrize("index", [0, 1], ids=["jsonl", "sqlite"])
+def test_limited_load_stops_at_summary_checkpoint(tmp_path, index):
+    store = _stores(tmp_path)[index]
+    history = [_record("user", f"m{i}") for i in range(6)]
+    history.insert(4, _record("summary", "m0 to m1", keep=2))  # m2 and m3 stay verbatim
+    store.append("s1", history)
+
+    assert store.load("s1", limit=100) == history[2:]
+    assert store.load("s1", limit=1) == [history[4], history[-1]]
+    store.close()
+
+def test_jsonl_tail_read_spans_blocks_and_drops_torn_line(tmp_path):
+    store = JsonlSessionStore(str(tmp_path))
+    history = [_record("user", f"{i} " + "x" * 500) for i in range(400)]  # ~200 KiB
+    store.append("big", history)
+    store.release("big")
+    with open(store.path("big"), "ab") as f:
+        f.write(b'{"role": "assistant", "cont')
+
+    assert store.load("big", limit=300) == history[-300:]
+    assert store.load("big") == history
+
+def test_jsonl_rotation_archives_old_records(tmp_path):
+    store = JsonlSessionStore(str(tmp_path), segment_bytes=2000, rotate_keep=4)
+    sent = []
+    for i in range(30):
+        turn = [_record("user", f"q{i}"), _record("assistant", f"a{i}")]
+        if i == 20:
+            turn.append(_record("summary", "up to q18", keep=4))
+        store.append("s1", turn)
+        sent += turn
+
+    assert store.rotations > 0
+    assert os.path.getsize(store.path("s1")) <= 2000 + 100
+    active = store.load("s1")
+    archived = store.read_archive("s1")
+    # Every message is in exactly one place; the summary is carried into the active file
+    messages = [r for r in archived + active if b'"summary"' not in r]
+    assert messages == [r for r in sent if b'"summary"' not in r]
+    assert json.loads(active[0]) == {"role": "summary", "content": "up to q18"}
+
+    session = Session("s1", store=store)
+    assert session.summary == "up to q18"
+    assert session.messages[-1].content == "a29"
+    assert store.delete("s1")
+    assert not os.path.exists(store.archive_path("s1"))
+
+@pytest.mark.parametrize("index", [0, 1], ids=["jsonl", "sqlite"])
+def test_trim_never_keeps_orphan_tool_results(tmp_path, index):
+    store = _stores(tmp_path)[index]
+    store.append("s1", _history()[:7])  # ends with tool call, tool result, "a2"
+
+    assert store.trim("s1", keep_last=2) == 5
+    assert store.load("s1") == [_history()[2], _history()[6]]
+    store.close()
+
+def test_jsonl_rotation_keeps_at_most_half_a_segment(tmp_path):
+    store = JsonlSessionStore(str(tmp_path), segment_bytes=64 * 1024, rotate_keep=200)
+    for i in range(400):
+        store.append("s1", [_record("user", f"{i} " + "x" * 2000)])
+
+    # Each rotation frees at least half a segment, instead of one per append
+    assert 0 < store.rotations <= 400 * 2000 // (32 * 1024) + 1
+    assert os.path.getsize(store.path("s1")) <= 64 * 1024 + 2100
+    assert len(store.read_archive("s1")) + len(store.load("s1")) == 400
+
+def test_jsonl_rotation_keeps_whole_turns(tmp_path):
+    store = JsonlSessionStore(str(tmp_path), segment_bytes=1000, rotate_keep=5)
+    for i in range(20):
+        store.append("s1", [
+            _record("user", f"q{i}"),
+            _record("assistant", "", tool_calls=[{"id": f"c{i}"}]),
+            _record("tool", "x" * 100, tool_call_id=f"c{i}"),
+        ])
+        store.append("s1", [_record("assistant", f"a{i}")])
+        # The last 5 messages start mid-turn; the kept part starts at its user message
+        assert json.loads(store.load("s1")[0])["role"] == "user"
+
+    assert store.rotations > 0
+    roles = [json.loads(r)["role"] for r in store.load("s1")]
+    assert roles == ["user", "assistant", "tool", "assistant"] * (len(roles) // 4)
+
+    # A turn longer than rotate_keep is kept whole rather than cut
+    store.append("s1", [_record("user", "q")] + [_record("tool", "y" * 100, tool_call_id="c")] * 12)
+    assert json.loads(store.load("s1")[0]) == {"role": "user", "content": "q"}
@@ -0,0 +1,116 @@
+import json
+
+import httpx
+import pytest
+from fake_agent import EchoTool, ScriptedProvider
+
+from robert.modules.agent import AgentService, ContextBuilder
+from robert.modules.config import AgentConfig
+from robert.modules.providers import LLMResponse
+from robert.modules.session import SessionManager
+from robert.modules.telemetry import Metrics, Trace
+from robert.modules.tools import ToolRegistry
+
+
+def test_render_prometheus_text():
+    metrics = Metrics(buckets=(10, 100))
+    metrics.inc("robert_turns_total", help="Turns.", outcome="ok")
+    metrics.inc("robert_turns_total", outcome="ok")
+    metrics.observe("robert_span_duration_ms", 5, span="tool")
+    metrics.observe("robert_span_duration_ms", 50, span="tool")
+    metrics.observe("robert_span_duration_ms", 500, span="tool")
+
+    text = metrics.render()
+
+    assert "# HELP robert_turns_total Turns.\n# TYPE robert_turns_total counter\n" in text
+    assert 'robert_turns_total{outcome="ok"} 2\n' in text
+    assert "# TYPE robert_span_duration_ms histogram" in text
+    assert 'robert_span_duration_ms_bucket{span="tool",le="10"} 1\n' in text
+    assert 'robert_span_duration_ms_bucket{span="tool",le="100"} 2\n' in text
+    assert 'robert_span_duration_ms_bucket{span="tool",le="+Inf"} 3\n' in text
+    assert 'robert_span_duration_ms_sum{span="tool"} 555\n' in text
+    assert 'robert_span_duration_ms_count{span="tool"} 3\n' in text
+
+def test_record_turn_counts_tools_and_writes_file(tmp_path):
+    path = tmp_path / "robert.prom"
+    metrics = Metrics(file_path=str(path))
+    trace = Trace()
+    with trace.span("tool", tool="echo") as span:
+        span["error"] = True
+
+    metrics.record_turn(trace, "ok")
+
+    text = path.read_text()
+    assert 'robert_tool_calls_total{error="true",tool="echo"} 1' in text
+    assert 'robert_turns_total{outcome="ok"} 1' in text
+    assert "robert_turn_duration_ms_count 1" in text
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    metrics = Metrics(port=0)
+    metrics.inc("robert_turns_total", outcome="ok")
+    await metrics.start()
+    port = await metrics.serve()
+    try:
+        async with httpx.AsyncClient() as client:
+            ok = await client.get(f"http://127.0.0.1:{port}/metrics")
+            missing = await client.get(f"http://127.0.0.1:{port}/")
+    finally:
+        await metrics.aclose()
+
+    assert ok.status_code == 200
+    assert 'robert_turns_total{outcome="ok"} 1' in ok.text
+    assert missing.status_code == 404
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_bind_failure_is_not_fatal(tmp_path, caplog):
+    taken = Metrics(port=0)
+    port = await taken.serve()
+    metrics = Metrics(port=port)
+    agent = AgentService(
+        provider=ScriptedProvider(LLMResponse(content="done")),
+        session_manager=SessionManager(str(tmp_path / "sessions")),
+        context_builder=ContextBuilder(),
+        tools=ToolRegistry(workspace_root=str(tmp_path), tool_configs=AgentConfig().tools),
+        metrics=metrics,
+    )
+    try:
+        await agent.start()
+        resp = await agent.process("hi", "user1")
+    finally:
+        await taken.aclose()
+        await agent.aclose()
+
+    assert resp.content == "done"
+    assert "Could not serve metrics" in caplog.text
+    assert 'robert_turns_total{outcome="ok"} 1' in metrics.render()
+
+@pytest.mark.asyncio
+async def test_agent_traces_turn_phases(tmp_path):
+    tools = ToolRegistry(workspace_root=str(tmp_path), tool_configs=AgentConfig().tools)
+    tools.register("echo", EchoTool())
+    call = {"id": "c1", "type": "function", "function": {"name": "echo", "arguments": json.dumps({"text": "hi"})}}
+    metrics = Metrics()
+    agent = AgentService(
+        provider=ScriptedProvider(LLMResponse(content="", tool_calls=[call]), LLMResponse(content="done")),
+        session_manager=SessionManager(str(tmp_path / "sessions")),
+        context_builder=ContextBuilder(),
+        tools=tools,
+        metrics=metrics,
+        trace_responses=True,
+    )
+
+    resp = await agent.process("say hi", "user1")
+
+    names = [s.name for s in resp.trace]
+    assert names[0] == "session.load"
+    assert names[-1] == "session.commit"
+    assert names.count("provider.chat") == 2
+    assert names.count("session.append") == 4
+    assert [s.attrs for s in resp.trace if s.name == "tool"] == [{"tool": "echo", "error": False}]
+    assert all(s.duration_ms >= 0 for s in resp.trace)
+
+    text = metrics.render()
+    assert 'robert_turns_total{outcome="ok"} 1' in text
+    assert 'robert_tool_calls_total{error="false",tool="echo"} 1' in text
+    assert 'robert_span_duration_ms_count{span="provider.chat"} 2' in text
@@ -2,6 +2,8 @@ import pytest
 import os
 from robert.modules.tools import _is_safe_path
 
+posix_only = pytest.mark.skipif(os.name != "posix", reason="uses POSIX shell commands")
+
 def test_safe_path_checks():
     base = os.path.abspath("workspace")
     
@@ -38,3 +40,131 @@ async def test_read_file_tool(tmp_path):
     result = await tool.execute("../secret.txt")
     assert "Access denied" in result.content
     assert result.is_error is True
+
+@posix_only
+@pytest.mark.asyncio
+async def test_shell_tool_runs_without_blocking_loop(tmp_path):
+    import asyncio
+
+    from robert.modules.tools import _ShellTool
+
+    tool = _ShellTool(str(tmp_path), ["sleep", "echo"])
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    t = asyncio.create_task(ticker())
+    result = await tool.execute("sleep 0.2")
+    t.cancel()
+    assert ticks >= 5  # the loop kept running while the command slept
+    assert result.content == "(Exit Code 0)"
+
+    assert (await tool.execute("echo hi")).content == "hi\n"
+    assert (await tool.execute("rm -rf /")).is_error
+
+@posix_only
+@pytest.mark.asyncio
+async def test_shell_tool_timeout_kills_process_group(tmp_path):
+    import asyncio
+    import time
+
+    from robert.modules.tools import _ShellTool
+
+    marker = tmp_path / "survived"
+    tool = _ShellTool(str(tmp_path), ["sleep"], command_timeouts={"sleep": 0.2})
+
+    start = time.monotonic()
+    result = await tool.execute(f"sleep 5 & (sleep 1; touch {marker}) & wait")
+    assert result.is_error and "timed out" in result.content
+    assert time.monotonic() - start < 2
+
+    await asyncio.sleep(1.2)
+    assert not marker.exists()  # the child of `sh -c` was killed too
+
+@posix_only
+@pytest.mark.asyncio
+async def test_shell_tool_bounds_output(tmp_path):
+    from robert.modules.tools import _ShellTool
+
+    tool = _ShellTool(str(tmp_path), ["seq"], max_output_bytes=100)
+    result = await tool.execute("seq 1 10000")
+
+    assert result.content.startswith("1\n2\n3\n")
+    assert result.content.endswith("9999\n10000\n")
+    assert "bytes omitted" in result.content
+    assert len(result.content) < 200
+
+@pytest.mark.asyncio
+async def test_read_file_pages_large_files(tmp_path):
+    from robert.modules.tools import _ReadFileTool
+
+    (tmp_path / "big.log").write_text("".join(f"line {i}\n" for i in range(1, 1001)))
+    tool = _ReadFileTool(str(tmp_path), max_bytes=100)
+
+    first_page = await tool.execute("big.log")
+    assert first_page.content.startswith("line 1\nline 2\n")
+    assert "file has 1000 lines" in first_page.content
+    assert "read more" in first_page.content
+
+    lines = await tool.execute("big.log", start_line=500, end_line=502)
+    assert lines.content.startswith("line 500\nline 501\nline 502\n\n[read_file: showing lines 500-502")
+
+    ranged = await tool.execute("big.log", offset=7, max_bytes=7)
+    assert ranged.content.startswith("line 2\n\n[read_file: showing bytes 7-14")
+
+@pytest.mark.asyncio
+async def test_read_file_detects_binary(tmp_path):
+    from robert.modules.tools import _ReadFileTool
+
+    (tmp_path / "blob.bin").write_bytes(b"\x89PNG\x00\x00\x01")
+    result = await _ReadFileTool(str(tmp_path)).execute("blob.bin")
+    assert result.is_error
+    assert "Binary file (7 bytes)" in result.content
+
+@pytest.mark.asyncio
+async def test_write_file_is_atomic_and_timed(tmp_path):
+    from robert.modules.config import AgentConfig, ToolConfig
+    from robert.modules.tools import ToolRegistry
+
+    configs = AgentConfig().tools
+    configs["fileWrite"] = ToolConfig(enabled=True)
+    registry = ToolRegistry(str(tmp_path), configs)
+
+    (tmp_path / "notes.txt").write_text("old")
+    result = await registry.call("write_file", path="notes.txt", content="new")
+    assert not result.is_error
+    assert (tmp_path / "notes.txt").read_text() == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["notes.txt"]  # no temp file left behind
+
+    assert (await registry.call("read_file", path="notes.txt")).content == "new"
+    stats = registry.io_stats()
+    assert stats["write"]["count"] == 1
+    assert stats["read"]["count"] == 1
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_write_file_keeps_or_defaults_file_mode(tmp_path):
+    from robert.modules.files import _UMASK
+    from robert.modules.tools import _WriteFileTool
+
+    tool = _WriteFileTool(str(tmp_path))
+    (tmp_path / "script.sh").write_text("old")
+    os.chmod(tmp_path / "script.sh", 0o750)
+    assert not (await tool.execute("script.sh", "new")).is_error
+    assert not (await tool.execute("fresh.txt", "new")).is_error
+
+    assert os.stat(tmp_path / "script.sh").st_mode & 0o7777 == 0o750
+    assert os.stat(tmp_path / "fresh.txt").st_mode & 0o7777 == 0o666 & ~_UMASK
+
+@pytest.mark.asyncio
+async def test_write_file_failure_keeps_original(tmp_path):
+    from robert.modules.tools import _WriteFileTool
+
+    tool = _WriteFileTool(str(tmp_path))
+    result = await tool.execute("missing_dir/file.txt", "x")
+    assert result.is_error
+    assert list(tmp_path.iterdir()) == []
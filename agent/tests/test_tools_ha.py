@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+pytest.importorskip("websockets")
+
+from fake_ha import FakeHomeAssistant, wait_for
+
+from robert.modules.tools_ha import (
+    EntityIndex,
+    HACallServiceTool,
+    HAClient,
+    HAFindEntityTool,
+    HAGetStateTool,
+    HAListEntitiesTool,
+    HAStateMirror,
+)
+
+STATES = [
+    {"entity_id": "light.kitchen", "state": "off", "attributes": {"friendly_name": "Kitchen Light"}},
+    {"entity_id": "switch.fan", "state": "on", "attributes": {"friendly_name": "Fan"}},
+]
+
+@pytest.mark.asyncio
+async def test_mirror_follows_state_changes():
+    async with FakeHomeAssistant(STATES) as ha:
+        mirror = HAStateMirror(ha.url, ha.token)
+        tool = HAGetStateTool(ha.url, ha.token, mirror=mirror)
+
+        # Before the mirror is loaded the tool falls back to REST
+        assert "is off" in await tool.execute("light.kitchen")
+        assert ha.rest_requests == 1
+
+        await wait_for(mirror.is_fresh)
+        await ha.set_state("light.kitchen", "on", friendly_name="Kitchen Light")
+        await wait_for(lambda: mirror.get("light.kitchen")["state"] == "on")
+
+        assert "is on" in await tool.execute("light.kitchen")
+        await ha.remove("switch.fan")
+        await wait_for(lambda: mirror.get("switch.fan") is None)
+        listing = await HAListEntitiesTool(ha.url, ha.token, mirror=mirror).execute()
+        assert "light.kitchen" in listing and "switch.fan" not in listing
+        assert ha.rest_requests == 1  # everything after loading came from the mirror
+        await mirror.stop()
+
+@pytest.mark.asyncio
+async def test_mirror_falls_back_to_rest_when_disconnected_or_stale():
+    async with FakeHomeAssistant(STATES) as ha:
+        mirror = HAStateMirror(ha.url, ha.token, stale_after=0.2, ping_interval=60)
+        mirror.ensure_started()
+        await wait_for(mirror.is_fresh)
+
+        # No traffic for longer than stale_after: treat the mirror as stale
+        await wait_for(lambda: not mirror.is_fresh())
+        tool = HAGetStateTool(ha.url, ha.token, mirror=mirror)
+        assert "is off" in await tool.execute("light.kitchen")
+        assert ha.rest_requests == 1
+
+        # A dropped connection reconnects and reloads everything; until then, REST
+        mirror._stale_after = 60
+        ha.states_gate = asyncio.Event()
+        await ha.drop_connections()
+        await wait_for(lambda: mirror.reconnects == 1 and mirror._connected, timeout=5)
+        assert not mirror.is_fresh()
+        assert "is off" in await tool.execute("light.kitchen")
+        assert ha.rest_requests == 2
+        ha.states_gate.set()
+        await ha.set_state("switch.fan", "off", friendly_name="Fan")
+        await wait_for(lambda: mirror.is_fresh() and mirror.get("switch.fan")["state"] == "off", timeout=5)
+        await mirror.stop()
+
+def _state(entity_id, name, state="off"):
+    return {"entity_id": entity_id, "state": state, "attributes": {"friendly_name": name}}
+
+def test_entity_index_ranks_and_updates_incrementally():
+    index = EntityIndex()
+    index.reset([
+        _state("light.kitchen_ceiling", "Kitchen Ceiling"),
+        _state("light.living_room", "Living Room Lamp"),
+        _state("switch.kitchen_kettle", "Kettle"),
+        _state("sensor.kitchen_temperature", "Kitchen Temperature"),
+    ])
+    index.set_areas({"light.living_room": "Downstairs"})
+
+    assert index.search("kitchen light")[0].entity_id == "light.kitchen_ceiling"
+    assert index.search("kitchen lights", domain="switch")[0].entity_id == "switch.kitchen_kettle"
+    assert index.search("downstairs")[0].entity_id == "light.living_room"
+    assert index.search("kitchn ceilng")[0].entity_id == "light.kitchen_ceiling"  # typo-tolerant
+    assert index.search("light.living_room")[0].score == 1.0
+
+    version = index.version
+    index.update("light.kitchen_ceiling", _state("light.kitchen_ceiling", "Kitchen Ceiling", "on"))
+    assert index.version == version  # state-only change: no re-index
+    assert index.search("kitchen ceiling")[0].state == "on"
+
+    index.update("light.kitchen_ceiling", None)
+    index.update("light.pantry", _state("light.pantry", "Pantry Light"))
+    assert index.search("kitchen ceiling", domain="light") == []
+    assert index.search("pantry")[0].entity_id == "light.pantry"
+
+def test_entity_index_fuzzy_search_in_a_large_home():
+    index = EntityIndex()
+    index.reset([_state(f"light.kitchen_{i}", f"Kitchen Spot {i}") for i in range(40)] + [
+        _state("switch.kitchen_kettle", "Kitchen Kettle"),
+        _state("switch.office_kettle", "Office Kettle"),
+    ])
+
+    # Many entities share "kitchen"; the typo'd word decides among them
+    assert index.search("kitchen ketle")[0].entity_id == "switch.kitchen_kettle"
+    assert index.search("kitchen ketle", domain="light")[0].entity_id.startswith("light.kitchen_")
+    assert index.search("offce ketle")[0].entity_id == "switch.office_kettle"
+
+@pytest.mark.asyncio
+async def test_find_entity_tool_follows_mirror():
+    async with FakeHomeAssistant(STATES) as ha:
+        mirror = HAStateMirror(ha.url, ha.token)
+        tool = HAFindEntityTool(ha.url, ha.token, mirror=mirror)
+        assert "light.kitchen" in await tool.execute("kitchen")  # REST snapshot while loading
+
+        await wait_for(mirror.is_fresh)
+        await ha.set_state("light.garage", "on", friendly_name="Garage Light")
+        await wait_for(lambda: mirror.get("light.garage") is not None)
+        assert (await tool.execute("garage")).startswith("- light.garage (Garage Light): on")
+        await mirror.stop()
+
+@pytest.mark.asyncio
+async def test_list_entities_says_when_it_truncates():
+    many = [_state(f"light.lamp_{i}", f"Lamp {i}") for i in range(60)]
+    async with FakeHomeAssistant(many) as ha:
+        listing = await HAListEntitiesTool(ha.url, ha.token).execute()
+    lines = listing.splitlines()
+    assert len(lines) == 51 and "10 more" in lines[-1] and "ha_find_entity" in lines[-1]
+
+@pytest.mark.asyncio
+async def test_call_service_batches_targets_per_service():
+    posts = []
+
+    def handler(request):
+        posts.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json=[])
+
+    client = HAClient("http://ha.local", "t", transport=httpx.MockTransport(handler))
+    tool = HACallServiceTool("http://ha.local", "t", client=client)
+
+    # Mixed domains without an explicit domain: one request per domain
+    out = await tool.execute("turn_off", entity_id=["light.a", "light.b", "switch.fan"])
+    assert posts == [
+        ("/api/services/light/turn_off", {"entity_id": ["light.a", "light.b"]}),
+        ("/api/services/switch/turn_off", {"entity_id": "switch.fan"}),
+    ]
+    assert "light.a, light.b" in out and "switch.fan" in out
+
+    posts.clear()
+    await tool.execute("turn_on", domain="light", area_id="downstairs", data={"brightness_pct": 30})
+    assert posts == [("/api/services/light/turn_on", {"brightness_pct": 30, "area_id": ["downstairs"]})]
+
+    assert "domain is required" in await tool.execute("turn_on", label_id="party")
+    pooled = client._get_client()
+    await tool.execute("turn_on", entity_id="light.a, light.b")
+    assert posts[-1] == ("/api/services/light/turn_on", {"entity_id": ["light.a", "light.b"]})
+    assert client._get_client() is pooled  # connections reused across calls
+    await client.aclose()